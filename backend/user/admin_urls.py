@@ -9,6 +9,11 @@ app_name = 'admin_panel'
 urlpatterns = [
     # 直接访问后台管理 - 跳过登录
     path('', admin_views.DashboardView.as_view(), name='dashboard'),
+    path('cohort-analytics/', admin_views.CohortAnalyticsView.as_view(), name='cohort_analytics'),
+    path('metrics/', admin_views.MetricsView.as_view(), name='metrics'),
+    path('search/', admin_views.AdminSearchView.as_view(), name='search'),
+    path('profiles/', admin_views.ProfileListView.as_view(), name='profile_list'),
+    path('profiles/<str:profile_id>/download/', admin_views.ProfileDownloadView.as_view(), name='profile_download'),
     
     # 保留登录相关路由（备用）
     path('login/', admin_views.AdminLoginView.as_view(), name='login'),
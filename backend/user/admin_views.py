@@ -8,12 +8,22 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.views.generic import TemplateView, ListView, CreateView, UpdateView, DeleteView
 from django.views import View
-from django.urls import reverse_lazy
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
+from django.utils.crypto import constant_time_compare
+from django.urls import reverse, reverse_lazy
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
-from datetime import datetime, timedelta
+from datetime import datetime
 from .models import User, SleepRecord, ExerciseRecord, DietRecord, FoodCalorieReference
 from .forms import AdminUserForm, AdminSleepRecordForm, AdminExerciseRecordForm, AdminDietRecordForm, AdminFoodCalorieReferenceForm
+from .cohort_analytics import get_cohort_summary, get_cached_cohort_summary, DEFAULT_WEEKS
+from .metrics import registry
+from .profiling import list_profiles, get_profile_path
+from .sharding import ShardedObjectMixin
+from .counters import dashboard_counts
+from .pagination import KeysetPaginationMixin
+from .search_index import SEARCH_SOURCES, search, search_filter
 
 
 class AdminRequiredMixin:
@@ -61,43 +71,143 @@ class DashboardView(AdminRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # 统计数据
-        context['user_count'] = User.objects.count()
-        context['sleep_record_count'] = SleepRecord.objects.count()
-        context['exercise_record_count'] = ExerciseRecord.objects.count()
-        context['today_records'] = SleepRecord.objects.filter(
-            sleep_date=datetime.now().date()
-        ).count()
-        context['today_exercise_records'] = ExerciseRecord.objects.filter(
-            exercise_date=datetime.now().date()
-        ).count()
+        # 统计数据（来自增量维护的计数器，一次查询，与数据量无关）
+        counts = dashboard_counts(datetime.now().date())
+        context['user_count'] = counts['user']['total']
+        context['sleep_record_count'] = counts['sleep_record']['total']
+        context['exercise_record_count'] = counts['exercise_record']['total']
+        context['diet_record_count'] = counts['diet_record']['total']
+        context['health_report_count'] = counts['health_report']['total']
+        context['health_goal_count'] = counts['health_goal']['total']
+        context['today_records'] = counts['sleep_record']['today']
+        context['today_exercise_records'] = counts['exercise_record']['today']
+        context['today_diet_records'] = counts['diet_record']['today']
         
         # 最近7天的记录数量
-        week_ago = datetime.now().date() - timedelta(days=7)
-        context['week_records'] = SleepRecord.objects.filter(
-            sleep_date__gte=week_ago
-        ).count()
-        context['week_exercise_records'] = ExerciseRecord.objects.filter(
-            exercise_date__gte=week_ago
-        ).count()
+        context['week_records'] = counts['sleep_record']['week']
+        context['week_exercise_records'] = counts['exercise_record']['week']
+        context['week_diet_records'] = counts['diet_record']['week']
+        
+        # 群体分布只读取缓存（由 refresh_cohort_analytics 命令或页面上的刷新按钮计算），未命中时为 None
+        context['cohort'] = get_cached_cohort_summary()
         
         return context
 
 
-class UserListView(AdminRequiredMixin, ListView):
+class CohortAnalyticsView(AdminRequiredMixin, View):
+    """群体分布数据接口（含每周分位数和直方图）"""
+    
+    def get(self, request):
+        try:
+            weeks = int(request.GET.get('weeks', DEFAULT_WEEKS))
+        except ValueError:
+            return JsonResponse({'error': 'weeks 参数必须为整数'}, status=400)
+        weeks = min(max(weeks, 1), 52)
+        refresh = request.GET.get('refresh') == '1'
+        
+        summary = get_cohort_summary(weeks=weeks, refresh=refresh)
+        return JsonResponse(summary, json_dumps_params={'ensure_ascii': False})
+    
+    def post(self, request):
+        """重新计算默认周数的群体分布并写入缓存（管理主页的刷新按钮）"""
+        summary = get_cohort_summary(refresh=True)
+        messages.success(request, f"群体分布已更新（{summary['student_count']} 名学生）")
+        return redirect('admin_panel:dashboard')
+
+
+class AdminSearchView(AdminRequiredMixin, View):
+    """统一搜索接口：用户、食物、运动/饮食记录和目标进度备注，按相关度排序"""
+    
+    # 类别 -> 后台编辑页面的 URL 名称（目标进度没有后台页面）
+    EDIT_URLS = {
+        'user': 'admin_panel:user_edit',
+        'food': 'admin_panel:food_calorie_reference_edit',
+        'exercise': 'admin_panel:exercise_record_edit',
+        'diet': 'admin_panel:diet_record_edit',
+    }
+    
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return JsonResponse({'error': '请输入搜索内容'}, status=400)
+        categories = request.GET.getlist('category')
+        if any(category not in SEARCH_SOURCES for category in categories):
+            return JsonResponse({'error': f'category 参数必须为 {", ".join(SEARCH_SOURCES)} 之一'}, status=400)
+        try:
+            limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+        except ValueError:
+            return JsonResponse({'error': 'limit 参数必须为整数'}, status=400)
+        
+        results = search(query, categories or None, limit)
+        for result in results:
+            url_name = self.EDIT_URLS.get(result['category'])
+            result['url'] = reverse(url_name, args=[result['id']]) if url_name else None
+        return JsonResponse({'query': query, 'results': results}, json_dumps_params={'ensure_ascii': False})
+
+
+class MonitoringAccessMixin:
+    """
+    性能监控页面的访问控制：管理员会话，或携带 Authorization: Bearer <METRICS_TOKEN> 的请求
+    不受 AdminRequiredMixin（本地开发版本不做检查）影响，指标和慢请求分析结果不对外公开
+    """
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not self._is_allowed(request):
+            return JsonResponse({'error': '没有访问权限'}, status=403)
+        return super().dispatch(request, *args, **kwargs)
+    
+    def _is_allowed(self, request):
+        user = request.user
+        if user.is_authenticated and (user.is_staff or user.is_superuser):
+            return True
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+        return bool(token) and auth_header.startswith('Bearer ') and constant_time_compare(auth_header[7:], token)
+
+
+class MetricsView(MonitoringAccessMixin, View):
+    """请求性能指标（Prometheus 文本格式）"""
+    
+    def get(self, request):
+        return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ProfileListView(MonitoringAccessMixin, TemplateView):
+    """已采集的慢请求分析列表"""
+    template_name = 'custom_admin/profile_list.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['profiles'] = list_profiles()
+        context['threshold_ms'] = getattr(settings, 'PROFILING_THRESHOLD_MS', 500)
+        context['profiling_enabled'] = getattr(settings, 'PROFILING_ENABLED', False)
+        return context
+
+
+class ProfileDownloadView(MonitoringAccessMixin, View):
+    """下载慢请求分析结果文件"""
+    
+    def get(self, request, profile_id):
+        path = get_profile_path(profile_id)
+        if path is None:
+            raise Http404('分析结果不存在')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+
+class UserListView(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """用户列表视图"""
     model = User
     template_name = 'custom_admin/user_list.html'
     context_object_name = 'users'
     paginate_by = 20
+    keyset_ordering = ['-pk']
+    counter_name = 'user'
     
     def get_queryset(self):
-        queryset = User.objects.all().order_by('-id')
+        queryset = User.objects.all()
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                Q(userName__icontains=search)
-            )
+            queryset = queryset.filter(search_filter('user', search))
         return queryset
     
     def get_context_data(self, **kwargs):
@@ -141,15 +251,25 @@ class UserDeleteView(AdminRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class SleepRecordListView(AdminRequiredMixin, ListView):
+# 睡眠质量筛选：参数值 -> (名称, 评分条件)，使用 quality_score 上的索引
+SLEEP_QUALITY_FILTERS = {
+    'poor': ('较差（低于60分）', Q(quality_score__lt=60)),
+    'fair': ('一般（60-79分）', Q(quality_score__gte=60, quality_score__lt=80)),
+    'good': ('良好（80分及以上）', Q(quality_score__gte=80)),
+}
+
+
+class SleepRecordListView(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """睡眠记录列表视图"""
     model = SleepRecord
     template_name = 'custom_admin/sleep_record_list.html'
     context_object_name = 'records'
     paginate_by = 20
+    keyset_ordering = ['-sleep_date', '-pk']
+    counter_name = 'sleep_record'
     
     def get_queryset(self):
-        queryset = SleepRecord.objects.select_related('user').order_by('-sleep_date')
+        queryset = SleepRecord.objects.select_related('user')
         
         # 用户筛选
         user_id = self.request.GET.get('user')
@@ -164,6 +284,11 @@ class SleepRecordListView(AdminRequiredMixin, ListView):
         if end_date:
             queryset = queryset.filter(sleep_date__lte=end_date)
         
+        # 睡眠质量筛选
+        quality = self.request.GET.get('quality')
+        if quality in SLEEP_QUALITY_FILTERS:
+            queryset = queryset.filter(SLEEP_QUALITY_FILTERS[quality][1])
+        
         return queryset
     
     def get_context_data(self, **kwargs):
@@ -172,10 +297,12 @@ class SleepRecordListView(AdminRequiredMixin, ListView):
         context['selected_user'] = self.request.GET.get('user', '')
         context['start_date'] = self.request.GET.get('start_date', '')
         context['end_date'] = self.request.GET.get('end_date', '')
+        context['quality_choices'] = [(key, name) for key, (name, _) in SLEEP_QUALITY_FILTERS.items()]
+        context['selected_quality'] = self.request.GET.get('quality', '')
         return context
 
 
-class SleepRecordCreateView(AdminRequiredMixin, CreateView):
+class SleepRecordCreateView(AdminRequiredMixin, ShardedObjectMixin, CreateView):
     """睡眠记录创建视图"""
     model = SleepRecord
     form_class = AdminSleepRecordForm
@@ -187,7 +314,7 @@ class SleepRecordCreateView(AdminRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class SleepRecordUpdateView(AdminRequiredMixin, UpdateView):
+class SleepRecordUpdateView(AdminRequiredMixin, ShardedObjectMixin, UpdateView):
     """睡眠记录更新视图"""
     model = SleepRecord
     form_class = AdminSleepRecordForm
@@ -199,7 +326,7 @@ class SleepRecordUpdateView(AdminRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 
-class SleepRecordDeleteView(AdminRequiredMixin, DeleteView):
+class SleepRecordDeleteView(AdminRequiredMixin, ShardedObjectMixin, DeleteView):
     """睡眠记录删除视图"""
     model = SleepRecord
     template_name = 'custom_admin/sleep_record_confirm_delete.html'
@@ -210,15 +337,17 @@ class SleepRecordDeleteView(AdminRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class ExerciseRecordListView(AdminRequiredMixin, ListView):
+class ExerciseRecordListView(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """运动记录列表视图"""
     model = ExerciseRecord
     template_name = 'custom_admin/exercise_record_list.html'
     context_object_name = 'records'
     paginate_by = 20
+    keyset_ordering = ['-exercise_date', '-created_at', '-pk']
+    counter_name = 'exercise_record'
     
     def get_queryset(self):
-        queryset = ExerciseRecord.objects.select_related('user').order_by('-exercise_date', '-created_at')
+        queryset = ExerciseRecord.objects.select_related('user')
         
         # 用户筛选
         user_id = self.request.GET.get('user')
@@ -251,7 +380,7 @@ class ExerciseRecordListView(AdminRequiredMixin, ListView):
         return context
 
 
-class ExerciseRecordCreateView(AdminRequiredMixin, CreateView):
+class ExerciseRecordCreateView(AdminRequiredMixin, ShardedObjectMixin, CreateView):
     """运动记录创建视图"""
     model = ExerciseRecord
     form_class = AdminExerciseRecordForm
@@ -263,7 +392,7 @@ class ExerciseRecordCreateView(AdminRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class ExerciseRecordUpdateView(AdminRequiredMixin, UpdateView):
+class ExerciseRecordUpdateView(AdminRequiredMixin, ShardedObjectMixin, UpdateView):
     """运动记录更新视图"""
     model = ExerciseRecord
     form_class = AdminExerciseRecordForm
@@ -275,7 +404,7 @@ class ExerciseRecordUpdateView(AdminRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 
-class ExerciseRecordDeleteView(AdminRequiredMixin, DeleteView):
+class ExerciseRecordDeleteView(AdminRequiredMixin, ShardedObjectMixin, DeleteView):
     """运动记录删除视图"""
     model = ExerciseRecord
     template_name = 'custom_admin/exercise_record_confirm_delete.html'
@@ -286,12 +415,14 @@ class ExerciseRecordDeleteView(AdminRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class DietRecordListView(AdminRequiredMixin, ListView):
+class DietRecordListView(AdminRequiredMixin, KeysetPaginationMixin, ListView):
     """饮食记录列表视图"""
     model = DietRecord
     template_name = 'custom_admin/diet_record_list.html'
     context_object_name = 'diet_records'
     paginate_by = 20
+    keyset_ordering = ['-diet_date', 'meal_type', '-created_at', '-pk']
+    counter_name = 'diet_record'
     
     def get_queryset(self):
         queryset = DietRecord.objects.select_related('user').all()
@@ -299,9 +430,7 @@ class DietRecordListView(AdminRequiredMixin, ListView):
         # 用户搜索
         user_search = self.request.GET.get('user_search')
         if user_search:
-            queryset = queryset.filter(
-                Q(user__userName__icontains=user_search)
-            )
+            queryset = queryset.filter(user__in=User.objects.filter(search_filter('user', user_search)))
         
         # 日期筛选
         start_date = self.request.GET.get('start_date')
@@ -329,9 +458,9 @@ class DietRecordListView(AdminRequiredMixin, ListView):
         # 食物名称搜索
         food_search = self.request.GET.get('food_search')
         if food_search:
-            queryset = queryset.filter(food_name__icontains=food_search)
+            queryset = queryset.filter(search_filter('diet', food_search))
         
-        return queryset.order_by('-diet_date', 'meal_type', '-created_at')
+        return queryset
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -346,7 +475,7 @@ class DietRecordListView(AdminRequiredMixin, ListView):
         return context
 
 
-class DietRecordCreateView(AdminRequiredMixin, CreateView):
+class DietRecordCreateView(AdminRequiredMixin, ShardedObjectMixin, CreateView):
     """饮食记录创建视图"""
     model = DietRecord
     form_class = AdminDietRecordForm
@@ -358,7 +487,7 @@ class DietRecordCreateView(AdminRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class DietRecordUpdateView(AdminRequiredMixin, UpdateView):
+class DietRecordUpdateView(AdminRequiredMixin, ShardedObjectMixin, UpdateView):
     """饮食记录更新视图"""
     model = DietRecord
     form_class = AdminDietRecordForm
@@ -370,7 +499,7 @@ class DietRecordUpdateView(AdminRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 
-class DietRecordDeleteView(AdminRequiredMixin, DeleteView):
+class DietRecordDeleteView(AdminRequiredMixin, ShardedObjectMixin, DeleteView):
     """饮食记录删除视图"""
     model = DietRecord
     template_name = 'custom_admin/diet_record_confirm_delete.html'
@@ -394,7 +523,7 @@ class FoodCalorieReferenceListView(AdminRequiredMixin, ListView):
         # 食物名称搜索
         food_search = self.request.GET.get('food_search')
         if food_search:
-            queryset = queryset.filter(food_name__icontains=food_search)
+            queryset = queryset.filter(search_filter('food', food_search))
         
         # 食物分类筛选
         category = self.request.GET.get('category')
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        # 注册模型信号处理
+        from . import signals  # noqa: F401
+        # 注册数据库执行包装器，用于请求性能统计
+        from . import metrics  # noqa: F401
+        # 注册 SQLite 连接参数（生产配置档）
+        from . import sqlite_tuning  # noqa: F401
@@ -0,0 +1,298 @@
+"""
+历史记录归档
+睡眠、运动、饮食的原始记录超过 ARCHIVE_HORIZON_DAYS 天后由 archive_records 命令移出热表：
+- 先把每个用户每天的汇总值累加到 DailyRecordAggregate（留在热库中，长时间范围的图表只读汇总）
+- 再把原始行按年份移入同一数据库中的归档表 <表名>_archive_<年份>，开启分片时每个分片各自归档
+热表只保留最近的记录，索引和后台分页计数的规模不再随时间增长。
+
+读取时透明合并：
+- 记录列表的开始日期不晚于已归档的最新日期时，archived_rows() 从归档表补充记录
+- chart_series 的每日数值合并 DailyRecordAggregate 中的汇总
+已归档的最新日期缓存 ARCHIVE_BOUNDARY_CACHE_SECONDS 秒，范围不涉及归档时不产生额外查询。
+归档表没有外键，删除用户时由 post_delete 信号调用 purge_user_archives() 清除其归档记录。
+归档表通过原始 SQL 读写，只支持 SQLite。
+"""
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from .models import SleepRecord, ExerciseRecord, DietRecord, DailyRecordAggregate
+from .sharding import shard_aliases
+
+
+# 类别 -> (模型, 日期字段)
+ARCHIVE_SOURCES = {
+    'sleep': (SleepRecord, 'sleep_date'),
+    'exercise': (ExerciseRecord, 'exercise_date'),
+    'diet': (DietRecord, 'diet_date'),
+}
+
+# 类别 -> {汇总字段: 聚合表达式}
+AGGREGATE_COLUMNS = {
+    'sleep': {'sleep_minutes': 'SUM(sleep_duration)', 'sleep_count': 'COUNT(*)'},
+    'exercise': {
+        'exercise_minutes': 'SUM(duration_minutes)',
+        'exercise_calories': 'SUM(calories_burned)',
+        'exercise_count': 'COUNT(*)',
+    },
+    'diet': {'diet_calories': 'SUM(total_calories)', 'diet_count': 'COUNT(*)'},
+}
+
+BOUNDARY_KEY_PREFIX = 'archive_boundary_'
+
+
+def archive_cutoff(today=None):
+    """归档边界：早于该日期的记录会被归档"""
+    today = today or date.today()
+    return today - timedelta(days=getattr(settings, 'ARCHIVE_HORIZON_DAYS', 730))
+
+
+def archive_table(model, year):
+    return f'{model._meta.db_table}_archive_{year}'
+
+
+def _category_for(model):
+    for category, (source, date_field) in ARCHIVE_SOURCES.items():
+        if source is model:
+            return category, date_field
+    raise ValueError(f'{model.__name__} 不支持归档')
+
+
+def _columns(model):
+    return [field.column for field in model._meta.concrete_fields]
+
+
+def archive_years(model, using):
+    """数据库中已存在归档表的年份（升序）"""
+    prefix = f'{model._meta.db_table}_archive_'
+    return sorted(
+        int(name[len(prefix):])
+        for name in connections[using].introspection.table_names()
+        if name.startswith(prefix) and name[len(prefix):].isdigit()
+    )
+
+
+def archived_through(model, using):
+    """已归档记录的最新日期，没有归档时返回 None（结果缓存，归档命令执行后会失效）"""
+    key = f'{BOUNDARY_KEY_PREFIX}{using}_{model._meta.db_table}'
+    cached = cache.get(key)
+    if cached is not None:
+        return cached or None
+
+    _, date_field = _category_for(model)
+    years = archive_years(model, using)
+    latest = None
+    if years:
+        qn = connections[using].ops.quote_name
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'SELECT MAX({qn(date_field)}) FROM {qn(archive_table(model, years[-1]))}')
+            value = cursor.fetchone()[0]
+        latest = date.fromisoformat(value) if value else None
+    # 用 False 表示"没有归档"，与缓存未命中的 None 区分
+    cache.set(key, latest or False, getattr(settings, 'ARCHIVE_BOUNDARY_CACHE_SECONDS', 300))
+    return latest
+
+
+def clear_boundary_cache(using):
+    for model, _ in ARCHIVE_SOURCES.values():
+        cache.delete(f'{BOUNDARY_KEY_PREFIX}{using}_{model._meta.db_table}')
+
+
+def needs_archive(model, start_date, using=None):
+    """查询范围 [start_date, ...] 是否涉及已归档的记录"""
+    if start_date is None:
+        return False
+    latest = archived_through(model, using or router.db_for_read(model) or DEFAULT_DB_ALIAS)
+    return latest is not None and start_date <= latest
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def archived_rows(model, fields, user, params, filters=None, limit=None):
+    """
+    列表查询的归档部分：返回用户在 params 的 start_date/end_date 范围内已归档的记录，
+    格式与 queryset.values_list(*fields) 相同，按模型默认排序（日期倒序）。
+    归档记录都早于热表中的记录，追加在热表结果之后即保持整体顺序。
+    未指定开始日期时只查询热表（params 需已由视图的 get_queryset 校验）。
+    """
+    start_date = _parse_date(params.get('start_date'))
+    end_date = _parse_date(params.get('end_date'))
+    using = router.db_for_read(model) or DEFAULT_DB_ALIAS
+    if (limit is not None and limit <= 0) or not needs_archive(model, start_date, using):
+        return []
+
+    _, date_field = _category_for(model)
+    years = [
+        year for year in archive_years(model, using)
+        if start_date.year <= year and (end_date is None or year <= end_date.year)
+    ]
+    if not years:
+        return []
+
+    qn = connections[using].ops.quote_name
+    conditions = ['user_id = %s', f'{qn(date_field)} >= %s']
+    condition_params = [user.id, start_date.isoformat()]
+    if end_date:
+        conditions.append(f'{qn(date_field)} <= %s')
+        condition_params.append(end_date.isoformat())
+    for column, value in (filters or {}).items():
+        if value:
+            conditions.append(f'{qn(column)} = %s')
+            condition_params.append(value)
+
+    where = ' AND '.join(conditions)
+    union = ' UNION ALL '.join(
+        f'SELECT {_select_list(connections[using], model, archive_table(model, year))} '
+        f'FROM {qn(archive_table(model, year))} WHERE {where}'
+        for year in years
+    )
+    ordering = ', '.join(
+        f'{qn(model._meta.get_field(name.lstrip("-")).column)} {"DESC" if name.startswith("-") else "ASC"}'
+        for name in model._meta.ordering
+    )
+    sql = f'SELECT * FROM ({union}) ORDER BY {ordering}'
+    query_params = condition_params * len(years)
+    if limit is not None:
+        sql += ' LIMIT %s'
+        query_params.append(limit)
+
+    # raw() 按模型字段转换数据库值（日期、带时区的时间等），与 values_list() 的结果类型一致
+    attnames = [model._meta.get_field(name).attname for name in fields]
+    return [
+        tuple(getattr(obj, attname) for attname in attnames)
+        for obj in model.objects.raw(sql, query_params, using=using)
+    ]
+
+
+def _select_list(connection, model, table):
+    """归档表的查询列，归档之后热表新增的列在旧归档表中不存在，按 NULL 返回"""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        existing = {info.name for info in connection.introspection.get_table_description(cursor, table)}
+    return ', '.join(
+        qn(column) if column in existing else f'NULL AS {qn(column)}' for column in _columns(model)
+    )
+
+
+def archived_daily_values(user, columns, start_date, end_date):
+    """长时间范围统计的归档部分：{汇总字段: {日期: 数值}}"""
+    rows = DailyRecordAggregate.objects.filter(
+        user=user, record_date__gte=start_date, record_date__lte=end_date
+    ).values_list('record_date', *columns)
+    values = {column: {} for column in columns}
+    for row in rows:
+        for column, value in zip(columns, row[1:]):
+            if value is not None:
+                values[column][row[0]] = value
+    return values
+
+
+def _ensure_archive_table(cursor, connection, model, table):
+    """创建归档表；热表之后新增的列同步添加到已有的归档表"""
+    qn = connection.ops.quote_name
+    source = model._meta.db_table
+    _, date_field = _category_for(model)
+    columns = _columns(model)
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {qn(table)} AS '
+        f'SELECT {", ".join(qn(column) for column in columns)} FROM {qn(source)} WHERE 0'
+    )
+    existing = {info.name for info in connection.introspection.get_table_description(cursor, table)}
+    for column in columns:
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE {qn(table)} ADD COLUMN {qn(column)}')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS {qn(table + "_user_date")} ON {qn(table)} (user_id, {qn(date_field)})')
+
+
+def _upsert_aggregates(cursor, connection, category, where, params):
+    """把范围内记录的每日汇总累加到 DailyRecordAggregate（同一天重复归档时数值相加）"""
+    qn = connection.ops.quote_name
+    model, date_field = ARCHIVE_SOURCES[category]
+    aggregates = AGGREGATE_COLUMNS[category]
+    all_columns = [column for columns in AGGREGATE_COLUMNS.values() for column in columns]
+    # 其他类别的字段：计数为0，数值为NULL
+    select = [
+        aggregates.get(column, '0' if column.endswith('_count') else 'NULL') for column in all_columns
+    ]
+    updates = ', '.join(
+        f'{qn(column)} = COALESCE({qn(column)} + excluded.{qn(column)}, {qn(column)}, excluded.{qn(column)})'
+        for column in aggregates
+    )
+    cursor.execute(
+        f'INSERT INTO {qn(DailyRecordAggregate._meta.db_table)} '
+        f'(user_id, record_date, {", ".join(qn(column) for column in all_columns)}) '
+        f'SELECT user_id, {qn(date_field)}, {", ".join(select)} FROM {qn(model._meta.db_table)} '
+        f'WHERE {where} GROUP BY user_id, {qn(date_field)} '
+        f'ON CONFLICT (user_id, record_date) DO UPDATE SET {updates}',
+        params
+    )
+
+
+def archive_category(category, cutoff, using, dry_run=False):
+    """把 using 数据库中该类别早于 cutoff 的记录按年份归档，返回 {年份: 行数}"""
+    model, date_field = ARCHIVE_SOURCES[category]
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise NotImplementedError('记录归档只支持 SQLite')
+    qn = connection.ops.quote_name
+    source = qn(model._meta.db_table)
+    where = f'{qn(date_field)} >= %s AND {qn(date_field)} < %s'
+
+    moved = {}
+    for year_start in model.objects.using(using).filter(**{f'{date_field}__lt': cutoff}).dates(date_field, 'year'):
+        params = [year_start.isoformat(), min(cutoff, date(year_start.year + 1, 1, 1)).isoformat()]
+        if dry_run:
+            moved[year_start.year] = model.objects.using(using).filter(**{
+                f'{date_field}__gte': params[0], f'{date_field}__lt': params[1]
+            }).count()
+            continue
+
+        table = archive_table(model, year_start.year)
+        column_list = ', '.join(qn(column) for column in _columns(model))
+        # 每年一个事务：汇总、复制、删除要么全部完成，要么全部回滚
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            _upsert_aggregates(cursor, connection, category, where, params)
+            _ensure_archive_table(cursor, connection, model, table)
+            cursor.execute(
+                f'INSERT INTO {qn(table)} ({column_list}) SELECT {column_list} FROM {source} WHERE {where}',
+                params
+            )
+            moved[year_start.year] = cursor.rowcount
+            # 原始 SQL 删除，不触发记录的 post_delete 信号（报告和目标进度保持不变）
+            cursor.execute(f'DELETE FROM {source} WHERE {where}', params)
+    return moved
+
+
+def purge_user_archives(user_id, using):
+    """删除 using 数据库各归档表中该用户的记录，返回删除的行数"""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    deleted = 0
+    with connection.cursor() as cursor:
+        for model, _ in ARCHIVE_SOURCES.values():
+            for year in archive_years(model, using):
+                cursor.execute(f'DELETE FROM {qn(archive_table(model, year))} WHERE user_id = %s', [user_id])
+                deleted += cursor.rowcount
+    if deleted:
+        clear_boundary_cache(using)
+    return deleted
+
+
+def archive_records(cutoff=None, categories=None, dry_run=False):
+    """
+    归档所有数据库（开启分片时为每个分片）中早于 cutoff 的记录
+    返回 [(数据库, 类别, 年份, 行数), ...]
+    """
+    cutoff = cutoff or archive_cutoff()
+    results = []
+    for alias in shard_aliases():
+        for category in categories or ARCHIVE_SOURCES:
+            model = ARCHIVE_SOURCES[category][0]
+            using = alias or router.db_for_write(model) or DEFAULT_DB_ALIAS
+            for year, count in archive_category(category, cutoff, using, dry_run).items():
+                results.append((using, category, year, count))
+            if not dry_run:
+                clear_boundary_cache(using)
+    return results
@@ -0,0 +1,214 @@
+"""
+异步（ASGI）只读视图
+与对应的同步 DRF 视图返回相同的数据，使用 Django 异步 ORM 和异步缓存，
+在 uvicorn 等 ASGI 服务器下等待数据库时不占用工作线程。
+首页聚合接口中相互独立的查询通过 asyncio.gather 并发执行。
+
+注意：SQLite 后端的异步 ORM 调用最终在同一个数据库线程中串行执行，
+并发收益主要来自慢客户端不再占用线程；换用支持并发连接的数据库后查询也可并行。
+"""
+import asyncio
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from .models import HealthReport
+from .renderers import FastJSONRenderer
+from .serializers import HealthGoalSerializer, HealthReportSerializer
+from .fast_serializers import (
+    SLEEP_FIELDS, EXERCISE_FIELDS, DIET_FIELDS,
+    format_sleep_rows, format_exercise_rows, format_diet_rows
+)
+from .db_routers import aread_alias_for, read_from
+from .sharding import activate_user_shard
+from .stats_cache import UserStatsCache
+from .token_auth import TokenAuthService
+from .views import (
+    get_week_range,
+    SleepRecordView, ExerciseRecordView, DietRecordView,
+    WeeklySleepStatsView, WeeklyExerciseStatsView, WeeklyDietStatsView,
+    HealthGoalView, HealthGoalStatsView, DashboardView
+)
+
+
+def json_response(data, status=200):
+    """使用项目的 JSON 渲染器输出响应"""
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+class AsyncTokenView(View):
+    """异步视图基类：Bearer Token 认证，未认证时与 DRF 视图一样返回 403"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        auth_header = request.META.get('HTTP_AUTHORIZATION', '')
+        user = None
+        if auth_header.startswith('Bearer '):
+            user = await TokenAuthService.averify_token(auth_header.split(' ')[1])
+
+        if user is None:
+            return json_response({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+        request.user = user
+        activate_user_shard(user)
+        # 异步视图都是只读接口，按读己之写规则选择读库
+        with read_from(await aread_alias_for(user)):
+            return await super().dispatch(request, *args, **kwargs)
+
+
+async def _values(queryset, fields):
+    return [row async for row in queryset.values_list(*fields)]
+
+
+async def _weekly_stats(view, category, user):
+    """异步读取（或计算并缓存）一周统计，统计计算本身复用同步视图的 build_stats"""
+    start_date, end_date = get_week_range()
+
+    async def build():
+        records = [record async for record in view.week_queryset(user, start_date, end_date)]
+        if category == 'diet':
+            return view.build_stats(records, start_date, end_date)
+        return view.build_stats(records)
+
+    return await UserStatsCache.aget_or_set(
+        user.id, UserStatsCache.weekly_stats_name(category, end_date), build
+    )
+
+
+async def _goal_list(user, params=None):
+    goals = [goal async for goal in HealthGoalView.get_queryset(user, params or {})]
+    return HealthGoalSerializer(goals, many=True).data
+
+
+async def _goal_stats(user):
+    # 目标统计包含多次查询和序列化器内的查询，整体放到同步线程执行
+    return await sync_to_async(HealthGoalStatsView.get_stats)(user)
+
+
+async def _serialize_report(report):
+    # 报告序列化包含同龄人对比（同步查询），放到同步线程执行
+    return await sync_to_async(lambda: HealthReportSerializer(report).data)()
+
+
+async def _latest_report(user):
+    # 与同步首页共用同一实现：不重算过期报告，只返回 is_stale 标记
+    return await sync_to_async(DashboardView.get_latest_report)(user)
+
+
+class AsyncSleepRecordListView(AsyncTokenView):
+    """睡眠记录列表（异步）"""
+
+    async def get(self, request):
+        try:
+            queryset = SleepRecordView.get_queryset(request.user, request.GET)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status=400)
+        records = format_sleep_rows(await _values(queryset, SLEEP_FIELDS))
+        records += format_sleep_rows(await sync_to_async(SleepRecordView.get_archived_rows)(request.user, request.GET))
+        return json_response({'records': records, 'total': len(records)})
+
+
+class AsyncExerciseRecordListView(AsyncTokenView):
+    """运动记录列表（异步）"""
+
+    async def get(self, request):
+        try:
+            queryset = ExerciseRecordView.get_queryset(request.user, request.GET)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status=400)
+        records = format_exercise_rows(await _values(queryset, EXERCISE_FIELDS))
+        records += format_exercise_rows(await sync_to_async(ExerciseRecordView.get_archived_rows)(request.user, request.GET))
+        return json_response({'records': records, 'total_count': len(records)})
+
+
+class AsyncDietRecordListView(AsyncTokenView):
+    """饮食记录列表（异步）"""
+
+    async def get(self, request):
+        try:
+            queryset = DietRecordView.get_queryset(request.user, request.GET)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status=400)
+        records = format_diet_rows(await _values(queryset, DIET_FIELDS))
+        records += format_diet_rows(await sync_to_async(DietRecordView.get_archived_rows)(
+            request.user, request.GET, limit=100 - len(records)
+        ))
+        return json_response({'records': records, 'total_count': len(records)})
+
+
+class AsyncWeeklyStatsView(AsyncTokenView):
+    """一周统计（异步），category 为 sleep/exercise/diet"""
+    category = None
+
+    STATS_VIEWS = {
+        'sleep': WeeklySleepStatsView,
+        'exercise': WeeklyExerciseStatsView,
+        'diet': WeeklyDietStatsView,
+    }
+
+    async def get(self, request):
+        view = self.STATS_VIEWS[self.category]()
+        return json_response(await _weekly_stats(view, self.category, request.user))
+
+
+class AsyncHealthReportLatestView(AsyncTokenView):
+    """最新健康报告（异步）"""
+
+    async def get(self, request):
+        data = await _latest_report(request.user)
+        if data is None:
+            return json_response({
+                'success': False,
+                'message': '暂无健康报告，请先生成报告'
+            }, status=404)
+        return json_response(data)
+
+
+class AsyncHealthReportDetailView(AsyncTokenView):
+    """健康报告详情（异步）"""
+
+    async def get(self, request, report_id):
+        report = await HealthReport.objects.filter(id=report_id, user=request.user).afirst()
+        if report is None:
+            return json_response({
+                'success': False,
+                'message': '健康报告不存在'
+            }, status=404)
+        return json_response(await _serialize_report(report))
+
+
+class AsyncHealthGoalListView(AsyncTokenView):
+    """健康目标列表（异步）"""
+
+    async def get(self, request):
+        goals = await _goal_list(request.user, request.GET)
+        return json_response({'success': True, 'goals': goals, 'total': len(goals)})
+
+
+class AsyncDashboardView(AsyncTokenView):
+    """首页数据聚合（异步），各部分并发获取"""
+
+    async def get(self, request):
+        user = request.user
+
+        fields = DashboardView.SECTIONS
+        fields_param = request.GET.get('fields')
+        if fields_param:
+            fields = list(dict.fromkeys(field.strip() for field in fields_param.split(',') if field.strip()))
+            unknown_fields = [field for field in fields if field not in DashboardView.SECTIONS]
+            if unknown_fields:
+                return json_response({
+                    'success': False,
+                    'message': f'不支持的字段: {", ".join(unknown_fields)}',
+                    'available_fields': DashboardView.SECTIONS
+                }, status=400)
+
+        builders = {
+            'sleep': lambda: _weekly_stats(WeeklySleepStatsView(), 'sleep', user),
+            'exercise': lambda: _weekly_stats(WeeklyExerciseStatsView(), 'exercise', user),
+            'diet': lambda: _weekly_stats(WeeklyDietStatsView(), 'diet', user),
+            'goals': lambda: _goal_list(user),
+            'goal_stats': lambda: _goal_stats(user),
+            'latest_report': lambda: _latest_report(user),
+        }
+        results = await asyncio.gather(*(builders[field]() for field in fields))
+
+        return json_response({'success': True, 'data': dict(zip(fields, results))})
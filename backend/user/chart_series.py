@@ -0,0 +1,171 @@
+"""
+图表数据序列
+在服务端按日/周/月分桶聚合记录，超过图表宽度时使用 LTTB 算法降采样，
+返回的数据点数量只与图表宽度有关，与历史记录长度无关
+"""
+from datetime import timedelta
+from django.db.models import Sum
+from .models import SleepRecord, ExerciseRecord, DietRecord
+from .archive import needs_archive, archived_daily_values
+
+
+# 指标 -> (模型, 日期字段, 数值字段, 换算系数, 单位)
+CHART_METRICS = {
+    'sleep_hours': (SleepRecord, 'sleep_date', 'sleep_duration', 1 / 60, '小时'),
+    'exercise_minutes': (ExerciseRecord, 'exercise_date', 'duration_minutes', 1, '分钟'),
+    'exercise_calories': (ExerciseRecord, 'exercise_date', 'calories_burned', 1, '千卡'),
+    'diet_calories': (DietRecord, 'diet_date', 'total_calories', 1, '千卡'),
+}
+
+# 指标 -> 已归档记录的每日汇总字段（DailyRecordAggregate）
+ARCHIVE_COLUMNS = {
+    'sleep_hours': 'sleep_minutes',
+    'exercise_minutes': 'exercise_minutes',
+    'exercise_calories': 'exercise_calories',
+    'diet_calories': 'diet_calories',
+}
+
+RESOLUTIONS = ['day', 'week', 'month']
+
+
+def bucket_start(day, resolution):
+    """返回日期所在分桶的起始日期"""
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    if resolution == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def choose_resolution(start_date, end_date, width):
+    """自动选择分桶粒度：在不超过图表宽度的前提下取最细的粒度"""
+    days = (end_date - start_date).days + 1
+    if days <= width:
+        return 'day'
+    if days / 7 <= width:
+        return 'week'
+    return 'month'
+
+
+def load_daily_values(user, metrics, start_date, end_date):
+    """
+    按天聚合各指标，同一模型的指标合并为一次 GROUP BY 查询
+    范围涉及已归档的记录时合并每日汇总表中的数值
+    返回 {指标: [(日期, 数值), ...]}（按日期升序，无记录的日期不返回）
+    """
+    by_model = {}
+    for metric in metrics:
+        model, date_field, value_field, _, _ = CHART_METRICS[metric]
+        by_model.setdefault((model, date_field), []).append(metric)
+
+    daily = {metric: [] for metric in metrics}
+    for (model, date_field), model_metrics in by_model.items():
+        rows = model.objects.filter(
+            user=user,
+            **{f'{date_field}__gte': start_date, f'{date_field}__lte': end_date}
+        ).order_by(date_field).values(date_field).annotate(
+            **{metric: Sum(CHART_METRICS[metric][2]) for metric in model_metrics}
+        )
+        for row in rows:
+            for metric in model_metrics:
+                if row[metric] is not None:
+                    daily[metric].append((row[date_field], row[metric] * CHART_METRICS[metric][3]))
+
+    archived = [metric for metric in metrics if needs_archive(CHART_METRICS[metric][0], start_date)]
+    if archived:
+        archived_values = archived_daily_values(
+            user, [ARCHIVE_COLUMNS[metric] for metric in archived], start_date, end_date
+        )
+        for metric in archived:
+            merged = dict(daily[metric])
+            for day, value in archived_values[ARCHIVE_COLUMNS[metric]].items():
+                merged[day] = merged.get(day, 0) + value * CHART_METRICS[metric][3]
+            daily[metric] = sorted(merged.items())
+    return daily
+
+
+def bucket_values(daily_values, resolution):
+    """将每日数值分桶，返回 [(分桶起始日期, 平均值, 最小值, 最大值, 天数), ...]"""
+    buckets = {}
+    for day, value in daily_values:
+        buckets.setdefault(bucket_start(day, resolution), []).append(value)
+
+    return [
+        (start, sum(values) / len(values), min(values), max(values), len(values))
+        for start, values in sorted(buckets.items())
+    ]
+
+
+def lttb(points, threshold, x=lambda p: p[0], y=lambda p: p[1]):
+    """
+    Largest-Triangle-Three-Buckets 降采样
+    保留首尾点，每个区间选取与相邻区间构成三角形面积最大的点，保持曲线形状
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # 下一个区间的平均点
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        next_range = points[next_start:next_end]
+        avg_x = sum(x(p) for p in next_range) / len(next_range)
+        avg_y = sum(y(p) for p in next_range) / len(next_range)
+
+        # 当前区间中面积最大的点
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        point_a = points[a]
+        max_area = -1
+        max_index = range_start
+        for j in range(range_start, range_end):
+            area = abs(
+                (x(point_a) - avg_x) * (y(points[j]) - y(point_a))
+                - (x(point_a) - x(points[j])) * (avg_y - y(point_a))
+            )
+            if area > max_area:
+                max_area = area
+                max_index = j
+
+        sampled.append(points[max_index])
+        a = max_index
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def build_chart_series(user, metrics, start_date, end_date, resolution='auto', width=200):
+    """
+    构建图表数据序列
+    每个指标返回 points: [[分桶起始日期, 平均值, 最小值, 最大值, 天数], ...]，点数不超过 width
+    """
+    if resolution == 'auto':
+        resolution = choose_resolution(start_date, end_date, width)
+
+    daily = load_daily_values(user, metrics, start_date, end_date)
+
+    series = {}
+    for metric in metrics:
+        buckets = bucket_values(daily[metric], resolution)
+        downsampled = len(buckets) > width
+        if downsampled:
+            buckets = lttb(buckets, width, x=lambda b: b[0].toordinal(), y=lambda b: b[1])
+        series[metric] = {
+            'unit': CHART_METRICS[metric][4],
+            'downsampled': downsampled,
+            'points': [
+                [start.isoformat(), round(avg, 2), round(low, 2), round(high, 2), days]
+                for start, avg, low, high, days in buckets
+            ],
+        }
+
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'resolution': resolution,
+        'series': series,
+    }
@@ -0,0 +1,373 @@
+"""
+群体健康数据分析
+计算全体学生睡眠、运动、饮食和综合评分的分位数分布与直方图，
+供后台仪表板和学生健康报告做"同伴对比"
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+from .models import SleepRecord, ExerciseRecord, DietRecord, HealthReport
+from .sharding import iterate_shards
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖，缺失时使用纯Python实现
+    np = None
+
+
+COHORT_CACHE_PREFIX = 'cohort_analytics_'
+COHORT_CACHE_TTL = 600  # 10分钟
+DEFAULT_WEEKS = 12
+
+PERCENTILES = (10, 50, 90)
+DECILES = tuple(range(0, 101, 10))
+
+# 指标定义：标签、每周聚合方式（mean=日均值，sum=周总量）、直方图分箱
+COHORT_METRICS = {
+    'sleep_hours': {
+        'label': '睡眠时长（小时）',
+        'weekly': 'mean',
+        'bins': [0, 4, 5, 6, 7, 8, 9, 10, 24],
+    },
+    'exercise_minutes': {
+        'label': '每周运动时长（分钟）',
+        'weekly': 'sum',
+        'bins': [0, 30, 60, 90, 150, 210, 300, 420, 10080],
+    },
+    'calorie_intake': {
+        'label': '每日卡路里摄入（千卡）',
+        'weekly': 'mean',
+        'bins': [0, 1000, 1500, 1800, 2200, 2500, 3000, 20000],
+    },
+    'overall_score': {
+        'label': '综合健康评分',
+        'weekly': 'mean',
+        'bins': [0, 60, 70, 80, 90, 101],
+    },
+}
+
+
+def get_cohort_summary(weeks=DEFAULT_WEEKS, refresh=False):
+    """获取群体分布摘要（带TTL缓存）"""
+    cache_key = f"{COHORT_CACHE_PREFIX}{weeks}"
+    if not refresh:
+        summary = cache.get(cache_key)
+        if summary is not None:
+            return summary
+
+    summary = build_cohort_summary(weeks)
+    cache.set(cache_key, summary, COHORT_CACHE_TTL)
+    return summary
+
+
+def get_cached_cohort_summary(weeks=DEFAULT_WEEKS):
+    """只读取缓存中的群体分布摘要，未命中时返回 None（页面请求中不同步计算，由命令或刷新按钮预热）"""
+    return cache.get(f"{COHORT_CACHE_PREFIX}{weeks}")
+
+
+def build_cohort_summary(weeks=DEFAULT_WEEKS):
+    """基于按日预聚合的数据计算群体分布"""
+    end_date = date.today()
+    # 以周一为周起点，包含本周在内共 weeks 周
+    start_date = end_date - timedelta(days=end_date.weekday()) - timedelta(weeks=weeks - 1)
+
+    daily_data = _load_daily_data(start_date, end_date)
+    compute = _compute_metric_numpy if np is not None else _compute_metric_python
+
+    metrics = {}
+    student_ids = set()
+    for metric, config in COHORT_METRICS.items():
+        user_ids, day_offsets, values = daily_data[metric]
+        student_ids.update(user_ids)
+        metrics[metric] = {
+            'label': config['label'],
+            **compute(user_ids, day_offsets, values, config, weeks),
+        }
+
+    # 补充周起始日期
+    for metric_data in metrics.values():
+        for week in metric_data['weekly']:
+            week['week_start'] = (start_date + timedelta(weeks=week.pop('week_index'))).isoformat()
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'period_start': start_date.isoformat(),
+        'period_end': end_date.isoformat(),
+        'weeks': weeks,
+        'student_count': len(student_ids),
+        'engine': 'numpy' if np is not None else 'python',
+        'metrics': metrics,
+    }
+
+
+def get_peer_percentile(summary, metric, value):
+    """根据群体十分位数估算某个数值在同伴中的百分位（0-100）"""
+    metric_data = (summary or {}).get('metrics', {}).get(metric)
+    if value is None or not metric_data or not metric_data.get('deciles'):
+        return None
+
+    deciles = metric_data['deciles']
+    if value <= deciles[0]:
+        return 0
+    if value >= deciles[-1]:
+        return 100
+
+    # 在相邻十分位之间线性插值
+    index = bisect_right(deciles, value) - 1
+    lower, upper = deciles[index], deciles[index + 1]
+    fraction = (value - lower) / (upper - lower) if upper > lower else 0
+    return round((index + fraction) * 10, 1)
+
+
+def get_report_peer_comparison(report, summary=None):
+    """
+    计算健康报告各项指标在同伴中的百分位
+    群体摘要只从缓存读取（由后台视图或 refresh_cohort_analytics 命令计算），未命中时返回 None；
+    报告没有数据摘要时同样返回 None。周期内没有记录的分类不计算百分位（平均值0不代表最低水平）
+    """
+    summary = summary or get_cached_cohort_summary()
+    data_summary = report.get_data_summary_dict()
+    if summary is None or not data_summary:
+        return None
+    exercise_analysis = report.get_detailed_analysis_dict().get('exercise_analysis', {})
+    period_days = (report.period_end - report.period_start).days + 1
+
+    # 报告中的运动总时长折算为每周运动时长，与群体口径一致
+    weekly_exercise_minutes = None
+    if 'total_exercise_time' in exercise_analysis and data_summary.get('exercise_days'):
+        weekly_exercise_minutes = exercise_analysis['total_exercise_time'] * 7 / period_days
+
+    values = {
+        'sleep_hours': data_summary.get('avg_sleep_hours') if data_summary.get('sleep_days') else None,
+        'exercise_minutes': weekly_exercise_minutes,
+        'calorie_intake': data_summary.get('avg_calories_intake') if data_summary.get('diet_days') else None,
+        'overall_score': report.overall_score,
+    }
+
+    return {
+        metric: {
+            'value': round(value, 1) if value is not None else None,
+            'percentile': get_peer_percentile(summary, metric, value),
+            'cohort_median': summary['metrics'][metric]['percentiles']['p50'],
+        }
+        for metric, value in values.items()
+    }
+
+
+def _load_daily_data(start_date, end_date):
+    """
+    从数据库加载按 (用户, 日期) 预聚合的数据
+    返回 {指标: (用户ID, 日期偏移, 数值)}；安装 NumPy 时三列直接转换为类型化数组，否则为列表
+    """
+    def columns(rows, scale=1):
+        rows = list(rows)
+        user_ids, days, values = zip(*rows) if rows else ((), (), ())
+        if np is None:
+            start_ordinal = start_date.toordinal()
+            return (list(user_ids), [day.toordinal() - start_ordinal for day in days],
+                    [value / scale for value in values])
+        return (
+            np.fromiter(user_ids, dtype=np.int64, count=len(rows)),
+            (np.array(days, dtype='datetime64[D]') - np.datetime64(start_date, 'D')).astype(np.int64),
+            np.fromiter(values, dtype=np.float64, count=len(rows)) / scale,
+        )
+
+    # 空值在数据库中过滤，结果行可以直接按列转换
+    sleep_rows = SleepRecord.objects.filter(
+        sleep_date__range=[start_date, end_date]
+    ).values_list('user_id', 'sleep_date').annotate(value=Sum('sleep_duration')).filter(
+        value__isnull=False
+    ).order_by()
+
+    exercise_rows = ExerciseRecord.objects.filter(
+        exercise_date__range=[start_date, end_date]
+    ).values_list('user_id', 'exercise_date').annotate(value=Sum('duration_minutes')).filter(
+        value__isnull=False
+    ).order_by()
+
+    diet_rows = DietRecord.objects.filter(
+        diet_date__range=[start_date, end_date]
+    ).values_list('user_id', 'diet_date').annotate(value=Sum('total_calories')).filter(
+        value__isnull=False
+    ).order_by()
+
+    report_rows = HealthReport.objects.filter(
+        period_end__range=[start_date, end_date], overall_score__isnull=False
+    ).values_list('user_id', 'period_end', 'overall_score').order_by()
+
+    # 按用户分组的聚合在各分片内完成（同一用户的数据只在一个分片中），结果直接拼接
+    return {
+        'sleep_hours': columns(iterate_shards(sleep_rows), scale=60),
+        'exercise_minutes': columns(iterate_shards(exercise_rows)),
+        'calorie_intake': columns(iterate_shards(diet_rows)),
+        'overall_score': columns(iterate_shards(report_rows)),
+    }
+
+
+def _compute_metric_numpy(user_ids, day_offsets, values, config, weeks):
+    """NumPy向量化实现：一次遍历完成学生级与周级的分布计算"""
+    bins = np.asarray(config['bins'], dtype=np.float64)
+    if len(values) == 0:
+        return _empty_metric(list(config['bins']), weeks)
+
+    users = np.asarray(user_ids, dtype=np.int64)
+    week_index = np.asarray(day_offsets, dtype=np.int64) // 7
+    data = np.asarray(values, dtype=np.float64)
+
+    # 学生编号压缩为连续下标，(周, 学生) 组合成一维键
+    _, user_index = np.unique(users, return_inverse=True)
+    student_count = int(user_index.max()) + 1
+    cell = week_index * student_count + user_index
+    cell_sum = np.bincount(cell, weights=data, minlength=weeks * student_count)
+    cell_count = np.bincount(cell, minlength=weeks * student_count)
+    has_data = cell_count > 0
+
+    if config['weekly'] == 'sum':
+        cell_value = cell_sum
+    else:
+        cell_value = np.divide(cell_sum, cell_count, out=np.zeros_like(cell_sum), where=has_data)
+
+    # 学生级数值：日均值指标取全部记录均值，周总量指标取周均值
+    student_sum = np.bincount(user_index, weights=data, minlength=student_count)
+    if config['weekly'] == 'sum':
+        student_values = student_sum / weeks
+    else:
+        student_values = student_sum / np.bincount(user_index, minlength=student_count)
+
+    # 周级分布：按 (周, 数值) 排序后对每组做分位数插值
+    cell_week = np.nonzero(has_data)[0] // student_count
+    week_values = cell_value[has_data]
+    order = np.lexsort((week_values, cell_week))
+    sorted_weeks = cell_week[order]
+    sorted_values = week_values[order]
+    group_start = np.searchsorted(sorted_weeks, np.arange(weeks), side='left')
+    group_count = np.searchsorted(sorted_weeks, np.arange(weeks), side='right') - group_start
+
+    weekly_percentiles = {}
+    for p in PERCENTILES:
+        weekly_percentiles[p] = _grouped_percentile(sorted_values, group_start, group_count, p / 100)
+
+    weekly_histogram, _, _ = np.histogram2d(
+        cell_week, np.clip(week_values, bins[0], bins[-1]),
+        bins=[np.arange(weeks + 1), bins]
+    )
+
+    weekly = []
+    for week in range(weeks):
+        weekly.append({
+            'week_index': week,
+            'count': int(group_count[week]),
+            **{f'p{p}': _round(weekly_percentiles[p][week]) if group_count[week] else None for p in PERCENTILES},
+            'histogram': weekly_histogram[week].astype(int).tolist(),
+        })
+
+    histogram, _ = np.histogram(np.clip(student_values, bins[0], bins[-1]), bins=bins)
+    deciles = np.percentile(student_values, DECILES)
+
+    return {
+        'count': student_count,
+        'percentiles': {f'p{p}': _round(np.percentile(student_values, p)) for p in PERCENTILES},
+        'deciles': [_round(value) for value in deciles],
+        'histogram': {'bins': list(config['bins']), 'counts': histogram.astype(int).tolist()},
+        'weekly': weekly,
+    }
+
+
+def _grouped_percentile(sorted_values, group_start, group_count, q):
+    """对已按组排序的数组计算每组的线性插值分位数"""
+    position = group_start + np.maximum(group_count - 1, 0) * q
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, group_start + np.maximum(group_count - 1, 0))
+    lower = np.minimum(lower, len(sorted_values) - 1)
+    upper = np.minimum(upper, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def _compute_metric_python(user_ids, day_offsets, values, config, weeks):
+    """纯Python实现（未安装NumPy时使用），结果与向量化实现一致"""
+    bins = list(config['bins'])
+    if not values:
+        return _empty_metric(bins, weeks)
+
+    cell_sum = defaultdict(float)
+    cell_count = defaultdict(int)
+    student_sum = defaultdict(float)
+    student_count = defaultdict(int)
+    for user_id, day_offset, value in zip(user_ids, day_offsets, values):
+        cell = (day_offset // 7, user_id)
+        cell_sum[cell] += value
+        cell_count[cell] += 1
+        student_sum[user_id] += value
+        student_count[user_id] += 1
+
+    week_values = defaultdict(list)
+    for cell, total in cell_sum.items():
+        value = total if config['weekly'] == 'sum' else total / cell_count[cell]
+        week_values[cell[0]].append(value)
+
+    if config['weekly'] == 'sum':
+        student_values = sorted(total / weeks for total in student_sum.values())
+    else:
+        student_values = sorted(student_sum[u] / student_count[u] for u in student_sum)
+
+    weekly = []
+    for week in range(weeks):
+        week_data = sorted(week_values.get(week, []))
+        weekly.append({
+            'week_index': week,
+            'count': len(week_data),
+            **{f'p{p}': _round(_percentile(week_data, p)) if week_data else None for p in PERCENTILES},
+            'histogram': _histogram(week_data, bins),
+        })
+
+    return {
+        'count': len(student_values),
+        'percentiles': {f'p{p}': _round(_percentile(student_values, p)) for p in PERCENTILES},
+        'deciles': [_round(_percentile(student_values, p)) for p in DECILES],
+        'histogram': {'bins': bins, 'counts': _histogram(student_values, bins)},
+        'weekly': weekly,
+    }
+
+
+def _percentile(sorted_values, p):
+    """线性插值分位数（与 numpy.percentile 默认算法一致）"""
+    position = (len(sorted_values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _histogram(values, bins):
+    """按分箱统计数量，超出范围的值计入首尾分箱"""
+    counts = [0] * (len(bins) - 1)
+    for value in values:
+        index = min(max(bisect_right(bins, value) - 1, 0), len(counts) - 1)
+        counts[index] += 1
+    return counts
+
+
+def _empty_metric(bins, weeks):
+    """无数据时的指标结构"""
+    return {
+        'count': 0,
+        'percentiles': {f'p{p}': None for p in PERCENTILES},
+        'deciles': [],
+        'histogram': {'bins': bins, 'counts': [0] * (len(bins) - 1)},
+        'weekly': [
+            {
+                'week_index': week,
+                'count': 0,
+                **{f'p{p}': None for p in PERCENTILES},
+                'histogram': [0] * (len(bins) - 1),
+            }
+            for week in range(weeks)
+        ],
+    }
+
+
+def _round(value):
+    return round(float(value), 1)
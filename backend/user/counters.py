@@ -0,0 +1,168 @@
+"""
+后台统计计数器
+管理主页需要的用户数、各类记录数、报告数和目标数保存在 SystemCounter 中，
+读取时一次查询得到所有数字，与表的大小无关：
+- 写入：信号在事务提交后增减总数和记录日期对应的每日数量（事务回滚或重试不会重复计数）
+- 校准：bulk_create、update() 和原始 SQL 不触发信号，reconcile() 按实际数据重建计数器，
+  由 reconcile_counters 命令定期执行；从未校准过的计数项在首次写入或读取时自动校准
+已归档的记录（archive.py）仍计入总数，校准时从 DailyRecordAggregate 的每日记录数补回。
+"""
+from collections import Counter
+from datetime import date, timedelta
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from .models import (
+    User, SleepRecord, ExerciseRecord, DietRecord, HealthReport, HealthGoal, DailyRecordAggregate, SystemCounter
+)
+from .sharding import shard_aliases, is_sharded
+
+
+# 计数项 -> (模型, 按天计数的日期字段, 归档汇总中的记录数字段)
+COUNTERS = {
+    'user': (User, None, None),
+    'sleep_record': (SleepRecord, 'sleep_date', 'sleep_count'),
+    'exercise_record': (ExerciseRecord, 'exercise_date', 'exercise_count'),
+    'diet_record': (DietRecord, 'diet_date', 'diet_count'),
+    'health_report': (HealthReport, None, None),
+    'health_goal': (HealthGoal, None, None),
+}
+
+COUNTER_NAMES = {model: name for name, (model, _, _) in COUNTERS.items()}
+
+
+def counted_date_field(model):
+    """按天计数的日期字段，只统计总数的模型返回 None"""
+    return COUNTERS[COUNTER_NAMES[model]][1]
+
+
+def is_counted(model, using):
+    """
+    是否计入该次写入：未分片的模型只计主库中的写入
+    （用户表会同步一份到所在分片，分片中的副本不重复计数）
+    """
+    return model in COUNTER_NAMES and (using == DEFAULT_DB_ALIAS or is_sharded(model))
+
+
+def counter_changes(model, delta, record_date=None, previous_date=None):
+    """一次写入对计数器的增减：{(计数项, 日期): 增量}，日期为 None 表示总数"""
+    name = COUNTER_NAMES[model]
+    changes = Counter()
+    if delta:
+        changes[(name, None)] += delta
+        if record_date is not None:
+            changes[(name, record_date)] += delta
+    elif previous_date is not None and previous_date != record_date:
+        # 修改了记录日期：从旧日期移到新日期
+        changes[(name, previous_date)] -= 1
+        changes[(name, record_date)] += 1
+    return changes
+
+
+def _bump(name, day, delta):
+    """增减一个计数器，返回是否存在该行"""
+    return bool(SystemCounter.objects.filter(name=name, day=day).update(value=F('value') + delta))
+
+
+def apply_changes(changes):
+    """
+    增减计数器：总数行不存在（从未校准）时按实际数据校准该计数项，
+    每日行不存在时（新的日期）创建
+    """
+    for name in {name for name, _ in changes}:
+        total_delta = changes.get((name, None))
+        if total_delta and not _bump(name, None, total_delta):
+            reconcile([name])
+            continue
+        for (counter_name, day), delta in changes.items():
+            if counter_name != name or day is None or not delta or _bump(name, day, delta):
+                continue
+            try:
+                with transaction.atomic():
+                    SystemCounter.objects.create(name=name, day=day, value=delta)
+            except IntegrityError:
+                # 并发写入已经创建了该行
+                _bump(name, day, delta)
+
+
+def record_change(model, using, delta, record_date=None, previous_date=None):
+    """在 using 数据库的当前事务提交后更新计数器（由信号调用）"""
+    if not is_counted(model, using):
+        return
+    changes = counter_changes(model, delta, record_date, previous_date)
+    if changes:
+        transaction.on_commit(lambda: apply_changes(changes), using=using)
+
+
+def _actual_counts(name):
+    """按实际数据统计某一计数项：(总数, {日期: 数量})，包括所有分片和已归档的记录"""
+    model, date_field, archived_field = COUNTERS[name]
+    aliases = shard_aliases() if is_sharded(model) else [DEFAULT_DB_ALIAS]
+    total = 0
+    daily = Counter()
+    for alias in aliases:
+        queryset = model._base_manager.using(alias)
+        if date_field is None:
+            total += queryset.count()
+            continue
+        for row in queryset.order_by().values(date_field).annotate(count=Count('pk')):
+            daily[row[date_field]] += row['count']
+        if archived_field:
+            archived = DailyRecordAggregate._base_manager.using(alias).filter(**{f'{archived_field}__gt': 0})
+            for row in archived.order_by().values('record_date').annotate(count=Sum(archived_field)):
+                daily[row['record_date']] += row['count']
+    if date_field is not None:
+        total = sum(daily.values())
+    return total, daily
+
+
+def reconcile(names=None):
+    """按实际数据重建计数器，返回 {计数项: (原总数, 实际总数)}"""
+    results = {}
+    for name in names or COUNTERS:
+        total, daily = _actual_counts(name)
+        rows = [SystemCounter(name=name, day=None, value=total)]
+        rows += [SystemCounter(name=name, day=day, value=count) for day, count in daily.items() if count]
+        with transaction.atomic():
+            previous = SystemCounter.objects.filter(name=name, day=None).values_list('value', flat=True).first()
+            SystemCounter.objects.filter(name=name).delete()
+            SystemCounter.objects.bulk_create(rows)
+        results[name] = (previous, total)
+    return results
+
+
+def counter_total(name):
+    """某一计数项的总数（单行查询），从未校准过时先校准"""
+    totals = SystemCounter.objects.filter(name=name, day=None).values_list('value', flat=True)
+    value = totals.first()
+    if value is None:
+        reconcile([name])
+        value = totals.first()
+    return value
+
+
+def dashboard_counts(today=None, days=7):
+    """
+    管理主页的统计数字：总数、今日数量和最近 days 天（含今日之后）的数量
+    返回 {计数项: {'total': .., 'today': .., 'week': ..}}
+    """
+    today = today or date.today()
+    since = today - timedelta(days=days)
+    counters = SystemCounter.objects.filter(Q(day__isnull=True) | Q(day__gte=since)).values_list('name', 'day', 'value')
+    rows = list(counters)
+    missing = set(COUNTERS) - {name for name, day, _ in rows if day is None}
+    if missing:
+        # 从未校准过的计数项（如刚完成迁移），先按实际数据建立计数器
+        reconcile(missing)
+        rows = list(counters)
+
+    counts = {name: {'total': 0, 'today': 0, 'week': 0} for name in COUNTERS}
+    for name, day, value in rows:
+        if name not in counts:
+            continue
+        if day is None:
+            counts[name]['total'] = value
+            continue
+        counts[name]['week'] += value
+        if day == today:
+            counts[name]['today'] += value
+    return counts
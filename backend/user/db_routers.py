@@ -0,0 +1,143 @@
+"""
+主库/只读副本路由
+写入始终走主库（default）；统计、报告和列表等读视图通过 ReplicaReadMixin 把本次请求的读查询
+分配到 DATABASE_REPLICAS 中的某个副本。用户写入后 READ_YOUR_WRITES_SECONDS 秒内的读请求仍走主库，
+保证用户能立即看到自己刚写入的数据（副本延迟需小于该时间）。
+未使用 ReplicaReadMixin 的视图、管理命令和后台任务的读查询都走主库。
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+from .sharding import get_shards, is_sharded, shard_for_user, current_shard
+
+
+# 这些应用的数据（session、认证）必须读到最新值，始终走主库
+PRIMARY_ONLY_APPS = ['sessions', 'auth', 'contenttypes', 'authtoken']
+
+PIN_KEY_PREFIX = 'primary_pin_'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def mark_user_write(user_id):
+    """记录用户刚刚写入，之后一段时间内该用户的读请求走主库"""
+    cache.set(f'{PIN_KEY_PREFIX}{user_id}', True, getattr(settings, 'READ_YOUR_WRITES_SECONDS', 10))
+
+
+def read_alias_for(user):
+    """为用户的读请求选择数据库：无副本或用户刚写入过时返回主库，否则随机选择一个副本"""
+    replicas = get_replicas()
+    if not replicas or cache.get(f'{PIN_KEY_PREFIX}{user.id}'):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+async def aread_alias_for(user):
+    """read_alias_for 的异步版本"""
+    replicas = get_replicas()
+    if not replicas or await cache.aget(f'{PIN_KEY_PREFIX}{user.id}'):
+        return DEFAULT_DB_ALIAS
+    return random.choice(replicas)
+
+
+@contextmanager
+def read_from(alias):
+    """在代码块内把读查询路由到指定数据库"""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaReadMixin:
+    """
+    APIView 混入类：认证后为 GET/HEAD/OPTIONS 请求选择读库
+    同一视图的写方法（POST/PUT/DELETE）不受影响
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with read_from(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            _read_alias.set(read_alias_for(request.user))
+
+
+class PrimaryReplicaRouter:
+    """主库/只读副本路由"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本是主库的文件副本，不单独迁移
+        if db in get_replicas():
+            return False
+        return None
+
+
+class UserShardRouter:
+    """
+    按用户分片路由（见 sharding.py），放在 PrimaryReplicaRouter 之前
+    分片模型依次按以下信息确定分片：实例已保存在的分片、实例所属用户、当前请求的分片；
+    其他模型返回 None，交给后续路由
+    """
+
+    def _shard_for_instance(self, instance):
+        if instance is None:
+            return None
+        if instance._state.db in get_shards():
+            return instance._state.db
+        user_id = getattr(instance, 'user_id', None)
+        if user_id is None and 'goal' in instance._state.fields_cache:
+            user_id = instance.goal.user_id
+        if user_id is None and instance._meta.model_name == 'user':
+            user_id = instance.pk
+        return shard_for_user(user_id)
+
+    def _db_for_model(self, model, hints):
+        if not is_sharded(model):
+            return None
+        return self._shard_for_instance(hints.get('instance')) or current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_model(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_model(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 用户表在主库和各分片中都有，分片模型可以关联任一副本中的用户对象
+        shards = get_shards()
+        if not shards:
+            return None
+        databases = {DEFAULT_DB_ALIAS, *shards}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 分片包含完整的表结构（用户表需要在分片中保存一份），不做限制
+        return None
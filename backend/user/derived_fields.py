@@ -0,0 +1,124 @@
+"""
+派生字段
+睡眠时长、运动消耗卡路里和饮食总卡路里由记录的其他字段计算得到。单条保存时由模型的
+compute_derived_fields() 计算；DerivedFieldsQuerySet 让批量写入得到同样的结果：
+- bulk_create / bulk_update：写入前对每个对象调用 compute_derived_fields()
+- update()：修改了来源字段时，在同一事务中用数据库表达式重新计算受影响行的派生字段
+模型通过 DERIVED_FIELDS（派生字段 -> 来源字段）和 derived_field_expressions() 声明派生字段，
+派生字段按声明顺序计算，可以依赖前面的派生字段（如睡眠质量评分依赖睡眠时长）。
+数据库表达式与 Python 计算逐项对应，迁移中的历史数据回填也使用这些表达式。
+"""
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Cast, ExtractHour, ExtractMinute, ExtractSecond
+
+
+# update() 重新计算派生字段时每批的主键数量（低于 SQLite 的参数个数限制）
+UPDATE_BATCH_SIZE = 500
+
+
+def _seconds_of_day(field):
+    return ExtractHour(field) * 3600 + ExtractMinute(field) * 60 + ExtractSecond(field)
+
+
+def sleep_duration_expression():
+    """睡眠时长（分钟），起床时间早于入睡时间时按跨日计算"""
+    seconds = _seconds_of_day('wake_time') - _seconds_of_day('bedtime')
+    return Case(
+        When(wake_time__lt=F('bedtime'), then=(seconds + 86400) / 60),
+        default=seconds / 60,
+        output_field=models.IntegerField(),
+    )
+
+
+def sleep_quality_score_expression():
+    """睡眠质量评分，与 SleepRecord.quality_score_for_duration 相同的分段（按分钟比较）"""
+    return Case(
+        When(Q(sleep_duration__isnull=True) | Q(sleep_duration=0), then=Value(0)),
+        When(sleep_duration__gte=7 * 60, sleep_duration__lte=9 * 60, then=Value(100)),
+        When(Q(sleep_duration__gte=6 * 60, sleep_duration__lt=7 * 60)
+             | Q(sleep_duration__gt=9 * 60, sleep_duration__lte=10 * 60), then=Value(80)),
+        When(Q(sleep_duration__gte=5 * 60, sleep_duration__lt=6 * 60)
+             | Q(sleep_duration__gt=10 * 60, sleep_duration__lte=11 * 60), then=Value(60)),
+        When(Q(sleep_duration__gte=4 * 60, sleep_duration__lt=5 * 60)
+             | Q(sleep_duration__gt=11 * 60, sleep_duration__lte=12 * 60), then=Value(40)),
+        default=Value(20),
+        output_field=models.IntegerField(),
+    )
+
+
+def exercise_calories_expression(met_values, weight_kg=65):
+    """未手动填写（为空或0）的运动消耗卡路里：MET × 体重 × 时长(分钟) / 60"""
+    met = Case(
+        *[When(exercise_type=exercise_type, then=Value(value)) for exercise_type, value in met_values.items()],
+        default=Value(5.0),
+        output_field=models.FloatField(),
+    )
+    return Case(
+        When(
+            (Q(calories_burned__isnull=True) | Q(calories_burned=0)) & Q(duration_minutes__gt=0),
+            then=Cast(met * weight_kg * F('duration_minutes') / 60.0, models.IntegerField()),
+        ),
+        default=F('calories_burned'),
+        output_field=models.IntegerField(),
+    )
+
+
+def diet_total_calories_expression():
+    """
+    饮食总卡路里：分量 × 每100g卡路里 / 100（整数除法，与 int() 截断一致）
+    分量或每100g卡路里为0时与 save() 一样保留原值
+    """
+    return Case(
+        When(portion_size__gt=0, calories_per_100g__gt=0,
+             then=F('portion_size') * F('calories_per_100g') / 100),
+        default=F('total_calories'),
+        output_field=models.IntegerField(),
+    )
+
+
+class DerivedFieldsQuerySet(models.QuerySet):
+    """批量写入时维护派生字段的查询集"""
+
+    def _derived_fields_for(self, fields):
+        """来源字段在 fields 中的派生字段"""
+        fields = set(fields)
+        return [
+            derived for derived, sources in self.model.DERIVED_FIELDS.items()
+            if fields.intersection(sources)
+        ]
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.compute_derived_fields()
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.compute_derived_fields()
+        fields = list(fields)
+        fields += [derived for derived in self._derived_fields_for(fields) if derived not in fields]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        # 直接赋值的派生字段以赋值为准，除非它也是自己的来源字段（如清空手动填写的卡路里后重新计算）
+        derived = [
+            field for field in self._derived_fields_for(kwargs)
+            if field not in kwargs or field in self.model.DERIVED_FIELDS[field]
+        ]
+        if not derived:
+            return super().update(**kwargs)
+
+        # 先记录受影响的行：更新来源字段后原来的筛选条件可能不再匹配
+        expressions = self.model.derived_field_expressions()
+        with transaction.atomic(using=self.db, savepoint=False):
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+            for start in range(0, len(pks), UPDATE_BATCH_SIZE):
+                batch = self.model._base_manager.using(self.db).filter(pk__in=pks[start:start + UPDATE_BATCH_SIZE])
+                # 每个派生字段单独更新，后面的字段读到前面字段的新值
+                for field in derived:
+                    batch.update(**{field: expressions[field]})
+        return rows
@@ -0,0 +1,136 @@
+"""
+记录列表的快速只读序列化
+基于 values_list() 行和预先计算的查找表生成与 DRF 序列化器完全相同的 JSON 结构，
+避免逐行、逐字段运行 SerializerMethodField 等字段机制。
+只用于列表读取，写入和校验仍使用 serializers.py 中的序列化器。
+"""
+from django.utils import timezone
+from .models import SleepRecord, ExerciseRecord, DietRecord
+
+
+# 查找表
+EXERCISE_TYPE_DISPLAY = dict(ExerciseRecord.EXERCISE_TYPES)
+EXERCISE_INTENSITY = {
+    exercise_type: ExerciseRecord.intensity_for_type(exercise_type)
+    for exercise_type, _ in ExerciseRecord.EXERCISE_TYPES
+}
+DEFAULT_EXERCISE_INTENSITY = ExerciseRecord.intensity_for_type(None)
+MEAL_TYPE_DISPLAY = dict(DietRecord.MEAL_TYPES)
+
+SLEEP_FIELDS = ['id', 'sleep_date', 'bedtime', 'wake_time', 'sleep_duration', 'quality_score', 'created_at', 'updated_at']
+EXERCISE_FIELDS = [
+    'id', 'exercise_date', 'exercise_type', 'duration_minutes', 'calories_burned',
+    'notes', 'created_at', 'updated_at'
+]
+DIET_FIELDS = [
+    'id', 'diet_date', 'meal_type', 'food_name', 'portion_size', 'calories_per_100g',
+    'total_calories', 'notes', 'created_at', 'updated_at'
+]
+
+
+def _iso(value):
+    """日期/时间按 DRF 默认的 ISO 8601 格式输出"""
+    return value.isoformat() if value is not None else None
+
+
+def _datetime_formatter():
+    """
+    返回与 DRF DateTimeField 相同的格式化函数：转换到当前时区，UTC 以 Z 结尾
+    当前时区在每次序列化时只获取一次
+    """
+    tz = timezone.get_current_timezone()
+
+    def format_datetime(value):
+        if value is None:
+            return None
+        if timezone.is_aware(value):
+            value = value.astimezone(tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return format_datetime
+
+
+def serialize_sleep_records(queryset):
+    """与 SleepRecordSerializer(many=True).data 相同的输出"""
+    return format_sleep_rows(queryset.values_list(*SLEEP_FIELDS))
+
+
+def format_sleep_rows(rows):
+    """将 values_list(*SLEEP_FIELDS) 行格式化为输出结构（异步视图在异步迭代后调用）"""
+    fmt = _datetime_formatter()
+    quality_score = SleepRecord.quality_score_for_duration
+    return [
+        {
+            'id': pk,
+            'sleep_date': _iso(sleep_date),
+            'bedtime': _iso(bedtime),
+            'wake_time': _iso(wake_time),
+            'sleep_duration': duration,
+            'sleep_duration_hours': round(duration / 60, 1) if duration else 0,
+            # 早于评分字段归档的记录没有评分，按睡眠时长计算
+            'sleep_quality_score': score if score is not None else quality_score(duration),
+            'created_at': fmt(created_at),
+            'updated_at': fmt(updated_at),
+        }
+        for pk, sleep_date, bedtime, wake_time, duration, score, created_at, updated_at
+        in rows
+    ]
+
+
+def serialize_exercise_records(queryset):
+    """与 ExerciseRecordSerializer(many=True).data 相同的输出"""
+    return format_exercise_rows(queryset.values_list(*EXERCISE_FIELDS))
+
+
+def format_exercise_rows(rows):
+    """将 values_list(*EXERCISE_FIELDS) 行格式化为输出结构（异步视图在异步迭代后调用）"""
+    fmt = _datetime_formatter()
+    return [
+        {
+            'id': pk,
+            'exercise_date': _iso(exercise_date),
+            'exercise_type': exercise_type,
+            'exercise_type_display': EXERCISE_TYPE_DISPLAY.get(exercise_type, exercise_type),
+            'duration_minutes': duration,
+            'duration_hours': round(duration / 60, 1),
+            'calories_burned': calories,
+            'exercise_intensity': EXERCISE_INTENSITY.get(exercise_type, DEFAULT_EXERCISE_INTENSITY),
+            'notes': notes,
+            'created_at': fmt(created_at),
+            'updated_at': fmt(updated_at),
+        }
+        for pk, exercise_date, exercise_type, duration, calories, notes, created_at, updated_at
+        in rows
+    ]
+
+
+def serialize_diet_records(queryset):
+    """与 DietRecordSerializer(many=True).data 相同的输出"""
+    return format_diet_rows(queryset.values_list(*DIET_FIELDS))
+
+
+def format_diet_rows(rows):
+    """将 values_list(*DIET_FIELDS) 行格式化为输出结构（异步视图在异步迭代后调用）"""
+    fmt = _datetime_formatter()
+    meal_order = DietRecord.MEAL_TYPE_ORDER
+    return [
+        {
+            'id': pk,
+            'diet_date': _iso(diet_date),
+            'meal_type': meal_type,
+            'meal_type_display': MEAL_TYPE_DISPLAY.get(meal_type, meal_type),
+            'meal_type_order': meal_order.get(meal_type, 5),
+            'food_name': food_name,
+            'portion_size': portion_size,
+            'calories_per_100g': calories_per_100g,
+            'total_calories': total_calories,
+            'notes': notes,
+            'created_at': fmt(created_at),
+            'updated_at': fmt(updated_at),
+        }
+        for pk, diet_date, meal_type, food_name, portion_size, calories_per_100g, total_calories, notes,
+        created_at, updated_at in rows
+    ]
@@ -0,0 +1,210 @@
+"""
+健康目标进度引擎
+根据用户已记录的睡眠/运动/饮食数据自动推算目标进度，
+记录写入后只重算受影响的目标，并批量写入每日进度记录
+"""
+import calendar
+import operator
+from datetime import date, timedelta
+from functools import reduce
+from django.db import router, transaction
+from django.db.models import Avg, Count, Q, Sum
+from .models import SleepRecord, ExerciseRecord, DietRecord, HealthGoal, GoalProgress
+from .stats_cache import UserStatsCache
+
+
+# 聚合方式
+AGGREGATES = {
+    'sum': Sum,
+    'avg': Avg,
+    'count': Count,
+}
+
+# 目标类型 -> 数据来源；units: 单位 -> (字段, 聚合方式, 换算系数)
+# 睡眠按每晚平均计算，运动和饮食按周期累计计算
+GOAL_SOURCES = {
+    'sleep': {
+        'model': SleepRecord,
+        'date_field': 'sleep_date',
+        'units': {
+            '小时': ('sleep_duration', 'avg', 1 / 60),
+            '分钟': ('sleep_duration', 'avg', 1),
+        },
+    },
+    'exercise': {
+        'model': ExerciseRecord,
+        'date_field': 'exercise_date',
+        'units': {
+            '分钟': ('duration_minutes', 'sum', 1),
+            '小时': ('duration_minutes', 'sum', 1 / 60),
+            '次': ('id', 'count', 1),
+            '千卡': ('calories_burned', 'sum', 1),
+        },
+    },
+    'diet': {
+        'model': DietRecord,
+        'date_field': 'diet_date',
+        'units': {
+            '千卡': ('total_calories', 'sum', 1),
+        },
+    },
+}
+
+# 用户自由填写的单位别名
+UNIT_ALIASES = {
+    'h': '小时', 'hour': '小时', 'hours': '小时',
+    '分': '分钟', 'min': '分钟', 'mins': '分钟', 'minute': '分钟', 'minutes': '分钟',
+    '卡': '千卡', '大卡': '千卡', '卡路里': '千卡', 'kcal': '千卡', 'cal': '千卡',
+}
+
+# 会被自动更新的目标状态（已完成的目标在数据回退时会恢复为进行中）
+TRACKED_STATUSES = ['active', 'completed']
+
+
+def get_goal_measure(goal):
+    """返回目标对应的 (字段, 聚合方式, 换算系数)，无法自动推算时返回 None"""
+    source = GOAL_SOURCES.get(goal.goal_type)
+    if not source:
+        return None
+    unit = (goal.unit or '').strip().lower()
+    unit = UNIT_ALIASES.get(unit, unit)
+    return source['units'].get(unit)
+
+
+def get_goal_window(goal, reference_date=None):
+    """
+    返回目标当前统计周期 (开始日期, 结束日期)，已裁剪到目标有效期内
+    周期尚未开始时返回 None
+    """
+    today = min(reference_date or date.today(), goal.end_date)
+    if today < goal.start_date:
+        return None
+
+    if goal.frequency == 'daily':
+        start, end = today, today
+    elif goal.frequency == 'weekly':
+        start = today - timedelta(days=today.weekday())
+        end = start + timedelta(days=6)
+    elif goal.frequency == 'monthly':
+        start = today.replace(day=1)
+        end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    else:
+        start, end = goal.start_date, goal.end_date
+
+    return max(start, goal.start_date), min(end, goal.end_date)
+
+
+def _aggregate(source, user_id, start, end, measures):
+    """一次查询计算区间内多个指标，返回 {(字段, 聚合方式): 原始值}"""
+    date_field = source['date_field']
+    aggregates = {
+        f'{func}__{field}': AGGREGATES[func](field)
+        for field, func in measures
+    }
+    result = source['model'].objects.filter(
+        user_id=user_id,
+        **{f'{date_field}__gte': start, f'{date_field}__lte': end}
+    ).aggregate(**aggregates)
+    return {(field, func): result[f'{func}__{field}'] for field, func in measures}
+
+
+def _scaled(raw, scale):
+    return round((raw or 0) * scale, 2)
+
+
+def sync_goal_progress(user_id, goal_type, record_dates):
+    """
+    记录写入后同步受影响目标的进度
+    - 通过 (user, goal_type, status) 索引定位覆盖这些日期的目标
+    - 每个日期一次聚合查询，批量写入 GoalProgress
+    - 每个统计周期一次聚合查询，只保存数值发生变化的目标
+    只修改引擎生成的进度记录（auto_generated），手动填写的进度记录和当前数值保持不变
+    返回更新的目标数
+    """
+    source = GOAL_SOURCES.get(goal_type)
+    record_dates = sorted({d for d in record_dates if d})
+    if not source or not record_dates:
+        return 0
+
+    goals = [
+        goal for goal in HealthGoal.objects.filter(
+            user_id=user_id,
+            goal_type=goal_type,
+            status__in=TRACKED_STATUSES,
+            start_date__lte=record_dates[-1],
+            end_date__gte=record_dates[0]
+        )
+        if get_goal_measure(goal)
+    ]
+    if not goals:
+        return 0
+
+    measures = {get_goal_measure(goal)[:2] for goal in goals}
+
+    # 用户手动填写的进度优先，引擎不覆盖也不删除
+    manual = set(GoalProgress.objects.filter(
+        goal__in=goals, date__in=record_dates, auto_generated=False
+    ).values_list('goal_id', 'date'))
+
+    # 每日进度记录
+    upserts = []
+    cleared = {}  # 日期 -> 当天没有数据的目标ID
+    for record_date in record_dates:
+        daily = _aggregate(source, user_id, record_date, record_date, measures)
+        for goal in goals:
+            if not goal.start_date <= record_date <= goal.end_date or (goal.pk, record_date) in manual:
+                continue
+            field, func, scale = get_goal_measure(goal)
+            raw = daily[(field, func)]
+            if raw:
+                upserts.append(GoalProgress(
+                    goal=goal, date=record_date, value=_scaled(raw, scale), notes='根据记录自动同步',
+                    auto_generated=True
+                ))
+            else:
+                cleared.setdefault(record_date, []).append(goal.pk)
+
+    if upserts:
+        GoalProgress.objects.bulk_create(
+            upserts,
+            update_conflicts=True,
+            unique_fields=['goal', 'date'],
+            update_fields=['value']
+        )
+    if cleared:
+        # 一次删除所有没有数据的 (目标, 日期)，按日期分组组合条件
+        GoalProgress.objects.filter(
+            reduce(operator.or_, (Q(date=day, goal_id__in=goal_ids) for day, goal_ids in cleared.items())),
+            auto_generated=True
+        ).delete()
+    if upserts or cleared:
+        # 批量写入不触发进度记录的信号，事务提交后由这里使目标统计（含最近进度）失效
+        transaction.on_commit(
+            lambda: UserStatsCache.invalidate_users([user_id], 'goal_stats'),
+            using=router.db_for_write(GoalProgress)
+        )
+
+    # 当前周期数值：按周期分组，每个周期一次聚合
+    windows = {}
+    for goal in goals:
+        window = get_goal_window(goal)
+        if window and any(window[0] <= d <= window[1] for d in record_dates):
+            windows.setdefault(window, []).append(goal)
+
+    updated = 0
+    for (start, end), window_goals in windows.items():
+        # 周期内有手动填写的进度时，当前数值以用户填写的为准
+        manual_goal_ids = set(GoalProgress.objects.filter(
+            goal__in=window_goals, date__gte=start, date__lte=end, auto_generated=False
+        ).values_list('goal_id', flat=True))
+        window_goals = [goal for goal in window_goals if goal.pk not in manual_goal_ids]
+        if not window_goals:
+            continue
+        totals = _aggregate(source, user_id, start, end, {get_goal_measure(g)[:2] for g in window_goals})
+        for goal in window_goals:
+            field, func, scale = get_goal_measure(goal)
+            value = _scaled(totals[(field, func)], scale)
+            if value != goal.current_value:
+                goal.update_current_value(value)
+                updated += 1
+    return updated
@@ -0,0 +1,57 @@
+"""
+健康目标过期清理
+按批次将已超过结束日期的进行中目标标记为已过期，并记录状态变更
+"""
+from datetime import date
+from django.db import transaction
+from django.utils import timezone
+from .models import HealthGoal, GoalStatusLog
+from .stats_cache import UserStatsCache
+from .sharding import current_shard, shard_aliases, using_shard
+
+
+def expire_goal_batch(today=None, batch_size=500):
+    """
+    清理一批过期目标，返回本批标记的目标数
+    通过 (status, end_date) 索引定位，单条 UPDATE 完成状态变更
+    """
+    today = today or date.today()
+    now = timezone.now()
+
+    with transaction.atomic(using=current_shard()):
+        goal_ids = list(HealthGoal.objects.filter(
+            status='active',
+            end_date__lt=today
+        ).order_by('end_date').values_list('id', flat=True)[:batch_size])
+        if not goal_ids:
+            return 0
+
+        # 手动更新 updated_at，使提醒调度器等依赖增量同步的任务感知变更
+        HealthGoal.objects.filter(pk__in=goal_ids, status='active').update(
+            status='expired', updated_at=now
+        )
+        # 只记录本次实际变更的目标（期间被用户修改的目标不会匹配）
+        expired = list(HealthGoal.objects.filter(
+            pk__in=goal_ids, status='expired', updated_at=now
+        ).values_list('id', 'user_id'))
+
+        GoalStatusLog.objects.bulk_create([
+            GoalStatusLog(goal_id=goal_id, from_status='active', to_status='expired', reason='超过结束日期')
+            for goal_id, _ in expired
+        ])
+
+    UserStatsCache.invalidate_users({user_id for _, user_id in expired}, 'goal_stats')
+    return len(expired)
+
+
+def expire_overdue_goals(today=None, batch_size=500):
+    """清理所有过期目标（开启分片时逐个分片处理），返回标记的目标总数"""
+    total = 0
+    for alias in shard_aliases():
+        with using_shard(alias):
+            while True:
+                expired = expire_goal_batch(today, batch_size)
+                total += expired
+                if expired < batch_size:
+                    break
+    return total
@@ -11,10 +11,10 @@ from .models import User, SleepRecord, ExerciseRecord, DietRecord, HealthReport
 class HealthAnalyzer:
     """健康数据分析器"""
     
-    def __init__(self, user, period_days=7):
+    def __init__(self, user, period_days=7, end_date=None):
         self.user = user
         self.period_days = period_days
-        self.end_date = date.today()
+        self.end_date = end_date or date.today()
         self.start_date = self.end_date - timedelta(days=period_days - 1)
         
         # 获取周期内的数据
@@ -254,6 +254,11 @@ class HealthAnalyzer:
         exercise_score = self.calculate_exercise_score()
         diet_score = self.calculate_diet_score()
         
+        return self.combine_overall_score(sleep_score, exercise_score, diet_score)
+    
+    @staticmethod
+    def combine_overall_score(sleep_score, exercise_score, diet_score):
+        """按权重合成综合评分"""
         # 权重分配：睡眠35%，运动35%，饮食30%
         overall = (
             sleep_score * 0.35 +
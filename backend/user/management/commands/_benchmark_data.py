@@ -0,0 +1,32 @@
+"""
+性能基准命令共用的测试数据
+"""
+import time
+from datetime import date, time as dt_time, timedelta
+from user.models import User, SleepRecord, ExerciseRecord, DietRecord
+
+
+def create_benchmark_records(count):
+    """批量写入测试数据（bulk_create 不触发信号，派生字段由查询集计算）"""
+    user = User.objects.create(userName=f'benchmark_{time.time_ns()}', password='benchmark')
+    start = date.today() - timedelta(days=count)
+    exercise_types = [choice for choice, _ in ExerciseRecord.EXERCISE_TYPES]
+    meal_types = [choice for choice, _ in DietRecord.MEAL_TYPES]
+
+    SleepRecord.objects.bulk_create([
+        SleepRecord(user=user, sleep_date=start + timedelta(days=i), bedtime=dt_time(23, i % 60),
+                    wake_time=dt_time(7, 0))
+        for i in range(count)
+    ])
+    ExerciseRecord.objects.bulk_create([
+        ExerciseRecord(user=user, exercise_date=start + timedelta(days=i),
+                       exercise_type=exercise_types[i % len(exercise_types)],
+                       duration_minutes=20 + i % 90, calories_burned=150 + i % 400, notes='benchmark')
+        for i in range(count)
+    ])
+    DietRecord.objects.bulk_create([
+        DietRecord(user=user, diet_date=start + timedelta(days=i), meal_type=meal_types[i % len(meal_types)],
+                   food_name='米饭', portion_size=200, calories_per_100g=116)
+        for i in range(count)
+    ])
+    return user
@@ -0,0 +1,33 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from user.archive import ARCHIVE_SOURCES, archive_cutoff, archive_records
+
+
+class Command(BaseCommand):
+    help = '把早于归档边界的睡眠/运动/饮食记录移入按年份的归档表，每日汇总保留在热库中'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='归档早于该日期（YYYY-MM-DD）的记录，默认按 ARCHIVE_HORIZON_DAYS 计算')
+        parser.add_argument('--category', action='append', choices=list(ARCHIVE_SOURCES),
+                            help='只归档指定类别，可重复指定，默认全部')
+        parser.add_argument('--dry-run', action='store_true', help='只统计将被归档的记录数，不修改数据')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('日期格式错误，请使用 YYYY-MM-DD 格式')
+        else:
+            cutoff = archive_cutoff()
+
+        try:
+            results = archive_records(cutoff, options['category'], options['dry_run'])
+        except NotImplementedError as e:
+            raise CommandError(str(e))
+
+        action = '将归档' if options['dry_run'] else '已归档'
+        for using, category, year, count in results:
+            self.stdout.write(f'{using}: {category} {year} 年{action} {count} 条')
+        total = sum(count for *_, count in results)
+        self.stdout.write(self.style.SUCCESS(f'早于 {cutoff} 的记录{action} {total} 条'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from user.derived_fields import sleep_quality_score_expression
+from user.models import SleepRecord
+from user.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = '按睡眠时长重新计算睡眠记录的质量评分（用于绕过 ORM 导入的数据，开启分片时处理每个分片）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='每批更新的记录数')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        for alias in shard_aliases():
+            records = SleepRecord._base_manager.using(alias)
+            last_pk = 0
+            # 按主键分批更新，每批一个短事务，避免长时间持有 SQLite 写锁
+            while True:
+                pks = list(records.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                total += records.filter(pk__in=pks).update(quality_score=sleep_quality_score_expression())
+                last_pk = pks[-1]
+        self.stdout.write(self.style.SUCCESS(f'已更新 {total} 条睡眠记录的质量评分'))
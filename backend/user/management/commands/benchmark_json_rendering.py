@@ -0,0 +1,59 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from user.models import SleepRecord, ExerciseRecord, DietRecord
+from user.renderers import FastJSONRenderer, orjson
+from user.fast_serializers import serialize_sleep_records, serialize_exercise_records, serialize_diet_records
+from user.views import WeeklySleepStatsView
+from ._benchmark_data import create_benchmark_records
+
+
+class Command(BaseCommand):
+    help = '对比标准库与快速 JSON 渲染器的编码耗时，以及 gzip 前后的响应大小（测试数据在事务中写入并回滚）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=2000, help='每类记录的数量')
+        parser.add_argument('--repeat', type=int, default=5, help='每种方式重复次数，取最快一次')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('未安装 orjson，FastJSONRenderer 将回退到标准库实现'))
+
+        with transaction.atomic():
+            user = create_benchmark_records(options['records'])
+            sleep_records = SleepRecord.objects.filter(user=user)
+            payloads = [
+                ('睡眠统计（含全部记录）', WeeklySleepStatsView().build_stats(list(sleep_records))),
+                ('睡眠记录列表', {'records': serialize_sleep_records(sleep_records)}),
+                ('运动记录列表', {'records': serialize_exercise_records(ExerciseRecord.objects.filter(user=user))}),
+                ('饮食记录列表', {'records': serialize_diet_records(DietRecord.objects.filter(user=user))}),
+            ]
+            transaction.set_rollback(True)
+
+        default_renderer = JSONRenderer()
+        fast_renderer = FastJSONRenderer()
+        for name, payload in payloads:
+            body = default_renderer.render(payload)
+            if fast_renderer.render(payload) != body:
+                self.stdout.write(self.style.ERROR(f'{name}: 快速渲染输出与标准渲染不一致'))
+                continue
+
+            default_ms = self._best_time(lambda: default_renderer.render(payload), repeat) * 1000
+            fast_ms = self._best_time(lambda: fast_renderer.render(payload), repeat) * 1000
+            gzip_bytes = len(compress_string(body))
+            self.stdout.write(
+                f'{name}: 编码 {default_ms:.2f}ms -> {fast_ms:.2f}ms（{default_ms / fast_ms:.1f} 倍），'
+                f'大小 {len(body):,} -> {gzip_bytes:,} 字节（gzip {gzip_bytes / len(body):.0%}）'
+            )
+
+    def _best_time(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from user.models import SleepRecord, ExerciseRecord, DietRecord
+from user.serializers import SleepRecordSerializer, ExerciseRecordSerializer, DietRecordSerializer
+from user.fast_serializers import serialize_sleep_records, serialize_exercise_records, serialize_diet_records
+from ._benchmark_data import create_benchmark_records
+
+
+class Command(BaseCommand):
+    help = '对比记录列表的 DRF 序列化器与快速序列化的吞吐量（测试数据在事务中写入并回滚）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=5000, help='每类记录的数量')
+        parser.add_argument('--repeat', type=int, default=3, help='每种方式重复次数，取最快一次')
+
+    def handle(self, *args, **options):
+        count = options['records']
+        repeat = options['repeat']
+
+        with transaction.atomic():
+            user = create_benchmark_records(count)
+            cases = [
+                ('睡眠记录', SleepRecord.objects.filter(user=user), SleepRecordSerializer, serialize_sleep_records),
+                ('运动记录', ExerciseRecord.objects.filter(user=user), ExerciseRecordSerializer, serialize_exercise_records),
+                ('饮食记录', DietRecord.objects.filter(user=user), DietRecordSerializer, serialize_diet_records),
+            ]
+            for name, queryset, serializer_class, fast_serialize in cases:
+                drf_data = serializer_class(queryset, many=True).data
+                fast_data = fast_serialize(queryset)
+                if [dict(row) for row in drf_data] != fast_data:
+                    self.stdout.write(self.style.ERROR(f'{name}: 快速序列化输出与 DRF 不一致'))
+                    continue
+
+                drf_seconds = self._best_time(lambda: serializer_class(queryset, many=True).data, repeat)
+                fast_seconds = self._best_time(lambda: fast_serialize(queryset), repeat)
+                self.stdout.write(
+                    f'{name}: DRF {count / drf_seconds:,.0f} 条/秒，'
+                    f'快速 {count / fast_seconds:,.0f} 条/秒，'
+                    f'提升 {drf_seconds / fast_seconds:.1f} 倍'
+                )
+            transaction.set_rollback(True)
+
+    def _best_time(self, func, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,128 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from user.sqlite_tuning import apply_pragmas
+
+
+SCHEMA = """
+CREATE TABLE session (session_key TEXT PRIMARY KEY, session_data TEXT, expire_date REAL);
+CREATE TABLE record (id INTEGER PRIMARY KEY, user_id INTEGER, record_date INTEGER, value INTEGER);
+CREATE INDEX record_user_date ON record (user_id, record_date);
+"""
+
+USERS = 200
+DAYS = 365
+
+
+class Command(BaseCommand):
+    help = (
+        '在临时 SQLite 文件上对比默认配置与生产配置（WAL + PRAGMA + 持久连接）的并发读写吞吐量，'
+        '不访问项目数据库'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='读线程数（每个请求读取一周记录）')
+        parser.add_argument('--writers', type=int, default=2, help='写线程数（每个请求写入记录并保存 session）')
+        parser.add_argument('--duration', type=float, default=3.0, help='每种配置的运行时间（秒）')
+
+    def handle(self, *args, **options):
+        configs = [
+            ('默认配置（回滚日志，每个请求新建连接）', {}, False),
+            ('生产配置（WAL + PRAGMA，持久连接）', settings.SQLITE_PRODUCTION_PRAGMAS, True),
+        ]
+        results = []
+        for name, pragmas, persistent in configs:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = Path(tmpdir) / 'benchmark.sqlite3'
+                self._create_database(path)
+                reads, writes, errors = self._run(path, pragmas, persistent, options)
+            duration = options['duration']
+            results.append((reads + writes) / duration)
+            self.stdout.write(
+                f'{name}: 读 {reads / duration:,.0f} 次/秒，写 {writes / duration:,.0f} 次/秒，锁冲突失败 {errors} 次'
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'总吞吐量提升 {results[1] / results[0]:.1f} 倍'))
+
+    def _create_database(self, path):
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            'INSERT INTO session VALUES (?, ?, ?)',
+            [(f'session{i}', 'x' * 200, time.time()) for i in range(USERS)]
+        )
+        conn.executemany(
+            'INSERT INTO record (user_id, record_date, value) VALUES (?, ?, ?)',
+            [(user_id, day, random.randint(300, 600)) for user_id in range(USERS) for day in range(DAYS)]
+        )
+        conn.commit()
+        conn.close()
+
+    def _connect(self, path, pragmas):
+        # 与 Django 相同：自动提交模式，由代码显式开启事务
+        conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        apply_pragmas(conn.cursor(), pragmas)
+        return conn
+
+    def _run(self, path, pragmas, persistent, options):
+        stop = threading.Event()
+        counts = {'read': 0, 'write': 0, 'error': 0}
+        lock = threading.Lock()
+
+        def read_request(conn):
+            user_id = random.randrange(USERS)
+            start = random.randrange(DAYS - 7)
+            conn.execute(
+                'SELECT record_date, SUM(value) FROM record WHERE user_id = ? AND record_date BETWEEN ? AND ? '
+                'GROUP BY record_date',
+                (user_id, start, start + 6)
+            ).fetchall()
+
+        def write_request(conn):
+            user_id = random.randrange(USERS)
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT INTO record (user_id, record_date, value) VALUES (?, ?, ?)',
+                (user_id, random.randrange(DAYS), random.randint(300, 600))
+            )
+            conn.execute(
+                'UPDATE session SET session_data = ?, expire_date = ? WHERE session_key = ?',
+                ('y' * 200, time.time(), f'session{user_id}')
+            )
+            conn.execute('COMMIT')
+
+        def worker(kind, request):
+            conn = self._connect(path, pragmas) if persistent else None
+            done = errors = 0
+            while not stop.is_set():
+                request_conn = conn or self._connect(path, pragmas)
+                try:
+                    request(request_conn)
+                    done += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if request_conn.in_transaction:
+                        request_conn.execute('ROLLBACK')
+                finally:
+                    if conn is None:
+                        request_conn.close()
+            if conn is not None:
+                conn.close()
+            with lock:
+                counts[kind] += done
+                counts['error'] += errors
+
+        threads = [threading.Thread(target=worker, args=('read', read_request)) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=worker, args=('write', write_request)) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return counts['read'], counts['write'], counts['error']
@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from user.goal_sweeper import expire_overdue_goals
+
+
+class Command(BaseCommand):
+    help = '将超过结束日期的进行中目标批量标记为已过期'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='每批更新的目标数')
+        parser.add_argument('--interval', type=int, default=0, help='轮询间隔（秒），为0时只执行一轮')
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_overdue_goals(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'已标记 {expired} 个过期目标'))
+
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
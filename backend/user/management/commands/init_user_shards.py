@@ -0,0 +1,67 @@
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F
+from django.db.models.functions import Mod
+from user.models import User
+from user.sharding import SHARDED_MODELS, SHARD_ID_OFFSET, get_shards
+
+
+class Command(BaseCommand):
+    help = '初始化用户分片：迁移表结构、设置各分片的主键起点、同步用户，可选复制主库中已有的健康数据'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--copy-data', action='store_true', help='把主库中已有的分片数据复制到对应分片')
+        parser.add_argument('--batch-size', type=int, default=2000, help='复制数据时每批写入的行数')
+
+    def handle(self, *args, **options):
+        shards = get_shards()
+        if not shards:
+            raise CommandError('未配置用户分片（DJANGO_DB_SHARDS）')
+
+        for index, alias in enumerate(shards):
+            call_command('migrate', database=alias, verbosity=0)
+            self.set_id_offset(alias, (index + 1) * SHARD_ID_OFFSET)
+
+            copied = self.copy_rows(User, 'pk', index, len(shards), alias, options['batch_size'])
+            self.stdout.write(f'{alias}: 已同步 {copied} 个用户')
+
+            if options['copy_data']:
+                for model_name, user_path in SHARDED_MODELS.items():
+                    model = apps.get_model('user', model_name)
+                    copied = self.copy_rows(model, user_path, index, len(shards), alias, options['batch_size'])
+                    self.stdout.write(f'{alias}: 已复制 {model.__name__} {copied} 条')
+
+        self.stdout.write(self.style.SUCCESS(f'已初始化 {len(shards)} 个分片'))
+
+    def set_id_offset(self, alias, offset):
+        """各分片的自增主键从不同的起点开始，保证跨分片主键唯一（已超过起点时不修改）"""
+        if connections[alias].vendor != 'sqlite':
+            raise CommandError('设置主键起点只支持 SQLite 分片')
+        with connections[alias].cursor() as cursor:
+            for model_name in SHARDED_MODELS:
+                table = apps.get_model('user', model_name)._meta.db_table
+                cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s', [offset, table])
+                if cursor.rowcount == 0:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, offset])
+
+    def copy_rows(self, model, user_path, index, shard_count, alias, batch_size):
+        """按 user_id 取模筛选主库中属于该分片的行，保留主键写入分片（已存在的行跳过）"""
+        rows = model.objects.using(DEFAULT_DB_ALIAS).annotate(
+            shard_index=Mod(F(user_path), shard_count)
+        ).filter(shard_index=index).order_by('pk')
+
+        copied = 0
+        batch = []
+        for obj in rows.iterator(chunk_size=batch_size):
+            obj._state.db = None
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                model.objects.using(alias).bulk_create(batch, ignore_conflicts=True)
+                copied += len(batch)
+                batch = []
+        if batch:
+            model.objects.using(alias).bulk_create(batch, ignore_conflicts=True)
+            copied += len(batch)
+        return copied
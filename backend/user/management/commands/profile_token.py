@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from user.profiling import MODES, TOKEN_MAX_AGE, make_profile_token
+
+
+class Command(BaseCommand):
+    help = '生成 X-Profile 请求头，用于对单个请求开启慢请求分析'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=MODES, default='cprofile', help='分析方式')
+
+    def handle(self, *args, **options):
+        token = make_profile_token(options['mode'])
+        self.stdout.write(f'X-Profile: {token}')
+        self.stdout.write(self.style.SUCCESS(f'{TOKEN_MAX_AGE // 60} 分钟内有效'))
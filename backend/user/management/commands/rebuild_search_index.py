@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from user.search_index import ensure_search_index, rebuild_search_index
+from user.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = '从来源表重建后台全文搜索索引（恢复缺失的同步触发器），每个分片各自重建'
+
+    def handle(self, *args, **options):
+        aliases = {DEFAULT_DB_ALIAS} | {alias for alias in shard_aliases() if alias}
+        for alias in sorted(aliases):
+            connection = connections[alias]
+            if connection.vendor != 'sqlite':
+                raise CommandError('全文搜索索引只支持 SQLite')
+            if ensure_search_index(connection):
+                self.stdout.write(self.style.WARNING(f'{alias}: 已恢复缺失的同步触发器'))
+            rows = rebuild_search_index(connection)
+            self.stdout.write(f'{alias}: 已写入 {rows} 行')
+        self.stdout.write(self.style.SUCCESS('搜索索引重建完成'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from user.counters import COUNTERS, reconcile
+
+
+class Command(BaseCommand):
+    help = '按实际数据校准后台统计计数器（修正批量写入、原始 SQL 等绕过信号的写入造成的偏差），建议每天定时执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--counter', action='append', choices=list(COUNTERS), help='只校准指定计数项，可重复指定')
+
+    def handle(self, *args, **options):
+        for name, (previous, actual) in reconcile(options['counter']).items():
+            if previous == actual:
+                self.stdout.write(f'{name}: {actual}')
+            else:
+                self.stdout.write(self.style.WARNING(f'{name}: {previous} -> {actual}'))
+        self.stdout.write(self.style.SUCCESS('计数器校准完成'))
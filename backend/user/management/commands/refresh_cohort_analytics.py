@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from user.cohort_analytics import get_cohort_summary, DEFAULT_WEEKS
+
+
+class Command(BaseCommand):
+    help = '重新计算群体分布摘要并写入缓存（管理主页和学生健康报告的同伴对比只读取缓存），建议按缓存有效期定时执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=DEFAULT_WEEKS, help='统计的周数')
+
+    def handle(self, *args, **options):
+        summary = get_cohort_summary(weeks=options['weeks'], refresh=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"已计算 {summary['student_count']} 名学生 {summary['weeks']} 周的群体分布（{summary['engine']}）"
+        ))
@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from user.report_refresh import refresh_stale_reports
+
+
+class Command(BaseCommand):
+    help = '增量刷新过期的健康报告（只重算受影响的分类评分）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='每轮最多刷新的报告数')
+        parser.add_argument('--interval', type=int, default=0, help='轮询间隔（秒），为0时只执行一轮')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        interval = options['interval']
+
+        while True:
+            refreshed = refresh_stale_reports(limit=limit)
+            self.stdout.write(self.style.SUCCESS(f'已刷新 {refreshed} 份健康报告'))
+
+            if interval <= 0:
+                break
+            # 本轮满额时可能还有积压，立即进入下一轮
+            if refreshed < limit:
+                time.sleep(interval)
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from user.reminder_scheduler import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = '运行健康目标提醒调度器，将到期提醒写入发件箱'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookahead', type=int, default=10, help='内存中预加载的提醒窗口（分钟）')
+        parser.add_argument('--interval', type=float, default=1.0, help='目标变更同步间隔（秒）')
+        parser.add_argument('--once', action='store_true', help='只执行一轮调度')
+
+    def handle(self, *args, **options):
+        scheduler = ReminderScheduler(lookahead_minutes=options['lookahead'])
+
+        if options['once']:
+            delivered = scheduler.tick()
+            self.stdout.write(self.style.SUCCESS(f'已写入 {delivered} 条提醒'))
+            return
+
+        def report(delivered):
+            if delivered:
+                self.stdout.write(self.style.SUCCESS(f'已写入 {delivered} 条提醒'))
+
+        self.stdout.write('提醒调度器已启动')
+        scheduler.run(poll_interval=options['interval'], on_tick=report)
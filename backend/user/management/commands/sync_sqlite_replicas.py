@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = '使用 SQLite 在线备份把主库复制到 DATABASE_REPLICAS 中的各个只读副本'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0, help='同步间隔（秒），为0时只同步一次')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('只支持 SQLite 主库')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('未配置只读副本（DJANGO_DB_REPLICAS）')
+
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                started = time.perf_counter()
+                self.copy_database(primary['NAME'], settings.DATABASE_REPLICA_PATHS[alias])
+                self.stdout.write(self.style.SUCCESS(
+                    f'{alias}: 已同步（{(time.perf_counter() - started) * 1000:.0f}ms）'
+                ))
+
+            if options['interval'] <= 0:
+                break
+            time.sleep(options['interval'])
+
+    def copy_database(self, source_path, replica_path):
+        """
+        备份到临时文件后原子替换副本文件：读取中的连接继续使用旧文件，新连接读取新副本
+        在线备份不阻塞主库写入，得到的是一致的快照
+        """
+        temp_path = f'{replica_path}.tmp'
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(temp_path)
+        try:
+            source.backup(target)
+            # 副本只读，使用回滚日志模式，不产生 -wal 文件
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+            source.close()
+        os.replace(temp_path, replica_path)
@@ -0,0 +1,184 @@
+"""
+请求级性能指标
+按视图统计延迟直方图、数据库查询次数与耗时、响应大小，以及缓存命中情况，
+以 Prometheus 文本格式导出。指标保存在进程内存中，每个工作进程各自统计。
+"""
+import threading
+import time
+from contextvars import ContextVar
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# 延迟直方图的桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = 'health'
+
+
+class RequestMetrics:
+    """单个请求的数据库统计，通过上下文变量在同步/异步调用之间传递"""
+    __slots__ = ('queries', 'sql_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+
+
+_current_request = ContextVar('request_metrics', default=None)
+
+
+def start_request():
+    """开始统计当前请求，返回 (统计对象, 用于结束统计的令牌)"""
+    request_metrics = RequestMetrics()
+    return request_metrics, _current_request.set(request_metrics)
+
+
+def end_request(token):
+    _current_request.reset(token)
+
+
+def _record_query(execute, sql, params, many, context):
+    """数据库执行包装器：只在有请求统计时计时，其余情况直接执行"""
+    request_metrics = _current_request.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.queries += 1
+        request_metrics.sql_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_wrapper(sender, connection, **kwargs):
+    """为每个数据库连接（包括异步视图使用的线程连接）安装一次执行包装器"""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+class _ViewStats:
+    __slots__ = ('buckets', 'count', 'duration', 'queries', 'sql_time', 'response_bytes', 'statuses')
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class MetricsRegistry:
+    """进程内指标注册表（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._cache = {}
+        self._writes = {}
+
+    def observe_request(self, view, method, status_code, duration, queries, sql_time, response_bytes):
+        with self._lock:
+            stats = self._views.get((view, method))
+            if stats is None:
+                stats = self._views[(view, method)] = _ViewStats()
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+                    break
+            stats.count += 1
+            stats.duration += duration
+            stats.queries += queries
+            stats.sql_time += sql_time
+            stats.response_bytes += response_bytes
+            stats.statuses[status_code] = stats.statuses.get(status_code, 0) + 1
+
+    def observe_cache(self, cache_name, hit):
+        key = (cache_name, 'hit' if hit else 'miss')
+        with self._lock:
+            self._cache[key] = self._cache.get(key, 0) + 1
+
+    def observe_write(self, operation, retries, lock_wait, failed):
+        """记录一次协调写入：重试次数、等待锁的秒数、是否最终失败"""
+        with self._lock:
+            stats = self._writes.get(operation)
+            if stats is None:
+                stats = self._writes[operation] = [0, 0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += retries
+            stats[2] += lock_wait
+            stats[3] += 1 if failed else 0
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+            self._cache.clear()
+            self._writes.clear()
+
+    def render_prometheus(self):
+        """以 Prometheus 文本格式导出全部指标"""
+        with self._lock:
+            views = sorted(self._views.items())
+            cache_counts = sorted(self._cache.items())
+            writes = sorted((operation, list(stats)) for operation, stats in self._writes.items())
+
+        name = f'{METRIC_PREFIX}_http_request_duration_seconds'
+        lines = [f'# HELP {name} 按视图统计的请求处理时间', f'# TYPE {name} histogram']
+        for (view, method), stats in views:
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(view=view, method=method, le=bound)} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(view=view, method=method, le="+Inf")} {stats.count}')
+            lines.append(f'{name}_sum{_labels(view=view, method=method)} {stats.duration:.6f}')
+            lines.append(f'{name}_count{_labels(view=view, method=method)} {stats.count}')
+
+        name = f'{METRIC_PREFIX}_http_requests_total'
+        lines += [f'# HELP {name} 按视图和状态码统计的请求数', f'# TYPE {name} counter']
+        for (view, method), stats in views:
+            for status_code, count in sorted(stats.statuses.items()):
+                lines.append(f'{name}{_labels(view=view, method=method, status=status_code)} {count}')
+
+        counters = [
+            ('db_queries_total', '数据库查询次数', 'queries', '{}'),
+            ('db_query_duration_seconds_total', '数据库查询总耗时', 'sql_time', '{:.6f}'),
+            ('http_response_bytes_total', '响应体字节数', 'response_bytes', '{}'),
+        ]
+        for metric, help_text, attr, fmt in counters:
+            name = f'{METRIC_PREFIX}_{metric}'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (view, method), stats in views:
+                lines.append(f'{name}{_labels(view=view, method=method)} {fmt.format(getattr(stats, attr))}')
+
+        name = f'{METRIC_PREFIX}_cache_requests_total'
+        lines += [f'# HELP {name} 缓存读取次数（命中/未命中）', f'# TYPE {name} counter']
+        for (cache_name, result), count in cache_counts:
+            lines.append(f'{name}{_labels(cache=cache_name, result=result)} {count}')
+
+        write_counters = [
+            ('db_writes_total', '协调写入次数', 0, '{}'),
+            ('db_write_retries_total', '因数据库锁冲突重试的次数', 1, '{}'),
+            ('db_lock_wait_seconds_total', '等待写锁和退避的总时间', 2, '{:.6f}'),
+            ('db_write_failures_total', '重试后仍因锁冲突失败的次数', 3, '{}'),
+        ]
+        for metric, help_text, index, fmt in write_counters:
+            name = f'{METRIC_PREFIX}_{metric}'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for operation, stats in writes:
+                lines.append(f'{name}{_labels(operation=operation)} {fmt.format(stats[index])}')
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
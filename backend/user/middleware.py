@@ -1,6 +1,15 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
 from django.utils.deprecation import MiddlewareMixin
 import json
+import time
+from rest_framework.permissions import SAFE_METHODS
+from . import metrics, profiling
+from .db_routers import get_replicas, mark_user_write
+from .sharding import using_shard
+from .models import User
 
 class SessionAuthMiddleware(MiddlewareMixin):
     """
@@ -62,4 +71,170 @@ class SessionAuthMiddleware(MiddlewareMixin):
             response['X-Content-Type-Options'] = 'nosniff'
             response['X-Frame-Options'] = 'DENY'
             
-        return response
\ No newline at end of file
+        return response
+
+
+class ApiGZipMiddleware(GZipMiddleware):
+    """
+    API响应压缩中间件
+    只压缩 /api/ 下超过 API_GZIP_MIN_SIZE 字节的响应，小响应压缩收益不抵开销
+    """
+    
+    def process_response(self, request, response):
+        if not request.path.startswith('/api/'):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'API_GZIP_MIN_SIZE', 1024):
+            return response
+        return super().process_response(request, response)
+
+
+class PerformanceMetricsMiddleware:
+    """
+    请求性能统计中间件
+    按视图记录延迟、数据库查询次数与耗时、响应大小，汇总到 metrics.registry；
+    METRICS_SERVER_TIMING 开启时在响应中附加 Server-Timing 头。
+    应放在中间件列表最前面，以统计完整处理时间和压缩后的响应大小。
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        request_metrics, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self._observe(request, response, request_metrics, time.perf_counter() - started)
+        return response
+    
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        request_metrics, token = metrics.start_request()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self._observe(request, response, request_metrics, time.perf_counter() - started)
+        return response
+    
+    def _observe(self, request, response, request_metrics, duration):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        response_bytes = 0 if response.streaming else len(response.content)
+        metrics.registry.observe_request(
+            view, request.method, response.status_code, duration,
+            request_metrics.queries, request_metrics.sql_time, response_bytes
+        )
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'app;dur={duration * 1000:.1f}, '
+                f'db;dur={request_metrics.sql_time * 1000:.1f};desc="{request_metrics.queries} queries"'
+            )
+
+
+class ProfilingMiddleware:
+    """
+    慢请求分析中间件
+    对开启分析的请求（全局开关或有效的 X-Profile 签名头）运行 cProfile/栈采样，
+    耗时超过 PROFILING_THRESHOLD_MS 的请求保存分析结果，见 profiling.py。
+    未开启分析的请求只多一次请求头检查。
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        profiler = profiling.RequestProfiler(mode)
+        if not profiler.start():
+            return self.get_response(request)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        self._save(profiler, request, response, time.perf_counter() - started)
+        return response
+    
+    async def __acall__(self, request):
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return await self.get_response(request)
+        profiler = profiling.RequestProfiler(mode)
+        if not profiler.start():
+            return await self.get_response(request)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.stop()
+        self._save(profiler, request, response, time.perf_counter() - started)
+        return response
+    
+    def _save(self, profiler, request, response, duration):
+        if duration * 1000 < getattr(settings, 'PROFILING_THRESHOLD_MS', 500):
+            return
+        meta = profiler.save(request, response, duration)
+        response['X-Profile-Id'] = meta['id']
+
+
+class ReadYourWritesMiddleware(MiddlewareMixin):
+    """
+    读己之写：用户的写请求成功后记录写入时间，
+    之后 READ_YOUR_WRITES_SECONDS 秒内该用户的读请求不走只读副本（见 db_routers.py）
+    """
+    
+    def process_response(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400 or not get_replicas():
+            return response
+        # DRF 认证后会把用户同步到原始请求上
+        user = getattr(request, 'user', None)
+        if isinstance(user, User):
+            mark_user_write(user.id)
+        return response
+
+
+class UserShardMiddleware:
+    """
+    为每个请求建立独立的分片上下文：Token 认证后进入的用户分片只在本次请求内有效，
+    不会残留到同一线程处理的下一个请求（见 sharding.py）
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with using_shard(None):
+            return self.get_response(request)
+    
+    async def __acall__(self, request):
+        with using_shard(None):
+            return await self.get_response(request)
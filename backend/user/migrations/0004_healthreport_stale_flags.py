@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_healthgoal_goalprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='healthreport',
+            name='stale_flags',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, help_text='待重算的分类标记位'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_healthreport_stale_flags'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='healthgoal',
+            index=models.Index(fields=['user', 'goal_type', 'status'], name='user_health_user_id_9da75d_idx'),
+        ),
+    ]
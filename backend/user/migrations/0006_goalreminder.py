@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_healthgoal_user_type_status_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_for', models.DateTimeField(help_text='计划提醒时间')),
+                ('message', models.CharField(help_text='提醒内容', max_length=200)),
+                ('status', models.CharField(choices=[('pending', '待发送'), ('sent', '已发送'), ('failed', '发送失败')], default='pending', help_text='发送状态', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivered_at', models.DateTimeField(blank=True, help_text='发送时间', null=True)),
+            ],
+            options={
+                'verbose_name': '目标提醒',
+                'verbose_name_plural': '目标提醒',
+                'ordering': ['-scheduled_for'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='healthgoal',
+            index=models.Index(fields=['reminder_enabled', 'status', 'reminder_time'], name='user_health_reminde_c62851_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthgoal',
+            index=models.Index(fields=['updated_at'], name='user_health_updated_12e191_idx'),
+        ),
+        migrations.AddField(
+            model_name='goalreminder',
+            name='goal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='user.healthgoal'),
+        ),
+        migrations.AddField(
+            model_name='goalreminder',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_reminders', to='user.user'),
+        ),
+        migrations.AddIndex(
+            model_name='goalreminder',
+            index=models.Index(fields=['status', 'scheduled_for'], name='user_goalre_status_67d938_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='goalreminder',
+            unique_together={('goal', 'scheduled_for')},
+        ),
+    ]
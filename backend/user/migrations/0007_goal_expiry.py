@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_goalreminder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalStatusLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(help_text='原状态', max_length=20)),
+                ('to_status', models.CharField(help_text='新状态', max_length=20)),
+                ('reason', models.CharField(blank=True, help_text='变更原因', max_length=100)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': '目标状态记录',
+                'verbose_name_plural': '目标状态记录',
+                'ordering': ['-changed_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='healthgoal',
+            name='status',
+            field=models.CharField(choices=[('active', '进行中'), ('completed', '已完成'), ('paused', '已暂停'), ('cancelled', '已取消'), ('expired', '已过期')], default='active', help_text='目标状态', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='healthgoal',
+            index=models.Index(fields=['user', 'status'], name='user_health_user_id_e27db6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='healthgoal',
+            index=models.Index(fields=['status', 'end_date'], name='user_health_status_90fd2d_idx'),
+        ),
+        migrations.AddField(
+            model_name='goalstatuslog',
+            name='goal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_logs', to='user.healthgoal'),
+        ),
+    ]
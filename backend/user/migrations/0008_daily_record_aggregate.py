@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0007_goal_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRecordAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_date', models.DateField(help_text='记录日期')),
+                ('sleep_minutes', models.IntegerField(blank=True, help_text='睡眠时长合计（分钟）', null=True)),
+                ('sleep_count', models.PositiveIntegerField(default=0, help_text='睡眠记录数')),
+                ('exercise_minutes', models.IntegerField(blank=True, help_text='运动时长合计（分钟）', null=True)),
+                ('exercise_calories', models.IntegerField(blank=True, help_text='运动消耗卡路里合计', null=True)),
+                ('exercise_count', models.PositiveIntegerField(default=0, help_text='运动记录数')),
+                ('diet_calories', models.IntegerField(blank=True, help_text='饮食摄入卡路里合计', null=True)),
+                ('diet_count', models.PositiveIntegerField(default=0, help_text='饮食记录数')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_aggregates', to='user.user')),
+            ],
+            options={
+                'verbose_name': '每日汇总（归档）',
+                'verbose_name_plural': '每日汇总（归档）',
+                'ordering': ['-record_date'],
+                'unique_together': {('user', 'record_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+from user.derived_fields import sleep_duration_expression, exercise_calories_expression, diet_total_calories_expression
+
+# 迁移中固定一份 MET 值表（与 ExerciseRecord.MET_VALUES 相同），不依赖之后修改的模型代码
+MET_VALUES = {
+    'running': 8.0,
+    'swimming': 7.0,
+    'basketball': 6.5,
+    'football': 7.0,
+    'tennis': 7.0,
+    'badminton': 5.5,
+    'gym': 6.0,
+    'yoga': 3.0,
+    'cycling': 6.0,
+    'other': 5.0,
+}
+
+
+def backfill_derived_fields(apps, schema_editor):
+    """按数据库表达式重新计算已有记录的派生字段（修正 bulk_create/update() 写入的空值或错误值）"""
+    db = schema_editor.connection.alias
+    apps.get_model('user', 'SleepRecord').objects.using(db).update(sleep_duration=sleep_duration_expression())
+    apps.get_model('user', 'ExerciseRecord').objects.using(db).update(
+        calories_burned=exercise_calories_expression(MET_VALUES)
+    )
+    apps.get_model('user', 'DietRecord').objects.using(db).filter(
+        portion_size__gt=0, calories_per_100g__gt=0
+    ).update(total_calories=diet_total_calories_expression())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0008_daily_record_aggregate'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_derived_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:56
+
+from django.db import migrations, models
+from user.derived_fields import sleep_quality_score_expression
+
+
+def backfill_quality_score(apps, schema_editor):
+    """按睡眠时长计算已有记录的质量评分"""
+    SleepRecord = apps.get_model('user', 'SleepRecord')
+    SleepRecord.objects.using(schema_editor.connection.alias).update(quality_score=sleep_quality_score_expression())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0009_backfill_derived_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sleeprecord',
+            name='quality_score',
+            field=models.PositiveSmallIntegerField(default=0, help_text='睡眠质量评分（由睡眠时长计算）'),
+        ),
+        migrations.AddIndex(
+            model_name='sleeprecord',
+            index=models.Index(fields=['quality_score', 'sleep_date'], name='user_sleepr_quality_d96497_idx'),
+        ),
+        migrations.RunPython(backfill_quality_score, migrations.RunPython.noop),
+    ]
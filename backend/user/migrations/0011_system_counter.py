@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0010_sleeprecord_quality_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='计数项', max_length=50)),
+                ('day', models.DateField(blank=True, help_text='记录日期，为空表示总数', null=True)),
+                ('value', models.BigIntegerField(default=0, help_text='数量')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': '统计计数器',
+                'verbose_name_plural': '统计计数器',
+                'constraints': [models.UniqueConstraint(fields=('name', 'day'), name='unique_counter_day'), models.UniqueConstraint(condition=models.Q(('day__isnull', True)), fields=('name',), name='unique_counter_total')],
+            },
+        ),
+    ]
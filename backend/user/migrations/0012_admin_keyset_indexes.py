@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0011_system_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dietrecord',
+            index=models.Index(fields=['-diet_date', 'meal_type', '-created_at', '-id'], name='user_diet_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exerciserecord',
+            index=models.Index(fields=['exercise_date', 'created_at', 'id'], name='user_exerci_exercis_e01d80_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sleeprecord',
+            index=models.Index(fields=['sleep_date', 'id'], name='user_sleepr_sleep_d_62777c_idx'),
+        ),
+    ]
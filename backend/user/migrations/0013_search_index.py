@@ -0,0 +1,33 @@
+from django.db import migrations
+from user.search_index import install_search_index, uninstall_search_index
+
+# 迁移中固定一份来源表（与 search_index.SEARCH_SOURCES 相同）：(编号, 表名, 标题列, 正文列)
+SEARCH_SOURCES = [
+    (1, 'user_user', 'userName', None),
+    (2, 'user_foodcaloriereference', 'food_name', 'description'),
+    (3, 'user_exerciserecord', 'exercise_type', 'notes'),
+    (4, 'user_dietrecord', 'food_name', 'notes'),
+    (5, 'user_goalprogress', None, 'notes'),
+]
+
+
+def create_search_index(apps, schema_editor):
+    """创建 FTS5 搜索索引和同步触发器，并写入已有数据（只支持 SQLite）"""
+    if schema_editor.connection.vendor == 'sqlite':
+        install_search_index(schema_editor.connection, SEARCH_SOURCES)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        uninstall_search_index(schema_editor.connection, SEARCH_SOURCES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0012_admin_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
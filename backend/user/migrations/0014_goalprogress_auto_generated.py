@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:13
+
+from django.db import migrations, models
+
+
+def mark_engine_rows(apps, schema_editor):
+    """进度引擎写入的记录备注固定为"根据记录自动同步"，据此标记已有的自动生成记录"""
+    GoalProgress = apps.get_model('user', 'GoalProgress')
+    GoalProgress.objects.using(schema_editor.connection.alias).filter(
+        notes='根据记录自动同步'
+    ).update(auto_generated=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goalprogress',
+            name='auto_generated',
+            field=models.BooleanField(default=False, help_text='是否由进度引擎根据记录自动生成（手动填写的进度不会被引擎修改）'),
+        ),
+        migrations.RunPython(mark_engine_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+from user.search_index import install_search_index, uninstall_search_index
+
+# 迁移中固定一份来源表：(编号, 表名, 标题列, 正文列, 标题显示名称)
+# 0013 的运动记录标题为选项代码（running），这里改为显示名称（跑步）
+PREVIOUS_SOURCES = [
+    (1, 'user_user', 'userName', None),
+    (2, 'user_foodcaloriereference', 'food_name', 'description'),
+    (3, 'user_exerciserecord', 'exercise_type', 'notes'),
+    (4, 'user_dietrecord', 'food_name', 'notes'),
+    (5, 'user_goalprogress', None, 'notes'),
+]
+
+EXERCISE_TYPE_LABELS = {
+    'running': '跑步',
+    'swimming': '游泳',
+    'basketball': '篮球',
+    'football': '足球',
+    'tennis': '网球',
+    'badminton': '羽毛球',
+    'gym': '健身房',
+    'yoga': '瑜伽',
+    'cycling': '骑行',
+    'other': '其他',
+}
+
+SEARCH_SOURCES = [
+    (1, 'user_user', 'userName', None, None),
+    (2, 'user_foodcaloriereference', 'food_name', 'description', None),
+    (3, 'user_exerciserecord', 'exercise_type', 'notes', EXERCISE_TYPE_LABELS),
+    (4, 'user_dietrecord', 'food_name', 'notes', None),
+    (5, 'user_goalprogress', None, 'notes', None),
+]
+
+
+def reinstall(old_sources, new_sources):
+    def migrate(apps, schema_editor):
+        """删除旧的触发器和索引后按新的来源表重新创建并重建索引（只支持 SQLite）"""
+        if schema_editor.connection.vendor == 'sqlite':
+            uninstall_search_index(schema_editor.connection, old_sources)
+            install_search_index(schema_editor.connection, new_sources)
+    return migrate
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0014_goalprogress_auto_generated'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            reinstall(PREVIOUS_SOURCES, SEARCH_SOURCES),
+            reinstall(SEARCH_SOURCES, PREVIOUS_SOURCES),
+        ),
+    ]
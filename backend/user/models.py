@@ -1,6 +1,10 @@
 from django.db import models
 from datetime import datetime, time, timedelta
 import json
+from .derived_fields import (
+    DerivedFieldsQuerySet, sleep_duration_expression, sleep_quality_score_expression,
+    exercise_calories_expression, diet_total_calories_expression
+)
 
 # Create your models here.
 class User(models.Model):
@@ -17,18 +21,44 @@ class SleepRecord(models.Model):
     bedtime = models.TimeField(help_text="入睡时间")
     wake_time = models.TimeField(help_text="起床时间")
     sleep_duration = models.IntegerField(help_text="睡眠时长（分钟）", blank=True, null=True)
+    quality_score = models.PositiveSmallIntegerField(default=0, help_text="睡眠质量评分（由睡眠时长计算）")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # 派生字段 -> 来源字段（见 derived_fields.py），质量评分依赖睡眠时长，按声明顺序计算
+    DERIVED_FIELDS = {
+        'sleep_duration': ('bedtime', 'wake_time'),
+        'quality_score': ('bedtime', 'wake_time', 'sleep_duration'),
+    }
+    
+    objects = DerivedFieldsQuerySet.as_manager()
+    
     class Meta:
         unique_together = ['user', 'sleep_date']
         ordering = ['-sleep_date']
+        indexes = [
+            # 按评分筛选睡眠较差的记录（如评分低于60的夜晚）
+            models.Index(fields=['quality_score', 'sleep_date']),
+            # 后台列表的键集分页按 (sleep_date, id) 倒序读取
+            models.Index(fields=['sleep_date', 'id']),
+        ]
     
     def save(self, *args, **kwargs):
-        """保存时自动计算睡眠时长"""
+        """保存时自动计算睡眠时长和质量评分"""
+        self.compute_derived_fields()
+        super().save(*args, **kwargs)
+    
+    def compute_derived_fields(self):
         if self.bedtime and self.wake_time:
             self.sleep_duration = self._calculate_sleep_duration()
-        super().save(*args, **kwargs)
+        self.quality_score = self.quality_score_for_duration(self.sleep_duration)
+    
+    @classmethod
+    def derived_field_expressions(cls):
+        return {
+            'sleep_duration': sleep_duration_expression(),
+            'quality_score': sleep_quality_score_expression(),
+        }
     
     def _calculate_sleep_duration(self):
         """计算睡眠时长（支持跨日）"""
@@ -51,10 +81,15 @@ class SleepRecord(models.Model):
     
     def get_sleep_quality_score(self):
         """根据睡眠时长计算睡眠质量评分"""
-        if not self.sleep_duration:
+        return self.quality_score_for_duration(self.sleep_duration)
+    
+    @staticmethod
+    def quality_score_for_duration(sleep_duration):
+        """睡眠时长（分钟）对应的质量评分（数据库表达式见 derived_fields.sleep_quality_score_expression）"""
+        if not sleep_duration:
             return 0
             
-        duration_hours = self.sleep_duration / 60
+        duration_hours = sleep_duration / 60
         
         # 基于推荐睡眠时长（7-9小时）的评分
         if 7 <= duration_hours <= 9:
@@ -109,29 +144,49 @@ class ExerciseRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # 派生字段 -> 来源字段（见 derived_fields.py），手动填写的卡路里不会被覆盖
+    DERIVED_FIELDS = {'calories_burned': ('calories_burned', 'duration_minutes', 'exercise_type')}
+    
+    objects = DerivedFieldsQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-exercise_date', '-created_at']
+        indexes = [
+            # 后台列表的键集分页按 (exercise_date, created_at, id) 倒序读取
+            models.Index(fields=['exercise_date', 'created_at', 'id']),
+        ]
     
     def save(self, *args, **kwargs):
         """保存时自动计算卡路里消耗（如果没有手动输入）"""
+        self.compute_derived_fields()
+        super().save(*args, **kwargs)
+    
+    def compute_derived_fields(self):
         if not self.calories_burned and self.duration_minutes:
             self.calories_burned = self._calculate_calories()
-        super().save(*args, **kwargs)
+    
+    @classmethod
+    def derived_field_expressions(cls):
+        return {'calories_burned': exercise_calories_expression(cls.MET_VALUES)}
     
     def _calculate_calories(self, weight_kg=65):
         """
         根据MET值计算卡路里消耗
         公式：卡路里 = MET × 体重(kg) × 时间(小时)
-        默认体重65kg
+        默认体重65kg，运算顺序与数据库表达式一致，保证两边结果相同
         """
         met_value = self.MET_VALUES.get(self.exercise_type, 5.0)
-        duration_hours = self.duration_minutes / 60
-        calories = met_value * weight_kg * duration_hours
+        calories = met_value * weight_kg * self.duration_minutes / 60
         return int(calories)
     
     def get_exercise_intensity(self):
         """根据MET值返回运动强度"""
-        met_value = self.MET_VALUES.get(self.exercise_type, 5.0)
+        return self.intensity_for_type(self.exercise_type)
+    
+    @classmethod
+    def intensity_for_type(cls, exercise_type):
+        """运动类型对应的运动强度"""
+        met_value = cls.MET_VALUES.get(exercise_type, 5.0)
         if met_value < 3:
             return "低强度"
         elif met_value < 6:
@@ -181,6 +236,14 @@ class DietRecord(models.Model):
         ('snack', '加餐'),
     ]
     
+    # 餐次显示顺序
+    MEAL_TYPE_ORDER = {
+        'breakfast': 1,
+        'lunch': 2,
+        'dinner': 3,
+        'snack': 4,
+    }
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='diet_records')
     diet_date = models.DateField(help_text="饮食日期")
     meal_type = models.CharField(max_length=20, choices=MEAL_TYPES, help_text="餐次类型")
@@ -192,16 +255,32 @@ class DietRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # 派生字段 -> 来源字段（见 derived_fields.py）
+    DERIVED_FIELDS = {'total_calories': ('portion_size', 'calories_per_100g')}
+    
+    objects = DerivedFieldsQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-diet_date', 'meal_type', '-created_at']
+        indexes = [
+            # 后台列表的键集分页顺序（升降序混合，索引方向需与排序一致）
+            models.Index(fields=['-diet_date', 'meal_type', '-created_at', '-id'], name='user_diet_keyset_idx'),
+        ]
         verbose_name = "饮食记录"
         verbose_name_plural = "饮食记录"
     
     def save(self, *args, **kwargs):
         """保存时自动计算总卡路里"""
+        self.compute_derived_fields()
+        super().save(*args, **kwargs)
+    
+    def compute_derived_fields(self):
         if self.portion_size and self.calories_per_100g:
             self.total_calories = self._calculate_total_calories()
-        super().save(*args, **kwargs)
+    
+    @classmethod
+    def derived_field_expressions(cls):
+        return {'total_calories': diet_total_calories_expression()}
     
     def _calculate_total_calories(self):
         """计算总卡路里：分量 × 每100g卡路里 / 100"""
@@ -209,13 +288,7 @@ class DietRecord(models.Model):
     
     def get_meal_type_display_order(self):
         """返回餐次的显示顺序"""
-        meal_order = {
-            'breakfast': 1,
-            'lunch': 2,
-            'dinner': 3,
-            'snack': 4,
-        }
-        return meal_order.get(self.meal_type, 5)
+        return self.MEAL_TYPE_ORDER.get(self.meal_type, 5)
     
     def __str__(self):
         return f"{self.user.userName} - {self.diet_date} - {self.get_meal_type_display()} - {self.food_name} ({self.total_calories}kcal)"
@@ -237,6 +310,16 @@ class HealthReport(models.Model):
         ('poor', '较差'),
     ]
     
+    # 过期标记位：周期内对应分类的记录被修改后需要重算
+    STALE_SLEEP = 1
+    STALE_EXERCISE = 2
+    STALE_DIET = 4
+    STALE_FLAGS = {
+        'sleep': STALE_SLEEP,
+        'exercise': STALE_EXERCISE,
+        'diet': STALE_DIET,
+    }
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='health_reports')
     report_date = models.DateField(help_text="报告生成日期")
     period_start = models.DateField(help_text="统计周期开始日期")
@@ -258,6 +341,9 @@ class HealthReport(models.Model):
     data_summary = models.TextField(help_text="数据摘要（JSON格式）", default='{}')
     detailed_analysis = models.TextField(help_text="详细分析（JSON格式）", default='{}')
     
+    # 增量刷新标记
+    stale_flags = models.PositiveSmallIntegerField(default=0, db_index=True, help_text="待重算的分类标记位")
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -340,6 +426,14 @@ class HealthReport(models.Model):
         """设置详细分析"""
         self.detailed_analysis = json.dumps(analysis_dict, ensure_ascii=False)
     
+    def is_stale(self):
+        """检查报告是否需要重算"""
+        return self.stale_flags != 0
+    
+    def get_stale_categories(self):
+        """返回待重算的分类列表"""
+        return [category for category, flag in self.STALE_FLAGS.items() if self.stale_flags & flag]
+    
     def get_period_display(self):
         """返回报告周期的显示格式"""
         return f"{self.period_start.strftime('%Y-%m-%d')} to {self.period_end.strftime('%Y-%m-%d')}"
@@ -348,6 +442,25 @@ class HealthReport(models.Model):
         return f"{self.user.userName} - {self.get_period_display()} - {self.overall_score}分"
 
 
+class HealthGoalQuerySet(models.QuerySet):
+    """健康目标查询集"""
+    
+    def with_recent_progress(self, days=7):
+        """预取最近几天的进度记录到 recent_progress_records，避免序列化时逐个目标查询"""
+        from datetime import date
+        end_date = date.today()
+        start_date = end_date - timedelta(days=days - 1)
+        
+        return self.prefetch_related(models.Prefetch(
+            'progress_records',
+            queryset=GoalProgress.objects.filter(
+                date__gte=start_date,
+                date__lte=end_date
+            ).order_by('date'),
+            to_attr='recent_progress_records'
+        ))
+
+
 class HealthGoal(models.Model):
     """健康目标模型"""
     GOAL_TYPES = [
@@ -363,6 +476,7 @@ class HealthGoal(models.Model):
         ('completed', '已完成'),
         ('paused', '已暂停'),
         ('cancelled', '已取消'),
+        ('expired', '已过期'),
     ]
     
     FREQUENCY_CHOICES = [
@@ -399,10 +513,19 @@ class HealthGoal(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = HealthGoalQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = "健康目标"
         verbose_name_plural = "健康目标"
+        indexes = [
+            models.Index(fields=['user', 'goal_type', 'status']),
+            models.Index(fields=['reminder_enabled', 'status', 'reminder_time']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['user', 'status']),
+            models.Index(fields=['status', 'end_date']),
+        ]
     
     def save(self, *args, **kwargs):
         """保存时自动计算进度百分比"""
@@ -428,7 +551,7 @@ class HealthGoal(models.Model):
         if self.progress_percentage >= 100 and self.status == 'active':
             self.status = 'completed'
         
-        self.save()
+        self.save(update_fields=['current_value', 'progress_percentage', 'status', 'updated_at'])
     
     def get_progress_color(self):
         """根据进度返回颜色"""
@@ -450,13 +573,13 @@ class HealthGoal(models.Model):
             'completed': '#22c55e',
             'paused': '#f59e0b',
             'cancelled': '#ef4444',
+            'expired': '#9ca3af',
         }
         return color_map.get(self.status, '#6b7280')
     
     def is_overdue(self):
-        """检查目标是否过期"""
-        from datetime import date
-        return date.today() > self.end_date and self.status == 'active'
+        """目标是否过期：以清理任务（expire_overdue_goals）写入的 expired 状态为准，不按结束日期推算"""
+        return self.status == 'expired'
     
     def days_remaining(self):
         """返回剩余天数"""
@@ -489,6 +612,7 @@ class GoalProgress(models.Model):
     date = models.DateField(help_text="记录日期")
     value = models.FloatField(help_text="当日数值")
     notes = models.TextField(blank=True, help_text="备注")
+    auto_generated = models.BooleanField(default=False, help_text="是否由进度引擎根据记录自动生成（手动填写的进度不会被引擎修改）")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -498,4 +622,95 @@ class GoalProgress(models.Model):
         verbose_name_plural = "目标进度记录"
     
     def __str__(self):
-        return f"{self.goal.title} - {self.date} - {self.value}{self.goal.unit}"
\ No newline at end of file
+        return f"{self.goal.title} - {self.date} - {self.value}{self.goal.unit}"
+
+
+class GoalStatusLog(models.Model):
+    """目标状态变更记录"""
+    goal = models.ForeignKey(HealthGoal, on_delete=models.CASCADE, related_name='status_logs')
+    from_status = models.CharField(max_length=20, help_text="原状态")
+    to_status = models.CharField(max_length=20, help_text="新状态")
+    reason = models.CharField(max_length=100, blank=True, help_text="变更原因")
+    changed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-changed_at']
+        verbose_name = "目标状态记录"
+        verbose_name_plural = "目标状态记录"
+    
+    def __str__(self):
+        return f"{self.goal.title}: {self.from_status} -> {self.to_status}"
+
+
+class GoalReminder(models.Model):
+    """目标提醒发件箱（由提醒调度器写入，等待推送）"""
+    STATUS_CHOICES = [
+        ('pending', '待发送'),
+        ('sent', '已发送'),
+        ('failed', '发送失败'),
+    ]
+    
+    goal = models.ForeignKey(HealthGoal, on_delete=models.CASCADE, related_name='reminders')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='goal_reminders')
+    scheduled_for = models.DateTimeField(help_text="计划提醒时间")
+    message = models.CharField(max_length=200, help_text="提醒内容")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', help_text="发送状态")
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True, help_text="发送时间")
+    
+    class Meta:
+        unique_together = ['goal', 'scheduled_for']
+        ordering = ['-scheduled_for']
+        indexes = [
+            models.Index(fields=['status', 'scheduled_for']),
+        ]
+        verbose_name = "目标提醒"
+        verbose_name_plural = "目标提醒"
+    
+    def __str__(self):
+        return f"{self.user.userName} - {self.goal.title} - {self.scheduled_for}"
+
+
+class DailyRecordAggregate(models.Model):
+    """已归档记录的每日汇总（原始记录移入归档表后，汇总值保留在热表中，见 archive.py）"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_aggregates')
+    record_date = models.DateField(help_text="记录日期")
+    sleep_minutes = models.IntegerField(null=True, blank=True, help_text="睡眠时长合计（分钟）")
+    sleep_count = models.PositiveIntegerField(default=0, help_text="睡眠记录数")
+    exercise_minutes = models.IntegerField(null=True, blank=True, help_text="运动时长合计（分钟）")
+    exercise_calories = models.IntegerField(null=True, blank=True, help_text="运动消耗卡路里合计")
+    exercise_count = models.PositiveIntegerField(default=0, help_text="运动记录数")
+    diet_calories = models.IntegerField(null=True, blank=True, help_text="饮食摄入卡路里合计")
+    diet_count = models.PositiveIntegerField(default=0, help_text="饮食记录数")
+    
+    class Meta:
+        unique_together = ['user', 'record_date']
+        ordering = ['-record_date']
+        verbose_name = "每日汇总（归档）"
+        verbose_name_plural = "每日汇总（归档）"
+    
+    def __str__(self):
+        return f"{self.user.userName} - {self.record_date}"
+
+
+class SystemCounter(models.Model):
+    """
+    后台统计计数器：总数（day 为空）和按记录日期的每日数量
+    由信号增量维护，reconcile_counters 命令定期按实际数据校准（见 counters.py）
+    """
+    name = models.CharField(max_length=50, help_text="计数项")
+    day = models.DateField(null=True, blank=True, help_text="记录日期，为空表示总数")
+    value = models.BigIntegerField(default=0, help_text="数量")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'day'], name='unique_counter_day'),
+            # SQLite 唯一约束中 NULL 互不相等，总数行单独约束
+            models.UniqueConstraint(fields=['name'], condition=models.Q(day__isnull=True), name='unique_counter_total'),
+        ]
+        verbose_name = "统计计数器"
+        verbose_name_plural = "统计计数器"
+    
+    def __str__(self):
+        return f"{self.name} {self.day or '总数'}: {self.value}"
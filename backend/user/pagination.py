@@ -0,0 +1,186 @@
+"""
+后台列表的键集分页
+Django 默认的 Paginator 每页都执行精确的 COUNT(*) 并用 OFFSET 跳过前面的行，越往后翻越慢。
+KeysetPaginationMixin 用上一页最后一行的排序键作为游标（WHERE 排序键 < 游标 LIMIT n），
+任意一页的查询代价都与第一页相同：
+- 上一页/下一页通过 before/after 游标导航，末页按反向排序读取，不支持直接跳到第 N 页
+- 总数：没有筛选条件时读取后台统计计数器（counters.py，一次单行查询），
+  有筛选条件时才执行精确计数（筛选后的结果集通常较小）
+- 末页：计数器包含已归档的记录，末页的页码和行数需要热表中的精确计数，只在跳到末页时执行
+"""
+import base64
+import json
+import math
+import operator
+from datetime import date, datetime, time
+from functools import reduce
+from urllib.parse import urlencode
+from django.db.models import Q
+from .counters import counter_total
+from .sharding import fan_out
+
+
+# 分页导航使用的查询参数，其余非空参数视为筛选条件
+CURSOR_PARAMS = ('after', 'before', 'last', 'page')
+
+
+def _field(model, name):
+    return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+
+def encode_cursor(obj, ordering):
+    """把对象的排序键编码为 URL 安全的游标"""
+    values = []
+    for name in ordering:
+        value = getattr(obj, _field(type(obj), name.lstrip('-')).attname)
+        values.append(value.isoformat() if isinstance(value, (date, datetime, time)) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, model, ordering):
+    """解码游标为排序键的值，格式错误时返回 None"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(ordering):
+            return None
+        return [_field(model, name.lstrip('-')).to_python(value) for name, value in zip(ordering, values)]
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_filter(ordering, values):
+    """
+    排在游标之后的行：按排序字段逐级比较（支持升序/降序混合）
+    额外加上第一个排序字段的范围条件，数据库可以从游标位置开始按索引顺序读取
+    """
+    conditions = []
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        conditions.append(equal & Q(**{f'{field}__{lookup}': value}))
+        equal &= Q(**{field: value})
+    first = ordering[0]
+    bound = Q(**{f'{first.lstrip("-")}__{"lte" if first.startswith("-") else "gte"}': values[0]})
+    return bound & reduce(operator.or_, conditions)
+
+
+def reverse_ordering(ordering):
+    return [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+
+
+class KeysetPaginator:
+    """与 Paginator 相同的总数/页数属性，estimated 表示总数来自计数器（含已归档的记录）"""
+
+    def __init__(self, count, per_page, estimated=False):
+        self.count = count
+        self.per_page = per_page
+        self.estimated = estimated
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.per_page))
+
+
+class KeysetPage:
+    """一页数据及前后页游标"""
+
+    def __init__(self, object_list, number, paginator, previous_cursor=None, next_cursor=None):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def previous_page_number(self):
+        return max(1, self.number - 1)
+
+    def next_page_number(self):
+        return self.number + 1
+
+
+class KeysetPaginationMixin:
+    """
+    ListView 混入类：用键集分页替换默认分页
+    keyset_ordering 为列表的排序字段，最后一个字段必须唯一（通常是主键）；
+    counter_name 为无筛选条件时使用的计数项。get_queryset 返回未排序、未跨分片包装的查询集。
+    """
+    keyset_ordering = ['-pk']
+    counter_name = None
+
+    def get_filter_params(self):
+        return {key: value for key, value in self.request.GET.items() if key not in CURSOR_PARAMS and value}
+
+    def get_page_count(self, queryset):
+        if self.counter_name and not self.get_filter_params():
+            return counter_total(self.counter_name), True
+        return fan_out(queryset).count(), False
+
+    def paginate_queryset(self, queryset, page_size):
+        params = self.request.GET
+        ordering = list(self.keyset_ordering)
+        model = queryset.model
+        try:
+            number = max(1, int(params.get('page', 1)))
+        except ValueError:
+            number = 1
+
+        after = params.get('after') and decode_cursor(params['after'], model, ordering)
+        before = params.get('before') and decode_cursor(params['before'], model, ordering)
+        last = bool(params.get('last'))
+        backward = bool(before) or (last and not after)
+        if after:
+            page_queryset = queryset.filter(keyset_filter(ordering, after))
+        elif before:
+            page_queryset = queryset.filter(keyset_filter(reverse_ordering(ordering), before))
+        else:
+            page_queryset = queryset
+            if not last:
+                number = 1
+        page_queryset = page_queryset.order_by(*(reverse_ordering(ordering) if backward else ordering))
+
+        to_last = last and not (after or before)
+        if to_last:
+            count, estimated = fan_out(queryset).count(), False
+        else:
+            count, estimated = self.get_page_count(queryset)
+        paginator = KeysetPaginator(count, page_size, estimated)
+        size = page_size
+        if to_last:
+            # 末页只包含最后不足一页的行，与从首页逐页翻到末页的分页一致
+            number = paginator.num_pages
+            size = count - (number - 1) * page_size if count else page_size
+
+        # 多取一行判断是否还有下一页（反向读取时为上一页）
+        rows = list(fan_out(page_queryset)[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if backward:
+            rows.reverse()
+            has_previous, has_next = has_more, bool(before)
+        else:
+            has_previous, has_next = bool(after), has_more
+
+        page = KeysetPage(
+            rows, number, paginator,
+            previous_cursor=encode_cursor(rows[0], ordering) if rows and has_previous else None,
+            next_cursor=encode_cursor(rows[-1], ordering) if rows and has_next else None,
+        )
+        return paginator, page, rows, has_previous or has_next
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page_query'] = urlencode(self.get_filter_params())
+        return context
@@ -0,0 +1,190 @@
+"""
+慢请求采样分析
+对单个请求运行 cProfile 或轻量级栈采样器，只保留耗时超过阈值的请求：
+cProfile 结果保存为 .pstats（可用 snakeviz / pstats 查看），
+栈采样结果保存为火焰图折叠格式 .collapsed（可用 flamegraph.pl / speedscope 查看），
+每次采集另存一个 JSON 元数据文件，供后台页面列出。目录只保留最近 PROFILING_MAX_FILES 次采集。
+
+开启方式：
+- PROFILING_ENABLED = True：分析所有请求（仅用于排查期间）
+- 请求携带签名头 X-Profile: <make_profile_token() 生成的值>：只分析该请求
+"""
+import cProfile
+import json
+import sys
+import threading
+import uuid
+from collections import Counter
+from pathlib import Path
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'user.profiling'
+TOKEN_MAX_AGE = 3600  # 签名头有效期（秒）
+
+MODES = ['cprofile', 'sampler']
+
+
+def get_profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def make_profile_token(mode='cprofile'):
+    """生成 X-Profile 请求头的值（带时间戳签名，TOKEN_MAX_AGE 秒内有效）"""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(mode)
+
+
+def requested_mode(request):
+    """
+    返回本次请求应使用的分析模式，不需要分析时返回 None
+    有效签名头优先（可指定模式），其次是全局开关
+    """
+    token = request.META.get(PROFILE_HEADER)
+    if token:
+        try:
+            mode = signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            mode = None
+        if mode in MODES:
+            return mode
+    if getattr(settings, 'PROFILING_ENABLED', False):
+        return getattr(settings, 'PROFILING_MODE', 'cprofile')
+    return None
+
+
+class StackSampler:
+    """
+    栈采样器：后台线程按固定间隔读取目标线程的调用栈并计数
+    开销只与采样频率有关，与被分析代码的函数调用次数无关
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """火焰图折叠格式：每行 "帧;帧;帧 次数" """
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """围绕一次请求运行的分析器"""
+
+    # 同一线程上同时只能有一个 cProfile 生效（异步请求共用事件循环线程）
+    _active = threading.local()
+
+    def __init__(self, mode):
+        self.mode = mode
+        self._profiler = None
+        self._sampler = None
+
+    def start(self):
+        """开始分析，当前线程已在分析其他请求时返回 False"""
+        if getattr(self._active, 'busy', False):
+            return False
+        self._active.busy = True
+        if self.mode == 'sampler':
+            self._sampler = StackSampler(
+                threading.get_ident(), getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005)
+            )
+            self._sampler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return True
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self._active.busy = False
+
+    def save(self, request, response, duration):
+        """保存分析结果和元数据，返回元数据"""
+        profile_dir = get_profile_dir()
+        profile_dir.mkdir(parents=True, exist_ok=True)
+
+        now = timezone.now()
+        profile_id = f"{now.strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+        if self._profiler is not None:
+            filename = f'{profile_id}.pstats'
+            self._profiler.dump_stats(str(profile_dir / filename))
+        else:
+            filename = f'{profile_id}.collapsed'
+            (profile_dir / filename).write_text(self._sampler.collapsed(), encoding='utf-8')
+
+        match = request.resolver_match
+        meta = {
+            'id': profile_id,
+            'file': filename,
+            'mode': self.mode,
+            'path': request.path,
+            'method': request.method,
+            'view': match.view_name if match else '',
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'captured_at': now.isoformat(),
+        }
+        (profile_dir / f'{profile_id}.json').write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        rotate_profiles(profile_dir)
+        return meta
+
+
+def rotate_profiles(profile_dir=None, keep=None):
+    """只保留最近 keep 次采集，删除更早的结果文件和元数据"""
+    profile_dir = profile_dir or get_profile_dir()
+    keep = keep if keep is not None else getattr(settings, 'PROFILING_MAX_FILES', 50)
+    # 文件名以采集时间开头，按名称排序即按时间排序
+    sidecars = sorted(profile_dir.glob('*.json'), reverse=True)
+    for sidecar in sidecars[keep:]:
+        for path in profile_dir.glob(f'{sidecar.stem}.*'):
+            path.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """列出已采集的慢请求（最新的在前）"""
+    profile_dir = get_profile_dir()
+    if not profile_dir.is_dir():
+        return []
+    profiles = []
+    for sidecar in sorted(profile_dir.glob('*.json'), reverse=True):
+        try:
+            profiles.append(json.loads(sidecar.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def get_profile_path(profile_id):
+    """返回采集结果文件路径，不存在时返回 None"""
+    for meta in list_profiles():
+        if meta['id'] == profile_id:
+            path = get_profile_dir() / meta['file']
+            return path if path.is_file() else None
+    return None
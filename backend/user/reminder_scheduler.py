@@ -0,0 +1,175 @@
+"""
+健康目标提醒调度器
+内存中只保留前瞻窗口内即将到期的提醒（最小堆），窗口随时间推进按索引分段加载；
+目标变更通过 updated_at 增量同步，过期的堆条目采用惰性删除。
+到期提醒写入 GoalReminder 发件箱，由推送服务发送。
+开启分片时逐个分片加载、同步和写入（目标主键全局唯一，内存中的堆不区分分片）。
+"""
+import heapq
+import time
+from datetime import datetime, timedelta
+from django.utils import timezone
+from .models import HealthGoal, GoalReminder
+from .sharding import shard_aliases, using_shard
+
+
+class ReminderScheduler:
+    """提醒调度器（单进程运行）"""
+
+    # 每次查询的批量大小（同时受 SQLite 参数数量限制）
+    BATCH_SIZE = 500
+
+    def __init__(self, lookahead_minutes=10):
+        if not 0 < lookahead_minutes < 24 * 60:
+            raise ValueError('前瞻窗口必须在 1 分钟到 24 小时之间')
+        self.lookahead = timedelta(minutes=lookahead_minutes)
+        self._heap = []          # (提醒时间, 目标ID)
+        self._scheduled = {}     # 目标ID -> 当前有效的提醒时间
+        self._loaded_until = None
+        self._last_sync = None
+
+    def _eligible_goals(self):
+        """可调度的目标，命中 (reminder_enabled, status, reminder_time) 索引"""
+        return HealthGoal.objects.filter(
+            reminder_enabled=True,
+            status='active',
+            reminder_time__isnull=False
+        )
+
+    def _schedule(self, goal_id, fire_at):
+        if self._scheduled.get(goal_id) == fire_at:
+            return
+        self._scheduled[goal_id] = fire_at
+        heapq.heappush(self._heap, (fire_at, goal_id))
+
+    def _load_window(self, start, end):
+        """加载 [start, end) 内到期的提醒，跨越零点时按日期分段查询"""
+        start = timezone.localtime(start)
+        end = timezone.localtime(end)
+        while start < end:
+            day_end = timezone.make_aware(
+                datetime.combine(start.date() + timedelta(days=1), datetime.min.time())
+            )
+            segment_end = min(end, day_end)
+            for alias in shard_aliases():
+                with using_shard(alias):
+                    goals = self._eligible_goals().filter(reminder_time__gte=start.time())
+                    if segment_end < day_end:
+                        goals = goals.filter(reminder_time__lt=segment_end.time())
+
+                    for goal_id, reminder_time in goals.values_list('id', 'reminder_time').iterator(
+                        chunk_size=self.BATCH_SIZE
+                    ):
+                        fire_at = timezone.make_aware(datetime.combine(start.date(), reminder_time))
+                        self._schedule(goal_id, fire_at)
+            start = segment_end
+
+    def _next_fire_at(self, reminder_time, now):
+        """返回 now 之后、已加载窗口内的下一次提醒时间"""
+        local_now = timezone.localtime(now)
+        for offset in (0, 1):
+            fire_at = timezone.make_aware(
+                datetime.combine(local_now.date() + timedelta(days=offset), reminder_time)
+            )
+            if fire_at >= now:
+                return fire_at if fire_at < self._loaded_until else None
+        return None
+
+    def _sync_changes(self, now):
+        """同步上次检查以来变更过的目标（命中 updated_at 索引）"""
+        sync_started = timezone.now()
+        for alias in shard_aliases():
+            with using_shard(alias):
+                changed = HealthGoal.objects.filter(updated_at__gte=self._last_sync).values_list(
+                    'id', 'reminder_enabled', 'status', 'reminder_time'
+                )
+                for goal_id, enabled, goal_status, reminder_time in changed.iterator(chunk_size=self.BATCH_SIZE):
+                    fire_at = None
+                    if enabled and goal_status == 'active' and reminder_time:
+                        fire_at = self._next_fire_at(reminder_time, now)
+                    if fire_at:
+                        self._schedule(goal_id, fire_at)
+                    else:
+                        # 惰性删除：堆中条目在弹出时因版本不符被丢弃
+                        self._scheduled.pop(goal_id, None)
+        self._last_sync = sync_started
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, goal_id = heapq.heappop(self._heap)
+            if self._scheduled.get(goal_id) != fire_at:
+                continue
+            del self._scheduled[goal_id]
+            due.append((goal_id, fire_at))
+
+        # 失效条目过多时重建堆，保证内存有界
+        if len(self._heap) > 2 * len(self._scheduled) + self.BATCH_SIZE:
+            self._heap = [(f, g) for f, g in self._heap if self._scheduled.get(g) == f]
+            heapq.heapify(self._heap)
+        return due
+
+    def _deliver(self, due):
+        """校验到期目标仍然有效后批量写入发件箱（写入目标所在的分片），返回写入数"""
+        delivered = 0
+        for i in range(0, len(due), self.BATCH_SIZE):
+            batch = dict(due[i:i + self.BATCH_SIZE])
+            for alias in shard_aliases():
+                with using_shard(alias):
+                    delivered += self._deliver_batch(batch)
+        return delivered
+
+    def _deliver_batch(self, batch):
+        """在当前分片中写入一批到期提醒：{目标ID: 提醒时间}"""
+        reminders = []
+        goals = self._eligible_goals().filter(pk__in=batch).only(
+            'id', 'user_id', 'title', 'reminder_time', 'start_date', 'end_date', 'progress_percentage'
+        )
+        for goal in goals:
+            fire_at = batch[goal.pk]
+            local_fire_at = timezone.localtime(fire_at)
+            if goal.reminder_time != local_fire_at.time():
+                continue
+            if not goal.start_date <= local_fire_at.date() <= goal.end_date:
+                continue
+            reminders.append(GoalReminder(
+                goal_id=goal.pk,
+                user_id=goal.user_id,
+                scheduled_for=fire_at,
+                message=f'提醒：{goal.title}（当前进度 {goal.progress_percentage:.0f}%）'
+            ))
+        # 唯一约束 (goal, scheduled_for) 保证重启或多次调度不会重复写入
+        GoalReminder.objects.bulk_create(reminders, ignore_conflicts=True)
+        return len(reminders)
+
+    def tick(self, now=None):
+        """执行一轮调度，返回写入发件箱的提醒数"""
+        now = now or timezone.now()
+        if self._loaded_until is None:
+            self._last_sync = timezone.now()
+            self._loaded_until = now
+
+        self._sync_changes(now)
+
+        horizon = now + self.lookahead
+        if self._loaded_until < horizon:
+            self._load_window(max(self._loaded_until, now), horizon)
+            self._loaded_until = horizon
+
+        return self._deliver(self._pop_due(now))
+
+    def seconds_until_next(self, now=None):
+        """距离下一条提醒的秒数，没有待处理提醒时返回 None"""
+        if not self._heap:
+            return None
+        now = now or timezone.now()
+        return max(0.0, (self._heap[0][0] - now).total_seconds())
+
+    def run(self, poll_interval=1.0, on_tick=None):
+        """持续运行：在下一条提醒到期或下一次同步时唤醒"""
+        while True:
+            delivered = self.tick()
+            if on_tick:
+                on_tick(delivered)
+            wait = self.seconds_until_next()
+            time.sleep(poll_interval if wait is None else min(poll_interval, wait))
@@ -0,0 +1,64 @@
+"""
+API 渲染器
+安装了 orjson 时使用 orjson 编码，否则回退到 DRF 默认的标准库 json 编码
+"""
+import math
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    输出与 DRF JSONRenderer 解析结果相同的 JSON（浮点数的文本格式可能不同，如 1e-05 输出为 0.00001）
+    - datetime/date/time 由 orjson 原生编码（UTC 以 Z 结尾）
+    - Decimal、惰性翻译字符串、QuerySet 等交给 DRF 的 JSONEncoder 处理
+    - 需要缩进（如可浏览 API）时使用父类的标准库实现
+    - orjson 不支持的数据（超过64位的整数等）回退到父类；NaN/Infinity 与父类行为一致
+      （STRICT_JSON 时抛出 ValueError，否则由父类输出），不会像 orjson 那样变成 null
+    """
+    ORJSON_OPTIONS = (
+        orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    ) if orjson else 0
+
+    _fallback_encoder = encoders.JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self._fallback_encoder.default, option=self.ORJSON_OPTIONS)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # orjson 把 NaN/Infinity 编码为 null：输出含 null 时才检查原始数据
+        if b'null' in ret and _has_non_finite_float(data):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # 与 DRF 一致，转义 U+2028/U+2029 以保证输出是合法的 JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+def _has_non_finite_float(data):
+    """数据中是否含有 NaN/Infinity（遍历字典、列表和元组）"""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
@@ -0,0 +1,80 @@
+"""
+健康报告增量刷新
+记录写入后标记覆盖该日期的报告为过期，后台任务只重算受影响的分类评分
+"""
+from django.db.models import F
+from django.utils import timezone
+from .models import HealthReport
+from .health_analyzer import HealthAnalyzer
+from .sharding import shard_aliases, using_shard
+
+
+def mark_reports_stale(user_id, record_date, category):
+    """
+    标记覆盖指定日期的报告为过期
+    通过 (user, period_start, period_end) 索引做区间查找，单条 UPDATE 完成
+    """
+    flag = HealthReport.STALE_FLAGS.get(category)
+    if not flag or record_date is None:
+        return 0
+
+    return HealthReport.objects.filter(
+        user_id=user_id,
+        period_start__lte=record_date,
+        period_end__gte=record_date
+    ).update(stale_flags=F('stale_flags').bitor(flag))
+
+
+def refresh_report(report):
+    """
+    重算单份报告中被标记的分类评分
+    使用乐观检查：若重算期间又有新的标记，则本次不清除标记，留给下一轮处理
+    返回是否成功刷新
+    """
+    flags = report.stale_flags
+    if not flags:
+        return False
+
+    period_days = (report.period_end - report.period_start).days + 1
+    analyzer = HealthAnalyzer(report.user, period_days, end_date=report.period_end)
+
+    # 只重算受影响的分类，其余沿用已保存的评分
+    if flags & HealthReport.STALE_SLEEP:
+        report.sleep_score = analyzer.calculate_sleep_score()
+    if flags & HealthReport.STALE_EXERCISE:
+        report.exercise_score = analyzer.calculate_exercise_score()
+    if flags & HealthReport.STALE_DIET:
+        report.diet_score = analyzer.calculate_diet_score()
+
+    report.overall_score = HealthAnalyzer.combine_overall_score(
+        report.sleep_score, report.exercise_score, report.diet_score
+    )
+    report.health_grade = report._calculate_health_grade()
+
+    updated = HealthReport.objects.filter(pk=report.pk, stale_flags=flags).update(
+        sleep_score=report.sleep_score,
+        exercise_score=report.exercise_score,
+        diet_score=report.diet_score,
+        overall_score=report.overall_score,
+        health_grade=report.health_grade,
+        stale_flags=0,
+        updated_at=timezone.now()
+    )
+    if updated:
+        report.stale_flags = 0
+    return bool(updated)
+
+
+def refresh_stale_reports(limit=100):
+    """批量刷新过期报告（开启分片时每个分片各刷新最多 limit 份），返回本轮刷新的报告数"""
+    refreshed = 0
+    for alias in shard_aliases():
+        with using_shard(alias):
+            reports = HealthReport.objects.filter(
+                stale_flags__gt=0
+            ).select_related('user').order_by('updated_at')[:limit]
+
+            for report in reports:
+                if refresh_report(report):
+                    refreshed += 1
+    return refreshed
@@ -0,0 +1,228 @@
+"""
+后台全文搜索索引
+用户名、食物名称和运动/饮食/目标进度的备注写入同一张 SQLite FTS5 表 user_search_index，
+使用 trigram 分词（按任意连续3个字符建立索引，中文不需要分词即可做子串搜索）：
+- 同步：各来源表上的触发器在插入、修改、删除时更新索引，bulk_create、update() 和原始 SQL
+  （如归档删除）同样生效；SQLite 重建表（部分迁移操作）会删除触发器，post_migrate 时检查并重建
+- 行号：rowid = 来源主键 << KIND_BITS | 类别编号，按主键定位索引行，不需要额外的映射表
+- 选项字段（如运动类型）索引显示名称而不是选项代码，后台按"跑步"而不是"running"搜索
+- 查询：不少于3个字符时用 MATCH（bm25 排序，标题权重高于正文），更短的查询在索引表上用 LIKE
+开启分片时每个数据库各自维护索引，记录类别在所有分片中搜索；只支持 SQLite，其他数据库退化为 icontains。
+"""
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .models import User, FoodCalorieReference, ExerciseRecord, DietRecord, GoalProgress
+from .sharding import shard_aliases, is_sharded
+
+
+SEARCH_TABLE = 'user_search_index'
+
+# 类别编号占用 rowid 的低位
+KIND_BITS = 3
+KIND_MASK = (1 << KIND_BITS) - 1
+
+# MATCH 查询的最短长度（trigram 分词），更短的查询用 LIKE
+MIN_MATCH_LENGTH = 3
+
+# 标题、正文在 bm25 中的权重
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+# 类别 -> (编号, 模型, 标题字段, 正文字段)；标题字段有 choices 时索引显示名称
+SEARCH_SOURCES = {
+    'user': (1, User, 'userName', None),
+    'food': (2, FoodCalorieReference, 'food_name', 'description'),
+    'exercise': (3, ExerciseRecord, 'exercise_type', 'notes'),
+    'diet': (4, DietRecord, 'food_name', 'notes'),
+    'goal_progress': (5, GoalProgress, None, 'notes'),
+}
+
+CATEGORY_BY_KIND = {kind: category for category, (kind, _, _, _) in SEARCH_SOURCES.items()}
+
+
+def source_tables():
+    """
+    触发器和重建使用的来源表：[(编号, 表名, 标题列, 正文列, 标题显示名称)]
+    标题字段有 choices 时，标题显示名称为 {选项代码: 显示名称}，否则为 None
+    """
+    sources = []
+    for kind, model, title, body in SEARCH_SOURCES.values():
+        title_field = model._meta.get_field(title) if title else None
+        sources.append((
+            kind, model._meta.db_table,
+            title_field.column if title_field else None,
+            model._meta.get_field(body).column if body else None,
+            dict(title_field.flatchoices) if title_field and title_field.choices else None,
+        ))
+    return sources
+
+
+def _quote_value(value):
+    return "'%s'" % str(value).replace("'", "''")
+
+
+def _values_sql(connection, title, body, labels=None, prefix=''):
+    """写入索引的 (标题, 正文) 表达式，prefix 为触发器中的 new. 前缀；labels 把选项代码换成显示名称"""
+    qn = connection.ops.quote_name
+    values = []
+    for column, column_labels in ((title, labels), (body, None)):
+        if not column:
+            values.append("''")
+            continue
+        expression = f'{prefix}{qn(column)}'
+        if column_labels:
+            cases = ' '.join(f'WHEN {_quote_value(code)} THEN {_quote_value(label)}'
+                             for code, label in column_labels.items())
+            expression = f'CASE {expression} {cases} ELSE {expression} END'
+        values.append(f"COALESCE({expression}, '')")
+    return ', '.join(values)
+
+
+def _trigger_names(table):
+    return [f'{SEARCH_TABLE}_{table}_{suffix}' for suffix in ('ai', 'au', 'ad')]
+
+
+def _trigger_sql(connection, kind, table, title, body, labels=None):
+    qn = connection.ops.quote_name
+    index = qn(SEARCH_TABLE)
+    values = _values_sql(connection, title, body, labels, prefix='new.')
+    insert = f'INSERT INTO {index} (rowid, title, body) VALUES ((new.id << {KIND_BITS}) | {kind}, {values});'
+    delete = f'DELETE FROM {index} WHERE rowid = (old.id << {KIND_BITS}) | {kind};'
+    columns = ', '.join(qn(column) for column in (title, body) if column)
+    insert_trigger, update_trigger, delete_trigger = (qn(name) for name in _trigger_names(table))
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {insert_trigger} AFTER INSERT ON {qn(table)} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {update_trigger} AFTER UPDATE OF {columns} ON {qn(table)} '
+        f'BEGIN {delete} {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {delete_trigger} AFTER DELETE ON {qn(table)} BEGIN {delete} END',
+    ]
+
+
+def install_search_index(connection, sources):
+    """创建索引表和触发器，并按来源表的现有数据重建索引"""
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {qn(SEARCH_TABLE)} USING fts5(title, body, tokenize='trigram')")
+        for source in sources:
+            for sql in _trigger_sql(connection, *source):
+                cursor.execute(sql)
+    rebuild_search_index(connection, sources)
+
+
+def uninstall_search_index(connection, sources):
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for source in sources:
+            for name in _trigger_names(source[1]):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {qn(name)}')
+        cursor.execute(f'DROP TABLE IF EXISTS {qn(SEARCH_TABLE)}')
+
+
+def rebuild_search_index(connection, sources=None):
+    """清空索引后从来源表重新写入，返回写入的行数"""
+    qn = connection.ops.quote_name
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {qn(SEARCH_TABLE)}')
+        for kind, table, title, body, *labels in sources or source_tables():
+            values = _values_sql(connection, title, body, *labels)
+            cursor.execute(
+                f'INSERT INTO {qn(SEARCH_TABLE)} (rowid, title, body) '
+                f'SELECT (id << {KIND_BITS}) | {kind}, {values} FROM {qn(table)}'
+            )
+            total += cursor.rowcount
+    return total
+
+
+def ensure_search_index(connection):
+    """触发器缺失时（如迁移重建了来源表）重新创建并重建索引，返回是否做了修复"""
+    if connection.vendor != 'sqlite':
+        return False
+    sources = source_tables()
+    expected = {SEARCH_TABLE} | {name for source in sources for name in _trigger_names(source[1])}
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+    if SEARCH_TABLE not in existing or expected <= existing:
+        return False
+    install_search_index(connection, sources)
+    return True
+
+
+def _escape_like(query):
+    return '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _match_condition(query, column=None):
+    """索引表的查询条件：(SQL, 参数, 是否可按 bm25 排序)，column 为 None 时搜索标题和正文"""
+    if len(query) >= MIN_MATCH_LENGTH:
+        phrase = '"%s"' % query.replace('"', '""')
+        return f'{SEARCH_TABLE} MATCH %s', [f'{column} : {phrase}' if column else phrase], True
+    columns = [column] if column else ['title', 'body']
+    condition = ' OR '.join(f"{name} LIKE %s ESCAPE '\\'" for name in columns)
+    return f'({condition})', [_escape_like(query)] * len(columns), False
+
+
+def search_filter(category, query, field=None):
+    """
+    列表视图的搜索条件（替换 field__icontains）：主键在索引命中的行中
+    默认只搜索标题字段；子查询在查询集所在的数据库（分片）中执行
+    """
+    kind, model, title, _ = SEARCH_SOURCES[category]
+    field = field or title
+    query = query.strip()
+    if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+        return Q(**{f'{field}__icontains': query})
+    column = 'title' if field == title else 'body'
+    condition, params, _ = _match_condition(query, column)
+    return Q(pk__in=RawSQL(
+        f'SELECT rowid >> {KIND_BITS} FROM {SEARCH_TABLE} WHERE {condition} AND (rowid & {KIND_MASK}) = %s',
+        params + [kind]
+    ))
+
+
+def _aliases_for(category):
+    model = SEARCH_SOURCES[category][1]
+    if not is_sharded(model):
+        return [router.db_for_read(model) or DEFAULT_DB_ALIAS]
+    return [alias or router.db_for_read(model) or DEFAULT_DB_ALIAS for alias in shard_aliases()]
+
+
+def search(query, categories=None, limit=20):
+    """
+    跨类别搜索，按相关度排序（bm25 得分越小越相关；短查询按写入先后倒序）
+    返回 [{'category', 'id', 'title', 'body', 'score'}, ...]
+    """
+    query = query.strip()
+    if not query:
+        return []
+    kinds_by_alias = {}
+    for category in categories or SEARCH_SOURCES:
+        for alias in _aliases_for(category):
+            kinds_by_alias.setdefault(alias, []).append(SEARCH_SOURCES[category][0])
+
+    condition, params, ranked = _match_condition(query)
+    score = f'bm25({SEARCH_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT})' if ranked else '0'
+    results = []
+    for alias, kinds in kinds_by_alias.items():
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            continue
+        sql = (
+            f'SELECT rowid, title, body, {score} AS score FROM {SEARCH_TABLE} '
+            f'WHERE {condition} AND (rowid & {KIND_MASK}) IN ({", ".join(["%s"] * len(kinds))}) '
+            f'ORDER BY {"score" if ranked else "rowid DESC"} LIMIT %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + kinds + [limit])
+            for rowid, title, body, row_score in cursor.fetchall():
+                results.append({
+                    'category': CATEGORY_BY_KIND[rowid & KIND_MASK],
+                    'id': rowid >> KIND_BITS,
+                    'title': title,
+                    'body': body,
+                    'score': row_score,
+                })
+    results.sort(key=lambda result: result['score'])
+    return results[:limit]
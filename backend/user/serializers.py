@@ -42,7 +42,8 @@ class SleepRecordSerializer(serializers.ModelSerializer):
         read_only_fields = ['sleep_duration', 'created_at', 'updated_at']
     
     def get_sleep_quality_score(self, obj):
-        return obj.get_sleep_quality_score()
+        # 已保存的记录直接使用评分字段
+        return obj.quality_score if obj.pk else obj.get_sleep_quality_score()
     
     def get_sleep_duration_hours(self, obj):
         if obj.sleep_duration:
@@ -240,6 +241,9 @@ class HealthReportSerializer(serializers.ModelSerializer):
     recommendations = serializers.SerializerMethodField(read_only=True)
     data_summary = serializers.SerializerMethodField(read_only=True)
     detailed_analysis = serializers.SerializerMethodField(read_only=True)
+    peer_comparison = serializers.SerializerMethodField(read_only=True)
+    is_stale = serializers.SerializerMethodField(read_only=True)
+    stale_categories = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
         model = HealthReport
@@ -249,13 +253,20 @@ class HealthReportSerializer(serializers.ModelSerializer):
             'scores', 'health_grade', 'health_grade_display', 'grade',
             'health_trend', 'health_trend_display',
             'key_insights', 'recommendations', 'data_summary', 'detailed_analysis',
-            'created_at', 'updated_at'
+            'peer_comparison', 'is_stale', 'stale_categories', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
     
     def get_health_grade_display(self, obj):
         return obj.get_health_grade_display()
     
+    def get_is_stale(self, obj):
+        """周期内记录有变动、评分尚未重算（读接口不重算，由生成报告接口或后台任务处理）"""
+        return obj.is_stale()
+    
+    def get_stale_categories(self, obj):
+        return obj.get_stale_categories()
+    
     def get_health_trend_display(self, obj):
         return obj.get_health_trend_display()
     
@@ -296,6 +307,11 @@ class HealthReportSerializer(serializers.ModelSerializer):
     def get_detailed_analysis(self, obj):
         """返回详细分析"""
         return obj.get_detailed_analysis_dict()
+    
+    def get_peer_comparison(self, obj):
+        """返回与全体同学对比的百分位（群体摘要未缓存或报告没有数据时为 None）"""
+        from .cohort_analytics import get_report_peer_comparison
+        return get_report_peer_comparison(obj)
 
 
 class HealthReportListSerializer(serializers.ModelSerializer):
@@ -362,8 +378,29 @@ class GoalProgressSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = GoalProgress
-        fields = ['id', 'date', 'value', 'notes', 'created_at']
-        read_only_fields = ['created_at']
+        fields = ['id', 'date', 'value', 'notes', 'auto_generated', 'created_at']
+        read_only_fields = ['auto_generated', 'created_at']
+
+
+class GoalProgressEntrySerializer(serializers.Serializer):
+    """批量进度提交中的单条记录"""
+    goal_id = serializers.IntegerField()
+    date = serializers.DateField()
+    value = serializers.FloatField(min_value=0, error_messages={'min_value': '进度数值不能为负数'})
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class GoalProgressBatchSerializer(serializers.Serializer):
+    """批量提交目标进度的请求序列化器"""
+    MAX_ENTRIES = 500
+    
+    entries = GoalProgressEntrySerializer(many=True, allow_empty=False)
+    
+    def validate_entries(self, value):
+        """验证记录条数"""
+        if len(value) > self.MAX_ENTRIES:
+            raise serializers.ValidationError(f"单次最多提交{self.MAX_ENTRIES}条进度记录")
+        return value
 
 
 class HealthGoalSerializer(serializers.ModelSerializer):
@@ -405,15 +442,18 @@ class HealthGoalSerializer(serializers.ModelSerializer):
         return obj.is_overdue()
     
     def get_recent_progress(self, obj):
-        """获取最近7天的进度记录"""
-        from datetime import date, timedelta
-        end_date = date.today()
-        start_date = end_date - timedelta(days=6)
+        """获取最近7天的进度记录（优先使用 with_recent_progress() 预取的结果）"""
+        progress_records = getattr(obj, 'recent_progress_records', None)
         
-        progress_records = obj.progress_records.filter(
-            date__gte=start_date,
-            date__lte=end_date
-        ).order_by('date')
+        if progress_records is None:
+            from datetime import date, timedelta
+            end_date = date.today()
+            start_date = end_date - timedelta(days=6)
+            
+            progress_records = obj.progress_records.filter(
+                date__gte=start_date,
+                date__lte=end_date
+            ).order_by('date')
         
         return GoalProgressSerializer(progress_records, many=True).data
 
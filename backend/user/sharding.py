@@ -0,0 +1,179 @@
+"""
+按用户分片
+开启 USER_SHARDS 后，按 user_id 把用户的健康数据（SHARDED_MODELS）分散到多个数据库，
+每个分片是独立的 SQLite 文件，拥有独立的写锁，写入吞吐量随分片数增长。
+
+- 分片映射：shard_for_user()，user_id 对分片数取模；分片数确定后不能修改（需要重新分布数据）
+- 用户表保存在主库，并同步一份到用户所在分片，供外键和 select_related 使用
+- API 请求在 Token 认证后通过 using_shard() 进入用户的分片，路由见 db_routers.UserShardRouter
+- 后台列表、统计和群体分析等跨用户查询通过 fan_out() / shard_aliases() 查询所有分片后合并
+- 各分片的自增主键从 SHARD_ID_OFFSET 的不同倍数开始（init_user_shards 命令），保证主键全局唯一
+
+未配置 USER_SHARDS 时所有函数退化为单库行为。
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.http import Http404
+
+
+# 按用户分片的模型（小写模型名 -> 指向用户的字段路径），按外键依赖排序
+SHARDED_MODELS = {
+    'sleeprecord': 'user_id',
+    'exerciserecord': 'user_id',
+    'dietrecord': 'user_id',
+    'healthreport': 'user_id',
+    'healthgoal': 'user_id',
+    'goalprogress': 'goal__user_id',
+    'goalstatuslog': 'goal__user_id',
+    'goalreminder': 'user_id',
+    'dailyrecordaggregate': 'user_id',
+}
+
+SHARD_ID_OFFSET = 10 ** 12
+
+_current_shard = ContextVar('user_shard', default=None)
+
+
+def get_shards():
+    return getattr(settings, 'USER_SHARDS', [])
+
+
+def is_sharded(model):
+    return bool(get_shards()) and model._meta.app_label == 'user' and model._meta.model_name in SHARDED_MODELS
+
+
+def shard_for_user(user_id):
+    """用户所在的分片，未开启分片时返回 None（由其他路由决定）"""
+    shards = get_shards()
+    if not shards or user_id is None:
+        return None
+    return shards[user_id % len(shards)]
+
+
+def current_shard():
+    return _current_shard.get()
+
+
+def shard_aliases():
+    """跨分片查询需要遍历的数据库，未开启分片时为 [None]（使用默认路由）"""
+    return get_shards() or [None]
+
+
+@contextmanager
+def using_shard(alias):
+    """在代码块内把分片模型的查询路由到指定分片"""
+    token = _current_shard.set(alias)
+    try:
+        yield
+    finally:
+        _current_shard.reset(token)
+
+
+def activate_user_shard(user):
+    """请求认证后进入用户所在的分片（由 UserShardMiddleware 在请求结束时恢复）"""
+    _current_shard.set(shard_for_user(user.id))
+
+
+def _sort_key(value):
+    # None 排在最前，避免与日期等类型比较
+    return (value is not None, value)
+
+
+class CrossShardQuery:
+    """
+    跨分片查询：对每个分片执行同一个查询集，在内存中按查询集的排序合并
+    支持 filter/exclude/count/切片/迭代，可直接交给 Paginator 和 ListView 分页。
+    切片 [a:b] 时每个分片只取前 b 条再合并，翻页越深读取越多，适合后台管理等低频场景。
+    """
+    ordered = True
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.model = queryset.model
+
+    def _per_shard(self):
+        return [self.queryset.using(alias) for alias in get_shards()]
+
+    def _ordering(self):
+        ordering = list(self.queryset.query.order_by or self.model._meta.ordering) or ['-pk']
+        return [
+            (field.lstrip('-'), field.startswith('-'))
+            for field in ordering if isinstance(field, str) and '__' not in field
+        ]
+
+    def _merge(self, objects):
+        for field, descending in reversed(self._ordering()):
+            attname = 'pk' if field == 'pk' else self.model._meta.get_field(field).attname
+            objects.sort(key=lambda obj: _sort_key(getattr(obj, attname)), reverse=descending)
+        return objects
+
+    def filter(self, *args, **kwargs):
+        return CrossShardQuery(self.queryset.filter(*args, **kwargs))
+
+    def exclude(self, *args, **kwargs):
+        return CrossShardQuery(self.queryset.exclude(*args, **kwargs))
+
+    def count(self):
+        return sum(queryset.count() for queryset in self._per_shard())
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self._per_shard())
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        if key.stop is None:
+            return self._merge([obj for queryset in self._per_shard() for obj in queryset])[key]
+        objects = [obj for queryset in self._per_shard() for obj in queryset[:key.stop]]
+        return self._merge(objects)[key]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __len__(self):
+        return self.count()
+
+
+def fan_out(queryset):
+    """开启分片时把分片模型的查询集包装为跨分片查询，否则原样返回"""
+    if is_sharded(queryset.model):
+        return CrossShardQuery(queryset)
+    return queryset
+
+
+def iterate_shards(queryset):
+    """依次迭代各分片上的查询结果（不排序合并，适合聚合分析）"""
+    for alias in shard_aliases():
+        yield from queryset.using(alias).iterator()
+
+
+def get_sharded_object(queryset, pk):
+    """按主键在各分片中查找对象，找不到返回 None"""
+    for alias in shard_aliases():
+        obj = queryset.using(alias).filter(pk=pk).first()
+        if obj is not None:
+            return obj
+    return None
+
+
+class ShardedObjectMixin:
+    """
+    后台编辑/删除视图混入类：跨分片查找对象，
+    并在用户所在分片内执行保存/删除（包括信号处理中的后续查询）
+    """
+
+    def get_object(self, queryset=None):
+        if queryset is None:
+            queryset = self.get_queryset()
+        if not get_shards():
+            return super().get_object(queryset)
+        obj = get_sharded_object(queryset, self.kwargs.get(self.pk_url_kwarg))
+        if obj is None:
+            raise Http404('记录不存在')
+        return obj
+
+    def form_valid(self, form):
+        instance = getattr(form, 'instance', None) or self.object
+        with using_shard(shard_for_user(getattr(instance, 'user_id', None))):
+            return super().form_valid(form)
@@ -0,0 +1,187 @@
+"""
+模型信号处理
+记录写入后同步维护依赖这些记录的派生数据
+"""
+from django.db.models.signals import pre_save, post_save, post_delete, post_migrate
+from django.dispatch import receiver
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from .models import User, SleepRecord, ExerciseRecord, DietRecord, HealthGoal, GoalProgress, HealthReport
+from .counters import record_change, counted_date_field
+from .report_refresh import mark_reports_stale
+from .goal_engine import sync_goal_progress
+from .stats_cache import UserStatsCache
+from .sharding import shard_for_user
+from .search_index import ensure_search_index
+from .archive import purge_user_archives
+
+
+# 记录模型 -> (报告分类, 日期字段)
+RECORD_CATEGORIES = {
+    SleepRecord: ('sleep', 'sleep_date'),
+    ExerciseRecord: ('exercise', 'exercise_date'),
+    DietRecord: ('diet', 'diet_date'),
+}
+
+
+def _is_cascade_delete(sender, origin):
+    """删除由其它模型级联触发（如删除用户）时，目标会随之删除，无需同步"""
+    if origin is None:
+        return False
+    return getattr(origin, 'model', type(origin)) is not sender
+
+
+def _record_dates(instance, date_field):
+    """返回本次写入涉及的日期（包括修改前的日期）"""
+    dates = {getattr(instance, date_field)}
+    previous_date = getattr(instance, '_previous_record_date', None)
+    if previous_date:
+        dates.add(previous_date)
+    return dates
+
+
+@receiver(pre_save, sender=SleepRecord)
+@receiver(pre_save, sender=ExerciseRecord)
+@receiver(pre_save, sender=DietRecord)
+def remember_previous_record_date(sender, instance, raw=False, **kwargs):
+    """更新记录时保存修改前的日期，日期变更时旧周期的报告同样需要重算"""
+    if raw or not instance.pk:
+        return
+    _, date_field = RECORD_CATEGORIES[sender]
+    instance._previous_record_date = sender.objects.filter(
+        pk=instance.pk
+    ).values_list(date_field, flat=True).first()
+
+
+@receiver(post_save, sender=SleepRecord)
+@receiver(post_save, sender=ExerciseRecord)
+@receiver(post_save, sender=DietRecord)
+@receiver(post_delete, sender=SleepRecord)
+@receiver(post_delete, sender=ExerciseRecord)
+@receiver(post_delete, sender=DietRecord)
+def mark_overlapping_reports_stale(sender, instance, raw=False, **kwargs):
+    """记录变更后标记覆盖该日期的健康报告"""
+    if raw:
+        return
+    category, date_field = RECORD_CATEGORIES[sender]
+    for record_date in _record_dates(instance, date_field):
+        mark_reports_stale(instance.user_id, record_date, category)
+
+
+@receiver(post_save, sender=SleepRecord)
+@receiver(post_save, sender=ExerciseRecord)
+@receiver(post_save, sender=DietRecord)
+@receiver(post_delete, sender=SleepRecord)
+@receiver(post_delete, sender=ExerciseRecord)
+@receiver(post_delete, sender=DietRecord)
+def sync_affected_goal_progress(sender, instance, raw=False, **kwargs):
+    """记录变更后自动更新覆盖该日期的健康目标进度"""
+    if raw or _is_cascade_delete(sender, kwargs.get('origin')):
+        return
+    category, date_field = RECORD_CATEGORIES[sender]
+    sync_goal_progress(instance.user_id, category, _record_dates(instance, date_field))
+
+
+def _invalidate_after_commit(user_id, name, using):
+    """
+    在 using 数据库的当前事务提交后使统计缓存失效
+    提交前失效时，并发请求可能读到未提交前的数据并重新写入缓存，缓存会一直停留在旧值
+    """
+    transaction.on_commit(lambda: UserStatsCache.invalidate(user_id, name), using=using)
+
+
+@receiver(post_save, sender=SleepRecord)
+@receiver(post_save, sender=ExerciseRecord)
+@receiver(post_save, sender=DietRecord)
+@receiver(post_delete, sender=SleepRecord)
+@receiver(post_delete, sender=ExerciseRecord)
+@receiver(post_delete, sender=DietRecord)
+def invalidate_weekly_stats(sender, instance, using=DEFAULT_DB_ALIAS, raw=False, **kwargs):
+    """记录变更提交后使一周统计缓存失效"""
+    if raw:
+        return
+    category, _ = RECORD_CATEGORIES[sender]
+    _invalidate_after_commit(instance.user_id, UserStatsCache.weekly_stats_name(category), using)
+
+
+@receiver(post_save, sender=HealthGoal)
+@receiver(post_delete, sender=HealthGoal)
+def invalidate_goal_stats_on_goal_change(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    """目标变更提交后使目标统计缓存失效"""
+    _invalidate_after_commit(instance.user_id, 'goal_stats', using)
+
+
+@receiver(post_save, sender=GoalProgress)
+@receiver(post_delete, sender=GoalProgress)
+def invalidate_goal_stats_on_progress_change(sender, instance, using=DEFAULT_DB_ALIAS, raw=False, **kwargs):
+    """
+    进度记录变更提交后使目标统计缓存失效（随目标级联删除时由目标信号处理）
+    进度引擎的批量写入不触发信号，由 goal_engine.sync_goal_progress 自行失效
+    """
+    if raw or _is_cascade_delete(sender, kwargs.get('origin')):
+        return
+    _invalidate_after_commit(instance.goal.user_id, 'goal_stats', using)
+
+
+@receiver(post_save, sender=User)
+def mirror_user_to_shard(sender, instance, using=DEFAULT_DB_ALIAS, raw=False, **kwargs):
+    """开启分片时把主库中的用户同步到其所在分片，供分片内的外键和关联查询使用"""
+    shard = shard_for_user(instance.pk)
+    if raw or shard in (None, using) or using != DEFAULT_DB_ALIAS:
+        return
+    User.objects.using(shard).update_or_create(
+        pk=instance.pk,
+        defaults={field.attname: getattr(instance, field.attname) for field in User._meta.concrete_fields
+                  if not field.primary_key}
+    )
+
+
+@receiver(post_delete, sender=User)
+def delete_user_from_shard(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    """主库删除用户时同时删除分片中的用户及其全部健康数据"""
+    shard = shard_for_user(instance.pk)
+    if shard in (None, using) or using != DEFAULT_DB_ALIAS:
+        return
+    User.objects.using(shard).filter(pk=instance.pk).delete()
+
+
+@receiver(post_delete, sender=User)
+def purge_archived_records(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    """删除用户时清除其归档记录（归档表没有外键，不会级联删除），只在记录所在的数据库执行"""
+    records_alias = shard_for_user(instance.pk) or router.db_for_write(SleepRecord) or DEFAULT_DB_ALIAS
+    if using == records_alias:
+        purge_user_archives(instance.pk, using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=SleepRecord)
+@receiver(post_save, sender=ExerciseRecord)
+@receiver(post_save, sender=DietRecord)
+@receiver(post_save, sender=HealthReport)
+@receiver(post_save, sender=HealthGoal)
+def count_saved(sender, instance, created, using=DEFAULT_DB_ALIAS, raw=False, **kwargs):
+    """新增时增加后台统计计数，修改记录日期时把每日计数移到新日期"""
+    if raw:
+        return
+    date_field = counted_date_field(sender)
+    record_date = getattr(instance, date_field) if date_field else None
+    previous_date = getattr(instance, '_previous_record_date', None)
+    record_change(sender, using, 1 if created else 0, record_date, previous_date)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=SleepRecord)
+@receiver(post_delete, sender=ExerciseRecord)
+@receiver(post_delete, sender=DietRecord)
+@receiver(post_delete, sender=HealthReport)
+@receiver(post_delete, sender=HealthGoal)
+def count_deleted(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    """删除时（包括级联删除）减少后台统计计数"""
+    date_field = counted_date_field(sender)
+    record_change(sender, using, -1, getattr(instance, date_field) if date_field else None)
+
+
+@receiver(post_migrate)
+def repair_search_index(sender, app_config=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """迁移重建来源表会删除搜索索引的触发器，迁移后检查并恢复"""
+    if app_config is not None and app_config.name == 'user':
+        ensure_search_index(connections[using])
@@ -0,0 +1,37 @@
+"""
+SQLite 连接参数
+生产配置档（DJANGO_DB_PROFILE=production）在每个新连接上执行 settings.SQLITE_PRAGMAS：
+WAL 日志模式下读不阻塞写、写不阻塞读，配合 busy_timeout 让短暂的写锁竞争排队等待而不是直接报错。
+只读副本（settings.DATABASE_REPLICAS）以只读方式打开，由 sync_sqlite_replicas 整体替换文件，
+不执行修改数据库文件的 PRAGMA（journal_mode 会把副本切换为 WAL，与替换文件的同步方式冲突）。
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# 允许通过配置设置的 PRAGMA（名称会直接拼接进 SQL）
+ALLOWED_PRAGMAS = ['journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store']
+
+# 只对写入有意义或会修改数据库文件的 PRAGMA，只读副本上跳过
+WRITE_PRAGMAS = {'journal_mode', 'synchronous'}
+
+
+def apply_pragmas(cursor, pragmas):
+    """在 DB-API 游标上执行 PRAGMA"""
+    for name, value in pragmas.items():
+        if name not in ALLOWED_PRAGMAS:
+            raise ValueError(f'不支持的 PRAGMA: {name}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """为新建的 SQLite 连接执行配置的 PRAGMA，只读副本只执行连接级别的 PRAGMA"""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    if connection.alias in getattr(settings, 'DATABASE_REPLICAS', []):
+        pragmas = {name: value for name, value in pragmas.items() if name not in WRITE_PRAGMAS}
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, pragmas)
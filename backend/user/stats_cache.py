@@ -0,0 +1,65 @@
+"""
+按用户缓存的统计数据
+统计结果按 (用户, 统计项) 缓存，相关数据写入时由信号处理失效
+"""
+from datetime import date
+from django.core.cache import cache
+from .metrics import registry
+
+
+class UserStatsCache:
+    """用户统计缓存服务"""
+    
+    CACHE_PREFIX = "user_stats_"
+    CACHE_EXPIRE_TIME = 300  # 5分钟，兜底与日期相关的字段（剩余天数等）
+    
+    @classmethod
+    def _cache_key(cls, user_id, name):
+        return f"{cls.CACHE_PREFIX}{user_id}_{name}"
+    
+    @staticmethod
+    def weekly_stats_name(category, end_date=None):
+        """一周统计的缓存项名称，包含截止日期以便跨天自动切换"""
+        return f"weekly_{category}_{(end_date or date.today()).isoformat()}"
+    
+    @classmethod
+    def get(cls, user_id, name):
+        """读取缓存的统计数据，未命中返回None"""
+        value = cache.get(cls._cache_key(user_id, name))
+        registry.observe_cache('user_stats', value is not None)
+        return value
+    
+    @classmethod
+    def set(cls, user_id, name, value, timeout=None):
+        """写入统计数据"""
+        cache.set(cls._cache_key(user_id, name), value, timeout or cls.CACHE_EXPIRE_TIME)
+    
+    @classmethod
+    def get_or_set(cls, user_id, name, builder, timeout=None):
+        """读取统计数据，未命中时调用 builder 计算并缓存"""
+        value = cls.get(user_id, name)
+        if value is None:
+            value = builder()
+            cls.set(user_id, name, value, timeout)
+        return value
+    
+    @classmethod
+    async def aget_or_set(cls, user_id, name, builder, timeout=None):
+        """get_or_set 的异步版本，builder 为返回可等待对象的函数"""
+        key = cls._cache_key(user_id, name)
+        value = await cache.aget(key)
+        registry.observe_cache('user_stats', value is not None)
+        if value is None:
+            value = await builder()
+            await cache.aset(key, value, timeout or cls.CACHE_EXPIRE_TIME)
+        return value
+    
+    @classmethod
+    def invalidate(cls, user_id, *names):
+        """使用户的指定统计项失效"""
+        cache.delete_many([cls._cache_key(user_id, name) for name in names])
+    
+    @classmethod
+    def invalidate_users(cls, user_ids, *names):
+        """批量使多个用户的指定统计项失效"""
+        cache.delete_many([cls._cache_key(user_id, name) for user_id in user_ids for name in names])
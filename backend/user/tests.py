@@ -1,3 +1,1248 @@
-from django.test import TestCase
+import sqlite3
+import tempfile
+from contextlib import closing
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from unittest import mock
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from .models import User, SleepRecord, ExerciseRecord, DietRecord, HealthGoal, GoalProgress, GoalReminder, GoalStatusLog, \
+    DailyRecordAggregate, SystemCounter, FoodCalorieReference, HealthReport
+from .archive import archive_records
+from .cohort_analytics import COHORT_METRICS, get_cohort_summary, get_peer_percentile, get_report_peer_comparison, \
+    _compute_metric_numpy, _compute_metric_python
+from .counters import dashboard_counts, reconcile
+from .goal_engine import sync_goal_progress
+from .goal_sweeper import expire_overdue_goals
+from .health_analyzer import HealthAnalyzer
+from .metrics import registry
+from .profiling import make_profile_token, list_profiles
+from .chart_series import lttb
+from .fast_serializers import serialize_sleep_records, serialize_exercise_records, serialize_diet_records
+from .sqlite_tuning import configure_sqlite_connection
+from .management.commands.sync_sqlite_replicas import Command as SyncReplicasCommand
+from .write_coordination import run_write, DatabaseBusy
+from .db_routers import read_alias_for, read_from, UserShardRouter
+from .search_index import search, search_filter
+from .sharding import CrossShardQuery, current_shard, shard_for_user
+from .serializers import SleepRecordSerializer, ExerciseRecordSerializer, DietRecordSerializer
+from .reminder_scheduler import ReminderScheduler
+from .renderers import FastJSONRenderer
+from .report_refresh import refresh_report, refresh_stale_reports
+from .stats_cache import UserStatsCache
+from .token_auth import TokenAuthService
+from .views import DashboardView, HealthGoalStatsView
 
 # Create your tests here.
+
+
+class HealthGoalQueryCountTests(TestCase):
+    """健康目标列表接口的查询次数不随目标数量增长"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(userName='goal_user', password='x')
+        self.client = APIClient()
+        token = TokenAuthService.generate_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def _create_goals(self, count, status='active'):
+        today = date.today()
+        for i in range(count):
+            goal = HealthGoal.objects.create(
+                user=self.user,
+                goal_type='exercise',
+                title=f'目标{i}',
+                target_value=100,
+                current_value=100 if status == 'completed' else 0,
+                unit='分钟',
+                frequency='daily',
+                start_date=today - timedelta(days=10),
+                end_date=today + timedelta(days=10),
+                status=status
+            )
+            for offset in range(3):
+                GoalProgress.objects.create(goal=goal, date=today - timedelta(days=offset), value=10)
+
+    def test_goal_list_query_count_is_constant(self):
+        self._create_goals(2)
+        # 认证用户 + 目标列表 + 预取进度记录
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/user/health-goals/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['goals'][0]['recent_progress']), 3)
+
+        self._create_goals(8)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/user/health-goals/')
+        self.assertEqual(response.data['total'], 10)
+
+    def test_goal_stats_achievements_do_not_query_per_goal(self):
+        self._create_goals(1, status='completed')
+        baseline = len(self._capture_queries('/api/user/health-goals/stats/'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_goals(4, status='completed')
+        with self.assertNumQueries(baseline):
+            response = self.client.get('/api/user/health-goals/stats/')
+        self.assertEqual(len(response.data['stats']['recent_achievements']), 5)
+
+    def _capture_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url)
+        return context.captured_queries
+
+    def test_goal_stats_uses_single_aggregate_and_cache(self):
+        self._create_goals(3)
+        self._create_goals(2, status='completed')
+        # 认证用户 + 条件聚合 + 按类型分组 + 最近完成目标 + 预取进度记录
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/user/health-goals/stats/')
+        stats = response.data['stats']
+        self.assertEqual(stats['total_goals'], 5)
+        self.assertEqual(stats['active_goals'], 3)
+        self.assertEqual(stats['completed_goals'], 2)
+        self.assertEqual(stats['goals_by_type'], {'exercise': 5})
+
+        # 命中缓存时只剩认证查询
+        with self.assertNumQueries(1):
+            self.client.get('/api/user/health-goals/stats/')
+
+        # 进度写入的事务提交前缓存仍有效，提交后失效
+        goal = HealthGoal.objects.filter(user=self.user, status='active').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            GoalProgress.objects.create(goal=goal, date=date.today() - timedelta(days=5), value=1)
+            with self.assertNumQueries(1):
+                self.client.get('/api/user/health-goals/stats/')
+        with self.assertNumQueries(5):
+            self.client.get('/api/user/health-goals/stats/')
+
+
+class GoalEngineTests(TestCase):
+    """记录写入后自动推算目标进度"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(userName='engine_user', password='x')
+        self.today = date.today()
+
+    def _create_goal(self, goal_type, unit, frequency='daily', target_value=60):
+        return HealthGoal.objects.create(
+            user=self.user,
+            goal_type=goal_type,
+            title='自动目标',
+            target_value=target_value,
+            unit=unit,
+            frequency=frequency,
+            start_date=self.today - timedelta(days=40),
+            end_date=self.today + timedelta(days=40)
+        )
+
+    def test_exercise_record_updates_daily_goal(self):
+        goal = self._create_goal('exercise', '分钟')
+        ExerciseRecord.objects.create(
+            user=self.user, exercise_date=self.today, exercise_type='running', duration_minutes=30
+        )
+        record = ExerciseRecord.objects.create(
+            user=self.user, exercise_date=self.today, exercise_type='yoga', duration_minutes=40
+        )
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 70)
+        self.assertEqual(goal.status, 'completed')
+        self.assertEqual(goal.progress_records.get(date=self.today).value, 70)
+
+        record.delete()
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 30)
+        self.assertEqual(goal.status, 'active')
+
+    def test_sleep_goal_uses_nightly_average_in_hours(self):
+        goal = self._create_goal('sleep', 'h', frequency='total', target_value=8)
+        SleepRecord.objects.create(user=self.user, sleep_date=self.today - timedelta(days=1),
+                                   bedtime=time(23, 0), wake_time=time(7, 0))
+        SleepRecord.objects.create(user=self.user, sleep_date=self.today,
+                                   bedtime=time(0, 0), wake_time=time(6, 0))
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 7)
+        self.assertEqual(goal.progress_records.count(), 2)
+
+    def test_unrecognized_unit_is_left_manual(self):
+        goal = self._create_goal('diet', '公斤')
+        DietRecord.objects.create(user=self.user, diet_date=self.today, meal_type='lunch',
+                                  food_name='米饭', portion_size=200, calories_per_100g=116)
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 0)
+        self.assertFalse(goal.progress_records.exists())
+
+    def test_manual_progress_is_never_overwritten(self):
+        goal = self._create_goal('exercise', '分钟')
+        yesterday = self.today - timedelta(days=1)
+        GoalProgress.objects.create(goal=goal, date=yesterday, value=45, notes='手动补录')
+        goal.update_current_value(20)
+        GoalProgress.objects.create(goal=goal, date=self.today, value=20, notes='手动填写')
+
+        # 当天有记录后删除：手动进度不被覆盖、不被删除，当前数值保持手动填写的值
+        record = ExerciseRecord.objects.create(
+            user=self.user, exercise_date=self.today, exercise_type='running', duration_minutes=30
+        )
+        record.delete()
+        ExerciseRecord.objects.create(user=self.user, exercise_date=yesterday, exercise_type='yoga',
+                                      duration_minutes=10).delete()
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 20)
+        self.assertEqual(
+            dict(goal.progress_records.values_list('date', 'value')), {yesterday: 45, self.today: 20}
+        )
+        self.assertFalse(goal.progress_records.filter(auto_generated=True).exists())
+
+    def test_cleared_progress_is_deleted_in_one_query(self):
+        daily = self._create_goal('exercise', '分钟')
+        weekly = self._create_goal('exercise', '小时', frequency='weekly')
+        yesterday = self.today - timedelta(days=1)
+        for day in [yesterday, self.today]:
+            ExerciseRecord.objects.create(user=self.user, exercise_date=day, exercise_type='running',
+                                          duration_minutes=30)
+        GoalProgress.objects.create(goal=daily, date=self.today - timedelta(days=2), value=5,
+                                    notes='根据记录自动同步', auto_generated=True)
+        self.assertEqual(GoalProgress.objects.filter(goal__in=[daily, weekly]).count(), 5)
+
+        # update() 不触发信号，两天的数据都被清空后一次同步
+        ExerciseRecord.objects.update(duration_minutes=0)
+        with CaptureQueriesContext(connection) as queries:
+            sync_goal_progress(self.user.id, 'exercise', [yesterday, self.today])
+        deletes = [query for query in queries if query['sql'].startswith('DELETE FROM "user_goalprogress"')]
+        self.assertEqual(len(deletes), 1)
+        # 不在本次同步日期内的进度记录保持不变
+        self.assertEqual(list(GoalProgress.objects.values_list('date', flat=True)), [self.today - timedelta(days=2)])
+
+    def assert_goal_stats_invalidated(self, write):
+        UserStatsCache.set(self.user.id, 'goal_stats', {'cached': True})
+        with self.captureOnCommitCallbacks(execute=True):
+            write()
+        self.assertIsNone(UserStatsCache.get(self.user.id, 'goal_stats'))
+
+    def test_engine_writes_and_progress_deletes_invalidate_goal_stats(self):
+        goal = self._create_goal('exercise', '分钟', target_value=1000)
+        ExerciseRecord.objects.create(
+            user=self.user, exercise_date=self.today, exercise_type='running', duration_minutes=30
+        )
+        # 当前数值不变时没有目标信号，只有引擎的批量写入
+        self.assert_goal_stats_invalidated(lambda: sync_goal_progress(self.user.id, 'exercise', [self.today]))
+        self.assert_goal_stats_invalidated(lambda: goal.progress_records.get(date=self.today).delete())
+
+
+class ReminderSchedulerTests(TestCase):
+    """提醒调度器只在到期时写入一次发件箱"""
+
+    def setUp(self):
+        self.user = User.objects.create(userName='reminder_user', password='x')
+        today = date.today()
+        self.goal = HealthGoal.objects.create(
+            user=self.user, goal_type='sleep', title='早睡', target_value=8, unit='小时',
+            frequency='daily', start_date=today, end_date=today + timedelta(days=7),
+            reminder_time=time(8, 0)
+        )
+        self.base = timezone.make_aware(datetime.combine(today, time(7, 55)))
+
+    def test_due_reminder_written_once(self):
+        scheduler = ReminderScheduler(lookahead_minutes=10)
+        self.assertEqual(scheduler.tick(self.base), 0)
+        self.assertEqual(scheduler.tick(self.base + timedelta(minutes=5)), 1)
+        self.assertEqual(scheduler.tick(self.base + timedelta(minutes=6)), 0)
+        self.assertEqual(GoalReminder.objects.filter(goal=self.goal).count(), 1)
+
+    def test_goal_changes_are_synced_incrementally(self):
+        scheduler = ReminderScheduler(lookahead_minutes=10)
+        scheduler.tick(self.base)
+
+        self.goal.reminder_time = time(8, 2)
+        self.goal.save()
+        other = HealthGoal.objects.create(
+            user=self.user, goal_type='exercise', title='跑步', target_value=30, unit='分钟',
+            frequency='daily', start_date=date.today(), end_date=date.today(),
+            reminder_time=time(8, 1)
+        )
+        self.assertEqual(scheduler.tick(self.base + timedelta(minutes=5)), 0)
+        self.assertEqual(scheduler.tick(self.base + timedelta(minutes=6)), 1)
+        self.assertEqual(scheduler.tick(self.base + timedelta(minutes=7)), 1)
+
+        other.reminder_enabled = False
+        other.save()
+        scheduler.tick(self.base + timedelta(days=1, minutes=6))
+        self.assertFalse(GoalReminder.objects.filter(goal=other, scheduled_for__date=date.today() + timedelta(days=1)).exists())
+
+    def test_goal_queries_run_on_each_shard(self):
+        seen = []
+        original = UserShardRouter._db_for_model
+
+        def spy(router, model, hints):
+            if model in (HealthGoal, GoalReminder):
+                seen.append(current_shard())
+            return original(router, model, hints)
+
+        with self.settings(USER_SHARDS=['default']), mock.patch.object(UserShardRouter, '_db_for_model', spy):
+            scheduler = ReminderScheduler(lookahead_minutes=10)
+            scheduler.tick(self.base)
+            self.assertEqual(scheduler.tick(self.base + timedelta(minutes=5)), 1)
+        self.assertTrue(seen)
+        self.assertEqual(set(seen), {'default'})
+
+
+class GoalSweeperTests(TestCase):
+    """过期目标批量标记"""
+
+    def test_expire_overdue_goals_in_batches(self):
+        user = User.objects.create(userName='sweeper_user', password='x')
+        today = date.today()
+        for i in range(5):
+            HealthGoal.objects.create(
+                user=user, goal_type='custom', title=f'目标{i}', target_value=10, unit='次',
+                frequency='total', start_date=today - timedelta(days=30),
+                end_date=today - timedelta(days=1) if i < 3 else today
+            )
+
+        self.assertEqual(expire_overdue_goals(batch_size=2), 3)
+        self.assertEqual(HealthGoal.objects.filter(status='expired').count(), 3)
+        self.assertEqual(GoalStatusLog.objects.filter(to_status='expired').count(), 3)
+        self.assertTrue(HealthGoal.objects.filter(status='expired').first().is_overdue())
+        self.assertEqual(expire_overdue_goals(), 0)
+
+    def test_endpoints_use_persisted_status(self):
+        cache.clear()
+        user = User.objects.create(userName='sweeper_api_user', password='x')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenAuthService.generate_token(user)}')
+        today = date.today()
+        goal = HealthGoal.objects.create(
+            user=user, goal_type='custom', title='已结束', target_value=10, unit='次',
+            frequency='total', start_date=today - timedelta(days=30), end_date=today - timedelta(days=1)
+        )
+
+        # 清理任务执行前仍是进行中，接口不按结束日期推算过期
+        self.assertFalse(client.get('/api/user/health-goals/').data['goals'][0]['is_overdue'])
+        self.assertEqual(client.get('/api/user/health-goals/stats/').data['stats']['active_goals'], 1)
+
+        expire_overdue_goals()
+        expired = client.get('/api/user/health-goals/', {'status': 'expired'}).data['goals']
+        self.assertEqual([(g['id'], g['is_overdue']) for g in expired], [(goal.pk, True)])
+        stats = client.get('/api/user/health-goals/stats/').data['stats']
+        self.assertEqual((stats['active_goals'], stats['expired_goals']), (0, 1))
+
+
+class GoalProgressBatchTests(TestCase):
+    """批量提交目标进度"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(userName='batch_user', password='x')
+        self.client = APIClient()
+        token = TokenAuthService.generate_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        today = date.today()
+        self.goals = [
+            HealthGoal.objects.create(
+                user=self.user, goal_type='custom', title=f'目标{i}', target_value=10, unit='页',
+                frequency='daily', start_date=today - timedelta(days=10), end_date=today + timedelta(days=10)
+            )
+            for i in range(2)
+        ]
+
+    def test_batch_upserts_and_updates_each_goal_once(self):
+        today = date.today()
+        GoalProgress.objects.create(goal=self.goals[0], date=today, value=1)
+        entries = [
+            {'goal_id': goal.id, 'date': str(today - timedelta(days=offset)), 'value': 10 - offset}
+            for goal in self.goals for offset in range(7)
+        ]
+        # 认证 + 目标查询 + 批量写入 + 每个目标一次更新 + 返回目标及预取进度（含事务保存点）
+        with self.assertNumQueries(9):
+            response = self.client.post('/api/user/health-goals/progress/batch/', {'entries': entries}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['saved'], 14)
+        self.assertEqual(GoalProgress.objects.filter(goal__user=self.user).count(), 14)
+
+        goal = HealthGoal.objects.get(pk=self.goals[0].pk)
+        self.assertEqual(goal.current_value, 10)
+        self.assertEqual(goal.status, 'completed')
+
+    def test_batch_rejects_other_users_goals(self):
+        other = User.objects.create(userName='other_user', password='x')
+        foreign = HealthGoal.objects.create(
+            user=other, goal_type='custom', title='别人的目标', target_value=10, unit='页',
+            frequency='daily', start_date=date.today(), end_date=date.today() + timedelta(days=1)
+        )
+        response = self.client.post('/api/user/health-goals/progress/batch/', {
+            'entries': [{'goal_id': foreign.id, 'date': str(date.today()), 'value': 1}]
+        }, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(GoalProgress.objects.exists())
+
+
+class DashboardTests(TestCase):
+    """首页聚合接口"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(userName='dashboard_user', password='x')
+        self.client = APIClient()
+        token = TokenAuthService.generate_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        SleepRecord.objects.create(user=self.user, sleep_date=date.today(), bedtime=time(23, 0), wake_time=time(7, 0))
+
+    def test_dashboard_matches_individual_endpoints(self):
+        weekly_sleep = self.client.get('/api/user/sleep-records/weekly/').data
+        UserStatsCache.invalidate(self.user.id, UserStatsCache.weekly_stats_name('sleep'))
+
+        response = self.client.get('/api/user/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        data = response.data['data']
+        self.assertEqual(list(data), DashboardView.SECTIONS)
+        self.assertEqual(data['sleep'], weekly_sleep)
+        self.assertIsNone(data['latest_report'])
+
+    def test_fields_selector_and_cached_sections(self):
+        self.client.get('/api/user/dashboard/?fields=sleep,goal_stats')
+        # 两个部分都命中缓存，只剩认证查询
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/user/dashboard/?fields=sleep,goal_stats')
+        self.assertEqual(list(response.data['data']), ['sleep', 'goal_stats'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SleepRecord.objects.create(user=self.user, sleep_date=date.today() - timedelta(days=1),
+                                       bedtime=time(22, 0), wake_time=time(6, 0))
+        response = self.client.get('/api/user/dashboard/?fields=sleep')
+        self.assertEqual(response.data['data']['sleep']['total_records'], 2)
+
+        response = self.client.get('/api/user/dashboard/?fields=sleep,unknown')
+        self.assertEqual(response.status_code, 400)
+
+    def test_stale_latest_report_is_flagged_not_refreshed(self):
+        report = HealthReport.objects.create(
+            user=self.user, report_date=date.today(), period_start=date.today() - timedelta(days=6),
+            period_end=date.today(), health_grade='fair', health_trend='stable',
+            stale_flags=HealthReport.STALE_SLEEP
+        )
+        # 读请求不写数据库：按保存的评分返回，并带上过期标记
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/user/dashboard/?fields=latest_report')
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in queries))
+        latest = response.data['data']['latest_report']
+        self.assertEqual((latest['is_stale'], latest['stale_categories'], latest['sleep_score']), (True, ['sleep'], 0))
+
+        self.client.post('/api/user/health-reports/generate/', {'period_days': 7}, format='json')
+        latest = self.client.get('/api/user/dashboard/?fields=latest_report').data['data']['latest_report']
+        report.refresh_from_db()
+        self.assertFalse(latest['is_stale'])
+        self.assertEqual(latest['sleep_score'], report.sleep_score)
+        self.assertNotEqual(report.sleep_score, 0)
+
+    def test_goal_sections_share_one_goal_query(self):
+        today = date.today()
+        for index, goal_status in enumerate(['active', 'active', 'completed', 'expired']):
+            HealthGoal.objects.create(
+                user=self.user, goal_type=['exercise', 'sleep'][index % 2], title=f'目标{index}',
+                target_value=10, current_value=index * 3, unit='次', frequency='total',
+                start_date=today - timedelta(days=10), end_date=today + timedelta(days=10), status=goal_status
+            )
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get('/api/user/dashboard/?fields=goals,goal_stats').data['data']
+        goal_queries = [query for query in queries if query['sql'].startswith('SELECT') and
+                        'FROM "user_healthgoal"' in query['sql']]
+        self.assertEqual(len(goal_queries), 1)
+        self.assertEqual(len(data['goals']), 4)
+        # 内存中统计的结果与独立统计接口一致
+        self.assertEqual(data['goal_stats'], HealthGoalStatsView.build_stats(self.user))
+
+
+class ChartSeriesTests(TestCase):
+    """图表序列分桶与降采样"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(userName='chart_user', password='x')
+        self.client = APIClient()
+        token = TokenAuthService.generate_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_weekly_buckets_report_min_max_avg(self):
+        monday = date.today() - timedelta(days=date.today().weekday() + 7)
+        for offset, minutes in enumerate([30, 60, 90]):
+            ExerciseRecord.objects.create(user=self.user, exercise_date=monday + timedelta(days=offset),
+                                          exercise_type='running', duration_minutes=minutes)
+        response = self.client.get('/api/user/charts/series/', {
+            'metrics': 'exercise_minutes', 'start': str(monday), 'end': str(monday + timedelta(days=6)),
+            'resolution': 'week'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['series']['exercise_minutes']['points'], [[str(monday), 60.0, 30.0, 90.0, 3]])
+
+    def test_lttb_bounds_points_and_keeps_endpoints(self):
+        points = [(i, (i * 37) % 11) for i in range(1000)]
+        sampled = lttb(points, 50)
+        self.assertEqual(len(sampled), 50)
+        self.assertEqual(sampled[0], points[0])
+        self.assertEqual(sampled[-1], points[-1])
+
+
+class FastSerializerTests(TestCase):
+    """快速序列化与 DRF 序列化器输出一致"""
+
+    def test_fast_serializers_match_drf_output(self):
+        user = User.objects.create(userName='serializer_user', password='x')
+        SleepRecord.objects.create(user=user, sleep_date=date.today(), bedtime=time(23, 30), wake_time=time(6, 15))
+        for exercise_type in ['yoga', 'running', 'other']:
+            ExerciseRecord.objects.create(user=user, exercise_date=date.today(), exercise_type=exercise_type,
+                                          duration_minutes=45, notes='晨练')
+        for meal_type in ['breakfast', 'snack']:
+            DietRecord.objects.create(user=user, diet_date=date.today(), meal_type=meal_type,
+                                      food_name='燕麦', portion_size=50, calories_per_100g=389)
+
+        cases = [
+            (SleepRecord, SleepRecordSerializer, serialize_sleep_records),
+            (ExerciseRecord, ExerciseRecordSerializer, serialize_exercise_records),
+            (DietRecord, DietRecordSerializer, serialize_diet_records),
+        ]
+        for model, serializer_class, fast_serialize in cases:
+            queryset = model.objects.filter(user=user)
+            self.assertEqual(fast_serialize(queryset), [dict(row) for row in serializer_class(queryset, many=True).data])
+
+
+class RendererAndCompressionTests(TestCase):
+    """快速 JSON 渲染与 API 响应压缩"""
+
+    def test_fast_renderer_matches_drf_output(self):
+        payload = {
+            'date': date(2024, 1, 2),
+            'time': time(7, 30),
+            'created_at': timezone.now(),
+            'amount': Decimal('12.50'),
+            'text': '睡眠 记录',
+            'nested': [{1: 'a'}, None, 1.5],
+        }
+        self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_fast_renderer_edge_cases_follow_drf(self):
+        import json
+        # 浮点数文本格式可能不同，解析结果一致
+        floats = {'small': 1e-05, 'large': 1e20, 'none': None}
+        self.assertEqual(json.loads(FastJSONRenderer().render(floats)), floats)
+        # 超过64位的整数回退到标准库实现
+        self.assertEqual(FastJSONRenderer().render({'big': 2 ** 70}), JSONRenderer().render({'big': 2 ** 70}))
+        # NaN/Infinity 与 STRICT_JSON 一致地拒绝，而不是变成 null
+        for value in (float('nan'), float('inf')):
+            with self.assertRaises(ValueError):
+                FastJSONRenderer().render({'nested': [{'value': value}], 'other': None})
+
+    def test_large_api_responses_are_gzipped(self):
+        cache.clear()
+        user = User.objects.create(userName='gzip_user', password='x')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenAuthService.generate_token(user)}')
+
+        response = client.get('/api/user/sleep-records/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+        SleepRecord.objects.bulk_create([
+            SleepRecord(user=user, sleep_date=date.today() - timedelta(days=i),
+                        bedtime=time(23, 0), wake_time=time(7, 0), sleep_duration=480)
+            for i in range(30)
+        ])
+        response = client.get('/api/user/sleep-records/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class AsyncViewTests(TestCase):
+    """异步只读接口与同步接口返回相同数据"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(userName='async_user', password='x')
+        self.client = APIClient()
+        token = TokenAuthService.generate_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        SleepRecord.objects.create(user=self.user, sleep_date=date.today(), bedtime=time(23, 0), wake_time=time(7, 0))
+        ExerciseRecord.objects.create(user=self.user, exercise_date=date.today(), exercise_type='running',
+                                      duration_minutes=30)
+        HealthGoal.objects.create(
+            user=self.user, goal_type='exercise', title='跑步', target_value=60, unit='分钟', frequency='daily',
+            start_date=date.today(), end_date=date.today() + timedelta(days=7)
+        )
+
+    def test_async_endpoints_match_sync_endpoints(self):
+        for sync_url, async_url in [
+            ('/api/user/sleep-records/', '/api/user/async/sleep-records/'),
+            ('/api/user/exercise-records/?exercise_type=running', '/api/user/async/exercise-records/?exercise_type=running'),
+            ('/api/user/exercise-records/weekly/', '/api/user/async/exercise-records/weekly/'),
+            ('/api/user/health-goals/', '/api/user/async/health-goals/'),
+            ('/api/user/dashboard/', '/api/user/async/dashboard/'),
+        ]:
+            expected = self.client.get(sync_url).json()
+            # 清除统计缓存，使异步接口自行计算统计数据
+            UserStatsCache.invalidate(self.user.id, 'goal_stats', *[
+                UserStatsCache.weekly_stats_name(category) for category in ['sleep', 'exercise', 'diet']
+            ])
+            self.assertEqual(self.client.get(async_url).json(), expected, async_url)
+
+    def test_async_dashboard_flags_stale_report_like_sync(self):
+        HealthReport.objects.create(
+            user=self.user, report_date=date.today(), period_start=date.today() - timedelta(days=6),
+            period_end=date.today(), health_grade='fair', health_trend='stable',
+            stale_flags=HealthReport.STALE_SLEEP
+        )
+        expected = self.client.get('/api/user/dashboard/?fields=latest_report').json()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/user/async/dashboard/?fields=latest_report').json()
+        self.assertFalse(any(query['sql'].startswith('UPDATE') for query in queries))
+        self.assertEqual(response, expected)
+        self.assertEqual(response['data']['latest_report']['stale_categories'], ['sleep'])
+
+    def test_async_endpoints_require_token(self):
+        response = APIClient().get('/api/user/async/dashboard/')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/api/user/async/sleep-records/?start_date=bad')
+        self.assertEqual(response.status_code, 400)
+
+
+class PerformanceMetricsTests(TestCase):
+    """请求性能统计与指标导出"""
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.user = User.objects.create(userName='metrics_user', password='x')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenAuthService.generate_token(self.user)}')
+        SleepRecord.objects.create(user=self.user, sleep_date=date.today(), bedtime=time(23, 0), wake_time=time(7, 0))
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_request_metrics_exported_in_prometheus_format(self):
+        self.client.get('/api/user/sleep-records/weekly/')
+        self.client.get('/api/user/sleep-records/weekly/')
+
+        self.assertEqual(APIClient().get('/metrics/').status_code, 403)
+        response = APIClient().get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+
+        labels = 'view="weekly_sleep_stats",method="GET"'
+        self.assertIn(f'health_http_request_duration_seconds_count{{{labels}}} 2', body)
+        self.assertIn(f'health_http_requests_total{{{labels},status="200"}} 2', body)
+        queries = next(line for line in body.splitlines() if line.startswith(f'health_db_queries_total{{{labels}}}'))
+        self.assertGreater(int(queries.split()[-1]), 0)
+        self.assertIn('health_cache_requests_total{cache="user_stats",result="hit"} 1', body)
+        self.assertIn('health_cache_requests_total{cache="user_stats",result="miss"} 1', body)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """慢请求分析：签名请求头开启、超过阈值才保存、目录轮转"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(userName='profile_user', password='x')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenAuthService.generate_token(self.user)}')
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+
+    def test_signed_header_captures_slow_requests(self):
+        with self.settings(PROFILING_DIR=self.profile_dir.name, PROFILING_THRESHOLD_MS=0, PROFILING_MAX_FILES=2):
+            response = self.client.get('/api/user/diet-records/weekly/', HTTP_X_PROFILE='forged')
+            self.assertNotIn('X-Profile-Id', response)
+
+            for mode in ['cprofile', 'sampler', 'cprofile']:
+                response = self.client.get('/api/user/diet-records/weekly/', HTTP_X_PROFILE=make_profile_token(mode))
+                self.assertIn('X-Profile-Id', response)
+
+            profiles = list_profiles()
+            self.assertEqual(len(profiles), 2)
+            self.assertEqual(profiles[0]['id'], response['X-Profile-Id'])
+            self.assertEqual(profiles[0]['view'], 'weekly_diet_stats')
+
+            self.assertEqual(self.client.get('/profiles/').status_code, 403)
+            self.assertEqual(self.client.get(f"/profiles/{profiles[0]['id']}/download/").status_code, 403)
+            with self.settings(METRICS_TOKEN='scrape-token'):
+                monitor = APIClient()
+                monitor.credentials(HTTP_AUTHORIZATION='Bearer scrape-token')
+                page = monitor.get('/profiles/')
+                self.assertContains(page, '/api/user/diet-records/weekly/')
+                download = monitor.get(f"/profiles/{profiles[0]['id']}/download/")
+                self.assertEqual(download.status_code, 200)
+
+        with self.settings(PROFILING_DIR=self.profile_dir.name, PROFILING_THRESHOLD_MS=60000):
+            response = self.client.get('/api/user/diet-records/weekly/', HTTP_X_PROFILE=make_profile_token())
+            self.assertNotIn('X-Profile-Id', response)
+
+
+class SQLitePragmaTests(TestCase):
+    """新建连接时执行配置的 PRAGMA"""
+
+    def test_configured_pragmas_applied_on_connection(self):
+        with self.settings(SQLITE_PRAGMAS={'cache_size': -4096, 'busy_timeout': 1234}):
+            configure_sqlite_connection(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA cache_size').fetchone()[0], -4096)
+            self.assertEqual(cursor.execute('PRAGMA busy_timeout').fetchone()[0], 1234)
+
+        with self.settings(SQLITE_PRAGMAS={'wal_autocheckpoint; DROP TABLE user_user': 1}):
+            with self.assertRaises(ValueError):
+                configure_sqlite_connection(sender=None, connection=connection)
+
+    def test_read_only_replica_skips_write_pragmas(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        primary_path, replica_path = f'{directory.name}/primary.sqlite3', f'{directory.name}/replica.sqlite3'
+        with closing(sqlite3.connect(primary_path)) as primary:
+            primary.execute('CREATE TABLE t (x)')
+            primary.commit()
+        SyncReplicasCommand().copy_database(primary_path, replica_path)
+
+        raw = sqlite3.connect(f'file:{replica_path}?mode=ro', uri=True)
+        self.addCleanup(raw.close)
+        replica = mock.Mock(vendor='sqlite', alias='replica1', cursor=lambda: closing(raw.cursor()))
+        pragmas = {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -4096}
+        with self.settings(SQLITE_PRAGMAS=pragmas, DATABASE_REPLICAS=['replica1']):
+            configure_sqlite_connection(sender=None, connection=replica)
+        self.assertEqual(raw.execute('PRAGMA journal_mode').fetchone()[0], 'delete')
+        self.assertEqual(raw.execute('PRAGMA cache_size').fetchone()[0], -4096)
+        with self.assertRaises(sqlite3.OperationalError):
+            raw.execute('INSERT INTO t VALUES (1)')
+
+
+@override_settings(WRITE_RETRY_BASE_DELAY=0, WRITE_RETRY_ATTEMPTS=2, WRITE_SERIALIZE=True)
+class WriteCoordinationTests(TransactionTestCase):
+    """写入遇到数据库锁冲突时回滚重试"""
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.user = User.objects.create(userName='writer', password='x')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenAuthService.generate_token(self.user)}')
+
+    def test_locked_write_is_rolled_back_and_retried(self):
+        original_save = DietRecord.save
+        calls = []
+
+        def flaky_save(record, *args, **kwargs):
+            original_save(record, *args, **kwargs)
+            calls.append(record.pk)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+
+        with mock.patch.object(DietRecord, 'save', flaky_save):
+            response = self.client.post('/api/user/diet-records/', {
+                'diet_date': date.today().isoformat(), 'meal_type': 'lunch', 'food_name': '米饭',
+                'portion_size': 200, 'calories_per_100g': 116
+            }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(calls), 2)
+        # 第一次尝试的写入已随事务回滚
+        self.assertEqual(DietRecord.objects.filter(user=self.user).count(), 1)
+        self.assertIn('health_db_write_retries_total{operation="diet_record_create"} 1', registry.render_prometheus())
+
+    def test_gives_up_after_max_retries(self):
+        def always_locked():
+            raise OperationalError('database is locked')
+
+        with self.assertRaises(DatabaseBusy):
+            run_write('test_write', always_locked)
+        with self.assertRaises(OperationalError):
+            run_write('test_write', lambda: User.objects.raw('SELECT * FROM missing_table')[0])
+        body = registry.render_prometheus()
+        self.assertIn('health_db_write_retries_total{operation="test_write"} 2', body)
+        self.assertIn('health_db_write_failures_total{operation="test_write"} 1', body)
+
+    def test_stale_report_refresh_lock_is_retried_not_500(self):
+        HealthReport.objects.create(
+            user=self.user, report_date=date.today(), period_start=date.today() - timedelta(days=6),
+            period_end=date.today(), health_grade='fair', health_trend='stable',
+            stale_flags=HealthReport.STALE_SLEEP
+        )
+        calls = []
+
+        def flaky_refresh(report):
+            calls.append(report.pk)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return refresh_report(report)
+
+        with mock.patch('user.views.refresh_report', flaky_refresh):
+            response = self.client.post('/api/user/health-reports/generate/', {'period_days': 7}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(HealthReport.objects.get(user=self.user).is_stale())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    """读视图使用副本，写入及写入后的读请求使用主库"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(userName='replica_user', password='x')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenAuthService.generate_token(self.user)}')
+
+    def test_reads_use_replica_until_user_writes(self):
+        self.assertEqual(SleepRecord.objects.all().db, 'default')
+        self.assertEqual(read_alias_for(self.user), 'replica1')
+        with read_from(read_alias_for(self.user)):
+            self.assertEqual(SleepRecord.objects.all().db, 'replica1')
+            # session 等数据始终读主库
+            from django.contrib.sessions.models import Session
+            self.assertEqual(Session.objects.all().db, 'default')
+
+        response = self.client.post('/api/user/sleep-records/', {
+            'sleep_date': date.today().isoformat(), 'bedtime': '23:00', 'wake_time': '07:00'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(read_alias_for(self.user), 'default')
+
+
+class ShardingTests(TestCase):
+    """跨分片查询按原查询集排序合并、分页"""
+
+    def test_cross_shard_query_merges_in_queryset_order(self):
+        user = User.objects.create(userName='shard_user', password='x')
+        for offset, meal_type in [(0, 'lunch'), (0, 'breakfast'), (1, 'dinner'), (2, 'lunch')]:
+            DietRecord.objects.create(user=user, diet_date=date.today() - timedelta(days=offset), meal_type=meal_type,
+                                      food_name='米饭', portion_size=100, calories_per_100g=116)
+
+        with self.settings(USER_SHARDS=['default']):
+            self.assertEqual(shard_for_user(user.id), 'default')
+            query = CrossShardQuery(DietRecord.objects.filter(user=user).order_by('-diet_date', 'meal_type'))
+            self.assertEqual(query.count(), 4)
+            self.assertEqual(
+                [(record.diet_date, record.meal_type) for record in query[:3]],
+                [(date.today(), 'breakfast'), (date.today(), 'lunch'), (date.today() - timedelta(days=1), 'dinner')]
+            )
+            self.assertEqual(query.filter(meal_type='lunch')[1].diet_date, date.today() - timedelta(days=2))
+
+
+class ArchiveTests(TestCase):
+    """历史记录归档：移出热表后列表和图表透明合并归档数据"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(userName='archive_user', password='x')
+        self.client = APIClient()
+        token = TokenAuthService.generate_token(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_old_records_move_to_archive_and_are_unioned_on_read(self):
+        old_day = date(2021, 3, 1)
+        recent_day = date.today() - timedelta(days=1)
+        for day in [old_day, recent_day]:
+            for minutes in [30, 45]:
+                ExerciseRecord.objects.create(user=self.user, exercise_date=day,
+                                              exercise_type='running', duration_minutes=minutes)
+
+        results = archive_records(cutoff=date.today() - timedelta(days=365))
+        self.assertEqual([(category, year, count) for _, category, year, count in results], [('exercise', 2021, 2)])
+        self.assertEqual(ExerciseRecord.objects.count(), 2)
+        aggregate = DailyRecordAggregate.objects.get(user=self.user, record_date=old_day)
+        self.assertEqual((aggregate.exercise_minutes, aggregate.exercise_count), (75, 2))
+
+        # 开始日期不涉及归档时只查询热表
+        response = self.client.get('/api/user/exercise-records/', {'start_date': str(recent_day)})
+        self.assertEqual(response.data['total_count'], 2)
+
+        response = self.client.get('/api/user/exercise-records/', {'start_date': '2021-01-01'})
+        self.assertEqual(response.data['total_count'], 4)
+        self.assertEqual(response.data['records'][-1]['exercise_date'], str(old_day))
+        self.assertEqual(response.data['records'][-1]['exercise_type_display'], '跑步')
+
+        response = self.client.get('/api/user/charts/series/', {
+            'metrics': 'exercise_minutes', 'start': '2021-03-01', 'end': str(recent_day), 'resolution': 'month'
+        })
+        points = response.data['series']['exercise_minutes']['points']
+        self.assertEqual(points[0][:2], ['2021-03-01', 75.0])
+
+    def test_deleting_user_purges_archived_records(self):
+        other = User.objects.create(userName='archive_other', password='x')
+        for user in [self.user, other]:
+            SleepRecord.objects.create(user=user, sleep_date=date(2020, 6, 1), bedtime=time(23, 0), wake_time=time(7, 0))
+            ExerciseRecord.objects.create(user=user, exercise_date=date(2021, 3, 1),
+                                          exercise_type='running', duration_minutes=30)
+        archive_records(cutoff=date(2022, 1, 1))
+
+        def archived_users():
+            with connection.cursor() as cursor:
+                users = set()
+                for table in ['user_sleeprecord_archive_2020', 'user_exerciserecord_archive_2021']:
+                    cursor.execute(f'SELECT DISTINCT user_id FROM {table}')
+                    users.update(row[0] for row in cursor.fetchall())
+                return users
+
+        self.assertEqual(archived_users(), {self.user.id, other.id})
+        self.user.delete()
+        self.assertEqual(archived_users(), {other.id})
+
+
+class DerivedFieldsTests(TestCase):
+    """派生字段在批量写入和 update() 中与 save() 计算结果一致"""
+
+    def setUp(self):
+        self.user = User.objects.create(userName='derived_user', password='x')
+
+    def test_bulk_paths_match_save(self):
+        SleepRecord.objects.bulk_create([
+            SleepRecord(user=self.user, sleep_date=date(2024, 1, 1), bedtime=time(23, 30), wake_time=time(7, 15)),
+            SleepRecord(user=self.user, sleep_date=date(2024, 1, 2), bedtime=time(1, 0), wake_time=time(8, 0, 30)),
+        ])
+        self.assertEqual(list(SleepRecord.objects.order_by('sleep_date').values_list('sleep_duration', flat=True)),
+                         [465, 420])
+        SleepRecord.objects.filter(sleep_date=date(2024, 1, 1)).update(bedtime=time(22, 0))
+        self.assertEqual(SleepRecord.objects.get(sleep_date=date(2024, 1, 1)).sleep_duration, 555)
+
+        diet = DietRecord.objects.create(user=self.user, diet_date=date(2024, 1, 1), meal_type='lunch',
+                                         food_name='米饭', portion_size=150, calories_per_100g=116)
+        DietRecord.objects.filter(pk=diet.pk).update(portion_size=333)
+        diet.refresh_from_db()
+        self.assertEqual(diet.total_calories, int(333 * 116 / 100))
+        # 分量或每100g卡路里为0时 save() 不重算，update() 同样保留原值
+        for changes in [{'portion_size': 0}, {'portion_size': 200, 'calories_per_100g': 0}]:
+            for field, value in changes.items():
+                setattr(diet, field, value)
+            diet.save()
+            saved = diet.total_calories
+            DietRecord.objects.filter(pk=diet.pk).update(**changes)
+            diet.refresh_from_db()
+            self.assertEqual(diet.total_calories, saved)
+        self.assertEqual(diet.total_calories, int(333 * 116 / 100))
+
+        exercises = [
+            ExerciseRecord(user=self.user, exercise_date=date(2024, 1, 1), exercise_type=exercise_type,
+                           duration_minutes=minutes)
+            for exercise_type in ExerciseRecord.MET_VALUES for minutes in [1, 7, 37, 90]
+        ]
+        manual = ExerciseRecord(user=self.user, exercise_date=date(2024, 1, 1), exercise_type='yoga',
+                                duration_minutes=30, calories_burned=999)
+        ExerciseRecord.objects.bulk_create(exercises + [manual])
+        expected = {obj.pk: obj.calories_burned for obj in ExerciseRecord.objects.all()}
+        ExerciseRecord.objects.exclude(pk=manual.pk).update(calories_burned=None)
+        self.assertEqual({obj.pk: obj.calories_burned for obj in ExerciseRecord.objects.all()}, expected)
+        ExerciseRecord.objects.update(duration_minutes=F('duration_minutes'))
+        self.assertEqual({obj.pk: obj.calories_burned for obj in ExerciseRecord.objects.all()}, expected)
+        self.assertEqual(expected[manual.pk], 999)
+
+
+class SleepQualityScoreTests(TestCase):
+    """睡眠质量评分字段在写入时维护，可在后台按评分筛选"""
+
+    def test_score_is_persisted_and_filterable(self):
+        user = User.objects.create(userName='quality_user', password='x')
+        good = SleepRecord.objects.create(user=user, sleep_date=date(2024, 3, 1), bedtime=time(23, 0), wake_time=time(7, 0))
+        poor = SleepRecord.objects.create(user=user, sleep_date=date(2024, 3, 2), bedtime=time(2, 0), wake_time=time(6, 30))
+        self.assertEqual((good.quality_score, poor.quality_score), (100, 40))
+
+        SleepRecord.objects.filter(pk=good.pk).update(wake_time=time(4, 0))
+        good.refresh_from_db()
+        self.assertEqual((good.sleep_duration, good.quality_score), (300, 60))
+
+        SleepRecord.objects.update(quality_score=0)
+        call_command('backfill_sleep_quality', stdout=StringIO())
+        self.assertEqual(sorted(SleepRecord.objects.values_list('quality_score', flat=True)), [40, 60])
+
+        response = self.client.get('/sleep-records/', {'quality': 'poor'})
+        self.assertEqual([record.pk for record in response.context['records']], [poor.pk])
+
+
+class SystemCounterTests(TestCase):
+    """后台统计计数器由信号增量维护，校准后与实际数据一致"""
+
+    def test_counters_follow_writes_and_reconcile(self):
+        today = date.today()
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create(userName='counter_user', password='x')
+        self.assertEqual(dashboard_counts(today)['user']['total'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            diet = DietRecord.objects.create(user=user, diet_date=today, meal_type='lunch', food_name='米饭',
+                                             portion_size=100, calories_per_100g=116)
+            SleepRecord.objects.create(user=user, sleep_date=today, bedtime=time(23, 0), wake_time=time(7, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            diet.diet_date = today - timedelta(days=30)
+            diet.save()
+
+        counts = dashboard_counts(today)
+        self.assertEqual(counts['diet_record'], {'total': 1, 'today': 0, 'week': 0})
+        self.assertEqual(counts['sleep_record'], {'total': 1, 'today': 1, 'week': 1})
+
+        # 绕过信号的批量写入由校准修正
+        ExerciseRecord.objects.bulk_create([
+            ExerciseRecord(user=user, exercise_date=today, exercise_type='running', duration_minutes=30)
+        ])
+        call_command('reconcile_counters', stdout=StringIO())
+        with self.assertNumQueries(1):
+            counts = dashboard_counts(today)
+        self.assertEqual(counts['exercise_record']['today'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+        self.assertEqual(set(SystemCounter.objects.filter(day__isnull=True).values_list('value', flat=True)), {0})
+
+
+
+class KeysetPaginationTests(TestCase):
+    """后台列表按游标翻页，无筛选条件时总数来自计数器"""
+
+    def setUp(self):
+        self.user = User.objects.create(userName='keyset_user', password='x')
+        start = date(2024, 1, 1)
+        SleepRecord.objects.bulk_create([
+            SleepRecord(user=self.user, sleep_date=start + timedelta(days=i), bedtime=time(23, 0), wake_time=time(7, 0))
+            for i in range(45)
+        ])
+        reconcile()
+        self.url = reverse('admin_panel:sleep_record_list')
+
+    def dates(self, response):
+        return [record.sleep_date for record in response.context['records']]
+
+    def test_walks_pages_by_cursor(self):
+        first = self.client.get(self.url)
+        page = first.context['page_obj']
+        self.assertEqual(page.number, 1)
+        self.assertEqual(page.paginator.num_pages, 3)
+        self.assertTrue(page.paginator.estimated)
+        self.assertEqual(self.dates(first)[0], date(2024, 2, 14))
+
+        second = self.client.get(self.url, {'after': page.next_cursor, 'page': 2})
+        third = self.client.get(self.url, {'after': second.context['page_obj'].next_cursor, 'page': 3})
+        self.assertEqual(len(self.dates(third)), 5)
+        self.assertFalse(third.context['page_obj'].has_next())
+        self.assertEqual(self.dates(third)[-1], date(2024, 1, 1))
+
+        back = self.client.get(self.url, {'before': third.context['page_obj'].previous_cursor, 'page': 2})
+        self.assertEqual(self.dates(back), self.dates(second))
+        last = self.client.get(self.url, {'last': 1})
+        self.assertEqual(last.context['page_obj'].number, 3)
+        self.assertEqual(self.dates(last), self.dates(third))
+
+    def test_deep_page_costs_same_as_first_page(self):
+        first = self.client.get(self.url)
+        with CaptureQueriesContext(connection) as first_queries:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as last_queries:
+            self.client.get(self.url, {'last': 1})
+        self.assertEqual(len(last_queries), len(first_queries))
+        self.assertFalse(any('COUNT(' in query['sql'] for query in first_queries))
+        self.assertFalse(any('OFFSET' in query['sql'] for query in last_queries))
+
+        # 有筛选条件时精确计数
+        filtered = self.client.get(self.url, {'start_date': '2024-02-01'})
+        self.assertFalse(filtered.context['page_obj'].paginator.estimated)
+        self.assertEqual(filtered.context['page_obj'].paginator.count, 14)
+
+    def test_last_page_ignores_archived_rows_in_counter(self):
+        archive_records(cutoff=date(2024, 1, 6), categories=['sleep'])
+        reconcile()
+        first = self.client.get(self.url)
+        self.assertEqual(first.context['page_obj'].paginator.count, 45)
+
+        # 热表只剩40条：末页是第2页，包含20条记录
+        last = self.client.get(self.url, {'last': 1})
+        page = last.context['page_obj']
+        self.assertEqual((page.number, page.paginator.count), (2, 40))
+        self.assertFalse(page.paginator.estimated)
+        self.assertEqual(self.dates(last), [date(2024, 1, 25) - timedelta(days=i) for i in range(20)])
+        self.assertTrue(page.has_previous())
+        self.assertFalse(page.has_next())
+
+
+class SearchIndexTests(TestCase):
+    """全文搜索索引由触发器同步，统一搜索接口按相关度排序"""
+
+    def setUp(self):
+        self.user = User.objects.create(userName='张小明同学', password='x')
+        self.other = User.objects.create(userName='李华', password='x')
+
+    def test_index_follows_writes(self):
+        diet = DietRecord.objects.create(user=self.user, diet_date=date.today(), meal_type='lunch',
+                                         food_name='西红柿炒鸡蛋', portion_size=200, calories_per_100g=90,
+                                         notes='少油少盐')
+        # 批量写入绕过信号，触发器同样同步
+        ExerciseRecord.objects.bulk_create([
+            ExerciseRecord(user=self.user, exercise_date=date.today(), exercise_type='running',
+                           duration_minutes=30, notes='晚饭后绕操场慢跑')
+        ])
+        self.assertEqual([r['category'] for r in search('操场慢跑')], ['exercise'])
+        self.assertEqual([r['id'] for r in search('炒鸡蛋', ['diet'])], [diet.pk])
+
+        DietRecord.objects.filter(pk=diet.pk).update(food_name='青椒肉丝')
+        self.assertEqual(search('炒鸡蛋'), [])
+        diet.delete()
+        self.assertEqual(search('少油少盐'), [])
+
+    def test_exercise_title_indexes_display_label(self):
+        record = ExerciseRecord.objects.create(user=self.user, exercise_date=date.today(),
+                                               exercise_type='badminton', duration_minutes=40)
+        self.assertEqual([(r['id'], r['title']) for r in search('羽毛球')], [(record.pk, '羽毛球')])
+        self.assertEqual(search('badminton'), [])
+
+        ExerciseRecord.objects.filter(pk=record.pk).update(exercise_type='running')
+        self.assertEqual(search('羽毛球'), [])
+        self.assertEqual([r['id'] for r in search('跑步', ['exercise'])], [record.pk])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual([r['title'] for r in search('跑步')], ['跑步'])
+
+    def test_list_filters_and_ranked_endpoint(self):
+        self.assertEqual(list(User.objects.filter(search_filter('user', '小明'))), [self.user])
+        self.assertEqual(list(User.objects.filter(search_filter('user', '张小明'))), [self.user])
+        self.assertEqual(User.objects.filter(search_filter('user', '100%')).count(), 0)
+
+        FoodCalorieReference.objects.create(food_name='小明牌酸奶', calories_per_100g=70, food_category='dairy')
+        DietRecord.objects.create(user=self.other, diet_date=date.today(), meal_type='breakfast',
+                                  food_name='面包', portion_size=100, calories_per_100g=260, notes='和张小明一起吃')
+        response = self.client.get(reverse('admin_panel:search'), {'q': '张小明'})
+        results = response.json()['results']
+        # 标题命中排在备注命中之前
+        self.assertEqual([r['category'] for r in results], ['user', 'diet'])
+        self.assertEqual(results[0]['url'], reverse('admin_panel:user_edit', args=[self.user.pk]))
+        self.assertEqual(self.client.get(reverse('admin_panel:search'), {'q': '小明', 'category': 'food'}).json()
+                         ['results'][0]['title'], '小明牌酸奶')
+        self.assertEqual(self.client.get(reverse('admin_panel:search'), {'q': '小明', 'category': 'x'}).status_code, 400)
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(search('小明')), 3)
+
+
+class ReportRefreshTests(TestCase):
+    """补录记录只标记覆盖该日期的报告分类，刷新后重算该分类评分并清除标记"""
+
+    def setUp(self):
+        self.user = User.objects.create(userName='refresh_user', password='x')
+        today = date.today()
+        self.report = HealthReport.objects.create(
+            user=self.user, report_date=today, period_start=today - timedelta(days=6), period_end=today,
+            sleep_score=0, exercise_score=50, diet_score=50, health_grade='fair', health_trend='stable'
+        )
+        self.old_report = HealthReport.objects.create(
+            user=self.user, report_date=today - timedelta(days=30), period_start=today - timedelta(days=36),
+            period_end=today - timedelta(days=30), health_grade='fair', health_trend='stable'
+        )
+
+    def backfill_sleep(self, days_ago=3):
+        SleepRecord.objects.create(user=self.user, sleep_date=date.today() - timedelta(days=days_ago),
+                                   bedtime=time(23, 0), wake_time=time(7, 0))
+
+    def test_backfill_flags_only_overlapping_category(self):
+        self.backfill_sleep()
+        self.report.refresh_from_db()
+        self.old_report.refresh_from_db()
+        self.assertEqual(self.report.stale_flags, HealthReport.STALE_SLEEP)
+        self.assertEqual(self.old_report.stale_flags, 0)
+
+    def test_refresh_recomputes_flagged_score(self):
+        self.backfill_sleep()
+        expected = HealthAnalyzer(self.user, 7, end_date=self.report.period_end).calculate_sleep_score()
+        self.assertEqual(refresh_stale_reports(), 1)
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.stale_flags, 0)
+        self.assertEqual(self.report.sleep_score, expected)
+        self.assertNotEqual(expected, 0)
+        # 未标记的分类沿用原评分
+        self.assertEqual(self.report.exercise_score, 50)
+        self.assertEqual(refresh_stale_reports(), 0)
+
+        self.backfill_sleep(days_ago=1)
+        call_command('refresh_stale_reports', stdout=StringIO())
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.stale_flags, 0)
+
+    def test_generate_refreshes_existing_stale_report(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenAuthService.generate_token(self.user)}')
+        self.backfill_sleep()
+        response = self.client.post('/api/user/health-reports/generate/', {'period_days': 7}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['report_id'], self.report.pk)
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.stale_flags, 0)
+        self.assertNotEqual(self.report.sleep_score, 0)
+
+
+class CohortAnalyticsTests(TestCase):
+    """群体分布的分位数与直方图，NumPy 与纯 Python 实现结果一致"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_percentiles_and_histogram(self):
+        config = COHORT_METRICS['sleep_hours']
+        # 5名学生，第0周各一条记录；学生1第1周另有一条
+        metric = _compute_metric_python(
+            [1, 2, 3, 4, 5, 1], [0, 1, 2, 3, 4, 7], [5.5, 6.5, 7.5, 8.5, 9.5, 7.5], config, weeks=2
+        )
+        self.assertEqual(metric['count'], 5)
+        self.assertEqual(metric['percentiles'], {'p10': 6.5, 'p50': 7.5, 'p90': 9.1})
+        self.assertEqual(metric['deciles'][0], 6.5)
+        self.assertEqual(metric['deciles'][-1], 9.5)
+        # 分箱 [0,4,5,6,7,8,9,10,24]：学生均值 6.5, 6.5, 7.5, 8.5, 9.5
+        self.assertEqual(metric['histogram']['counts'], [0, 0, 0, 2, 1, 1, 1, 0])
+        self.assertEqual(metric['weekly'][0]['count'], 5)
+        self.assertEqual(metric['weekly'][1]['p50'], 7.5)
+        self.assertEqual(get_peer_percentile({'metrics': {'sleep_hours': metric}}, 'sleep_hours', 8.0), 62.5)
+
+    def test_numpy_and_python_paths_match(self):
+        import random
+        rng = random.Random(7)
+        for metric in ('sleep_hours', 'exercise_minutes'):
+            config = COHORT_METRICS[metric]
+            count = 500
+            user_ids = [rng.randint(1, 60) for _ in range(count)]
+            day_offsets = [rng.randint(0, 27) for _ in range(count)]
+            values = [rng.uniform(config['bins'][0], config['bins'][-2] * 1.2) for _ in range(count)]
+            self.assertEqual(
+                _compute_metric_numpy(user_ids, day_offsets, values, config, weeks=4),
+                _compute_metric_python(user_ids, day_offsets, values, config, weeks=4),
+            )
+
+    def test_peer_comparison_reads_cached_summary_only(self):
+        user = User.objects.create(userName='cohort_user', password='x')
+        report = HealthReport.objects.create(
+            user=user, report_date=date.today(), period_start=date.today() - timedelta(days=6),
+            period_end=date.today(), overall_score=80, health_grade='good', health_trend='stable'
+        )
+        report.set_data_summary({'sleep_days': 0, 'avg_sleep_hours': 0, 'diet_days': 3, 'avg_calories_intake': 1800})
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_report_peer_comparison(report))
+
+        get_cohort_summary(refresh=True)
+        comparison = get_report_peer_comparison(report)
+        self.assertIsNone(comparison['sleep_hours']['percentile'])
+        self.assertEqual(comparison['calorie_intake']['value'], 1800)
+
+        report.set_data_summary({})
+        self.assertIsNone(get_report_peer_comparison(report))
+
+    def test_admin_dashboard_reads_cached_summary_only(self):
+        user = User.objects.create(userName='cohort_admin', password='x')
+        for offset in range(3):
+            SleepRecord.objects.create(user=user, sleep_date=date.today() - timedelta(days=offset),
+                                       bedtime=time(23, 0), wake_time=time(7, 0))
+        reconcile()
+        url = reverse('admin_panel:dashboard')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertIsNone(response.context['cohort'])
+        self.assertFalse(any('user_sleeprecord' in query['sql'] for query in queries))
+
+        self.client.post(reverse('admin_panel:cohort_analytics'))
+        cohort = self.client.get(url).context['cohort']
+        self.assertEqual(cohort['metrics']['sleep_hours']['count'], 1)
+        self.assertEqual(cohort['metrics']['sleep_hours']['percentiles']['p50'], 8.0)
+        self.assertEqual(cohort['metrics']['exercise_minutes']['count'], 0)
@@ -53,6 +53,24 @@ class TokenAuthService:
             cache.delete(cache_key)
             return None
     
+    @classmethod
+    async def averify_token(cls, token):
+        """verify_token 的异步版本，供异步视图使用"""
+        if not token:
+            return None
+            
+        cache_key = f"{cls.TOKEN_PREFIX}{token}"
+        user_data = await cache.aget(cache_key)
+        
+        if not user_data:
+            return None
+            
+        try:
+            return await User.objects.aget(id=user_data['user_id'])
+        except User.DoesNotExist:
+            await cache.adelete(cache_key)
+            return None
+    
     @classmethod
     def refresh_token(cls, token):
         """刷新token的过期时间"""
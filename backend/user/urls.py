@@ -26,7 +26,20 @@ from .views import (
     HealthGoalView,
     HealthGoalDetailView,
     HealthGoalProgressView,
-    HealthGoalStatsView
+    HealthGoalProgressBatchView,
+    HealthGoalStatsView,
+    DashboardView,
+    ChartSeriesView
+)
+from .async_views import (
+    AsyncSleepRecordListView,
+    AsyncExerciseRecordListView,
+    AsyncDietRecordListView,
+    AsyncWeeklyStatsView,
+    AsyncHealthReportLatestView,
+    AsyncHealthReportDetailView,
+    AsyncHealthGoalListView,
+    AsyncDashboardView
 )
 
 urlpatterns = [
@@ -69,5 +82,22 @@ urlpatterns = [
     path('health-goals/', HealthGoalView.as_view(), name='health_goals'),
     path('health-goals/<int:pk>/', HealthGoalDetailView.as_view(), name='health_goal_detail'),
     path('health-goals/<int:goal_id>/progress/', HealthGoalProgressView.as_view(), name='health_goal_progress'),
+    path('health-goals/progress/batch/', HealthGoalProgressBatchView.as_view(), name='health_goal_progress_batch'),
     path('health-goals/stats/', HealthGoalStatsView.as_view(), name='health_goal_stats'),
-]
\ No newline at end of file
+    
+    # 首页数据聚合
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('charts/series/', ChartSeriesView.as_view(), name='chart_series'),
+    
+    # 异步（ASGI）只读接口，返回数据与对应的同步接口一致
+    path('async/sleep-records/', AsyncSleepRecordListView.as_view(), name='async_sleep_records'),
+    path('async/sleep-records/weekly/', AsyncWeeklyStatsView.as_view(category='sleep'), name='async_weekly_sleep_stats'),
+    path('async/exercise-records/', AsyncExerciseRecordListView.as_view(), name='async_exercise_records'),
+    path('async/exercise-records/weekly/', AsyncWeeklyStatsView.as_view(category='exercise'), name='async_weekly_exercise_stats'),
+    path('async/diet-records/', AsyncDietRecordListView.as_view(), name='async_diet_records'),
+    path('async/diet-records/weekly/', AsyncWeeklyStatsView.as_view(category='diet'), name='async_weekly_diet_stats'),
+    path('async/health-reports/latest/', AsyncHealthReportLatestView.as_view(), name='async_health_report_latest'),
+    path('async/health-reports/<int:report_id>/', AsyncHealthReportDetailView.as_view(), name='async_health_report_detail'),
+    path('async/health-goals/', AsyncHealthGoalListView.as_view(), name='async_health_goals'),
+    path('async/dashboard/', AsyncDashboardView.as_view(), name='async_dashboard'),
+]
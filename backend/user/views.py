@@ -9,10 +9,12 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.http import Http404
+from django.db import transaction
 from .serializers import LoginSerializer, SleepRecordSerializer, WeeklySleepStatsSerializer, ExerciseRecordSerializer, \
     WeeklyExerciseStatsSerializer, DietRecordSerializer, WeeklyDietStatsSerializer, FoodCalorieReferenceSerializer, \
     HealthReportSerializer, HealthReportListSerializer, HealthReportGenerateSerializer, \
-    HealthReportStatisticsSerializer, HealthGoalSerializer, HealthGoalCreateSerializer, GoalProgressSerializer
+    HealthReportStatisticsSerializer, HealthGoalSerializer, HealthGoalCreateSerializer, GoalProgressSerializer, \
+    GoalProgressBatchSerializer
 from .models import User, SleepRecord, ExerciseRecord, DietRecord, FoodCalorieReference, HealthReport, HealthGoal, \
     GoalProgress
 from .utils import (
@@ -25,13 +27,31 @@ from .utils import (
     clear_user_sessions
 )
 from .token_auth import TokenAuthService
+from .stats_cache import UserStatsCache
+from .fast_serializers import (
+    SLEEP_FIELDS, EXERCISE_FIELDS, DIET_FIELDS,
+    serialize_sleep_records, serialize_exercise_records, serialize_diet_records,
+    format_sleep_rows, format_exercise_rows, format_diet_rows
+)
+from .archive import archived_rows
+from .report_refresh import refresh_report
+from .chart_series import CHART_METRICS, RESOLUTIONS, build_chart_series
+from .write_coordination import coordinated_write, raise_if_locked
+from .db_routers import ReplicaReadMixin
+from .sharding import activate_user_shard, current_shard
 from datetime import datetime, date, timedelta
-from django.db.models import Avg, Count
+from django.db.models import Avg, Count, Q
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework.authentication import BaseAuthentication
 from django.contrib.auth.models import AnonymousUser
 
 
+def get_week_range():
+    """最近一周的日期范围（包含今天共7天）"""
+    end_date = date.today()
+    return end_date - timedelta(days=6), end_date
+
+
 class TokenAuthentication(BaseAuthentication):
     """
     自定义Token认证类，用于API认证
@@ -45,6 +65,8 @@ class TokenAuthentication(BaseAuthentication):
         user = TokenAuthService.verify_token(token)
         
         if user:
+            # 后续查询进入该用户所在的数据分片
+            activate_user_shard(user)
             return (user, token)
         
         return None
@@ -228,7 +250,7 @@ class CSRFTokenView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class SleepRecordView(APIView):
+class SleepRecordView(ReplicaReadMixin, APIView):
     """
     睡眠记录管理视图
     """
@@ -237,43 +259,47 @@ class SleepRecordView(APIView):
     
     def get(self, request):
         """获取用户的睡眠记录"""
-        user = request.user
-        
-        # 获取查询参数
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
+        try:
+            queryset = self.get_queryset(request.user, request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # 构建查询集
+        # 序列化并返回（只读列表使用快速序列化），范围涉及归档时补充归档记录
+        records = serialize_sleep_records(queryset)
+        records += format_sleep_rows(self.get_archived_rows(request.user, request.query_params))
+        return Response({
+            "records": records,
+            "total": len(records)
+        }, status=status.HTTP_200_OK)
+    
+    @staticmethod
+    def get_queryset(user, params):
+        """根据查询参数构建查询集，日期格式错误时抛出 ValueError（同步/异步视图共用）"""
         queryset = SleepRecord.objects.filter(user=user)
         
         # 应用日期过滤
-        if start_date:
+        if params.get('start_date'):
             try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(sleep_date__gte=start_date)
+                start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
             except ValueError:
-                return Response(
-                    {"error": "start_date格式错误，应为YYYY-MM-DD"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                raise ValueError("start_date格式错误，应为YYYY-MM-DD")
+            queryset = queryset.filter(sleep_date__gte=start_date)
         
-        if end_date:
+        if params.get('end_date'):
             try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(sleep_date__lte=end_date)
+                end_date = datetime.strptime(params['end_date'], '%Y-%m-%d').date()
             except ValueError:
-                return Response(
-                    {"error": "end_date格式错误，应为YYYY-MM-DD"}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                raise ValueError("end_date格式错误，应为YYYY-MM-DD")
+            queryset = queryset.filter(sleep_date__lte=end_date)
         
-        # 序列化并返回
-        serializer = SleepRecordSerializer(queryset, many=True)
-        return Response({
-            "records": serializer.data,
-            "total": queryset.count()
-        }, status=status.HTTP_200_OK)
+        return queryset
     
+    @staticmethod
+    def get_archived_rows(user, params):
+        """开始日期早于归档边界时从归档表补充的记录行（同步/异步视图共用，需在 get_queryset 校验参数之后调用）"""
+        return archived_rows(SleepRecord, SLEEP_FIELDS, user, params)
+    
+    @coordinated_write('sleep_record_save')
     def post(self, request):
         """创建或更新睡眠记录"""
         user = request.user
@@ -336,6 +362,7 @@ class SleepRecordDetailView(APIView):
         serializer = SleepRecordSerializer(record)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
+    @coordinated_write('sleep_record_update')
     def put(self, request, pk):
         """更新睡眠记录"""
         user = request.user
@@ -357,6 +384,7 @@ class SleepRecordDetailView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @coordinated_write('sleep_record_delete')
     def delete(self, request, pk):
         """删除睡眠记录"""
         user = request.user
@@ -373,7 +401,7 @@ class SleepRecordDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class WeeklySleepStatsView(APIView):
+class WeeklySleepStatsView(ReplicaReadMixin, APIView):
     """
     一周睡眠统计视图
     """
@@ -382,26 +410,36 @@ class WeeklySleepStatsView(APIView):
     
     def get(self, request):
         """获取最近一周的睡眠统计"""
-        user = request.user
-        
-        # 计算一周前的日期
-        end_date = date.today()
-        start_date = end_date - timedelta(days=6)  # 包含今天共7天
-        
-        # 获取一周内的睡眠记录
-        records = SleepRecord.objects.filter(
+        return Response(self.get_stats(request.user), status=status.HTTP_200_OK)
+    
+    def get_stats(self, user):
+        """读取（或计算并缓存）用户最近一周的睡眠统计"""
+        start_date, end_date = get_week_range()
+        return UserStatsCache.get_or_set(
+            user.id,
+            UserStatsCache.weekly_stats_name('sleep', end_date),
+            lambda: self.build_stats(list(self.week_queryset(user, start_date, end_date)))
+        )
+    
+    @staticmethod
+    def week_queryset(user, start_date, end_date):
+        """一周内的睡眠记录"""
+        return SleepRecord.objects.filter(
             user=user,
             sleep_date__gte=start_date,
             sleep_date__lte=end_date
         ).order_by('sleep_date')
-        
-        # 计算统计数据
-        if records.exists():
-            avg_duration = records.aggregate(avg=Avg('sleep_duration'))['avg'] or 0
+    
+    def build_stats(self, records):
+        """根据一周内的睡眠记录计算统计数据"""
+        bedtime_analysis = {}
+        if records:
+            durations = [record.sleep_duration for record in records if record.sleep_duration is not None]
+            avg_duration = sum(durations) / len(durations) if durations else 0
             avg_hours = avg_duration / 60 if avg_duration else 0
             
-            # 计算平均睡眠质量评分
-            quality_scores = [record.get_sleep_quality_score() for record in records]
+            # 平均睡眠质量评分（使用保存时计算的评分字段）
+            quality_scores = [record.quality_score for record in records]
             avg_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 0
             
             # 睡眠规律性分析
@@ -420,20 +458,17 @@ class WeeklySleepStatsView(APIView):
             regularity = "无数据"
             recommendations = ["开始记录您的睡眠数据以获得个性化建议"]
         
-        # 构建响应数据
-        stats_data = {
+        # 直接返回构建的数据，不使用序列化器
+        return {
             'records': SleepRecordSerializer(records, many=True).data,
             'average_sleep_duration': round(avg_duration, 1),
             'average_sleep_hours': round(avg_hours, 1),
             'average_quality_score': round(avg_quality, 1),
-            'total_records': records.count(),
+            'total_records': len(records),
             'sleep_regularity': regularity,
-            'bedtime_analysis': bedtime_analysis if 'bedtime_analysis' in locals() else {},
+            'bedtime_analysis': bedtime_analysis,
             'recommendations': recommendations
         }
-        
-        # 直接返回构建的数据，不使用序列化器
-        return Response(stats_data, status=status.HTTP_200_OK)
     
     def _analyze_sleep_regularity(self, records):
         """分析睡眠规律性"""
@@ -594,7 +629,7 @@ class WeeklySleepStatsView(APIView):
         }
 
 
-class ExerciseRecordView(APIView):
+class ExerciseRecordView(ReplicaReadMixin, APIView):
     """
     运动记录视图
     """
@@ -603,50 +638,52 @@ class ExerciseRecordView(APIView):
     
     def get(self, request):
         """获取用户的运动记录"""
-        user = request.user
+        try:
+            records = self.get_queryset(request.user, request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # 获取查询参数
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-        exercise_type = request.GET.get('exercise_type')
+        # 序列化数据（只读列表使用快速序列化）
+        records_data = serialize_exercise_records(records)
+        records_data += format_exercise_rows(self.get_archived_rows(request.user, request.query_params))
         
-        # 构建查询条件
+        return Response({
+            'records': records_data,
+            'total_count': len(records_data)
+        }, status=status.HTTP_200_OK)
+    
+    @staticmethod
+    def get_queryset(user, params):
+        """根据查询参数构建查询集，日期格式错误时抛出 ValueError（同步/异步视图共用）"""
         queryset = ExerciseRecord.objects.filter(user=user)
         
-        if start_date:
+        if params.get('start_date'):
             try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(exercise_date__gte=start_date)
+                start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
             except ValueError:
-                return Response(
-                    {'error': '开始日期格式错误，请使用YYYY-MM-DD格式'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                raise ValueError('开始日期格式错误，请使用YYYY-MM-DD格式')
+            queryset = queryset.filter(exercise_date__gte=start_date)
         
-        if end_date:
+        if params.get('end_date'):
             try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(exercise_date__lte=end_date)
+                end_date = datetime.strptime(params['end_date'], '%Y-%m-%d').date()
             except ValueError:
-                return Response(
-                    {'error': '结束日期格式错误，请使用YYYY-MM-DD格式'}, 
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                raise ValueError('结束日期格式错误，请使用YYYY-MM-DD格式')
+            queryset = queryset.filter(exercise_date__lte=end_date)
         
-        if exercise_type:
-            queryset = queryset.filter(exercise_type=exercise_type)
+        if params.get('exercise_type'):
+            queryset = queryset.filter(exercise_type=params['exercise_type'])
         
         # 按日期倒序排列
-        records = queryset.order_by('-exercise_date', '-created_at')
-        
-        # 序列化数据
-        serializer = ExerciseRecordSerializer(records, many=True)
-        
-        return Response({
-            'records': serializer.data,
-            'total_count': records.count()
-        }, status=status.HTTP_200_OK)
+        return queryset.order_by('-exercise_date', '-created_at')
     
+    @staticmethod
+    def get_archived_rows(user, params):
+        """开始日期早于归档边界时从归档表补充的记录行（同步/异步视图共用，需在 get_queryset 校验参数之后调用）"""
+        return archived_rows(ExerciseRecord, EXERCISE_FIELDS, user, params,
+                             filters={'exercise_type': params.get('exercise_type')})
+    
+    @coordinated_write('exercise_record_create')
     def post(self, request):
         """创建运动记录"""
         user = request.user
@@ -688,6 +725,7 @@ class ExerciseRecordDetailView(APIView):
         except ExerciseRecord.DoesNotExist:
             return None
     
+    @coordinated_write('exercise_record_update')
     def put(self, request, record_id):
         """更新运动记录"""
         user = request.user
@@ -716,6 +754,7 @@ class ExerciseRecordDetailView(APIView):
             'details': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
     
+    @coordinated_write('exercise_record_delete')
     def delete(self, request, record_id):
         """删除运动记录"""
         user = request.user
@@ -734,7 +773,7 @@ class ExerciseRecordDetailView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class WeeklyExerciseStatsView(APIView):
+class WeeklyExerciseStatsView(ReplicaReadMixin, APIView):
     """
     一周运动统计视图
     """
@@ -743,21 +782,30 @@ class WeeklyExerciseStatsView(APIView):
     
     def get(self, request):
         """获取最近一周的运动统计"""
-        user = request.user
-        
-        # 计算一周前的日期
-        end_date = date.today()
-        start_date = end_date - timedelta(days=6)  # 包含今天共7天
-        
-        # 获取一周内的运动记录
-        records = ExerciseRecord.objects.filter(
+        return Response(self.get_stats(request.user), status=status.HTTP_200_OK)
+    
+    def get_stats(self, user):
+        """读取（或计算并缓存）用户最近一周的运动统计"""
+        start_date, end_date = get_week_range()
+        return UserStatsCache.get_or_set(
+            user.id,
+            UserStatsCache.weekly_stats_name('exercise', end_date),
+            lambda: self.build_stats(list(self.week_queryset(user, start_date, end_date)))
+        )
+    
+    @staticmethod
+    def week_queryset(user, start_date, end_date):
+        """一周内的运动记录"""
+        return ExerciseRecord.objects.filter(
             user=user,
             exercise_date__gte=start_date,
             exercise_date__lte=end_date
         ).order_by('exercise_date')
-        
+    
+    def build_stats(self, records):
+        """根据一周内的运动记录计算统计数据"""
         # 计算统计数据
-        if records.exists():
+        if records:
             total_duration = sum(record.duration_minutes for record in records)
             total_calories = sum(record.calories_burned or 0 for record in records)
             
@@ -790,7 +838,7 @@ class WeeklyExerciseStatsView(APIView):
             recommendations = ["开始记录您的运动数据，保持健康的生活方式"]
         
         # 构建响应数据
-        stats_data = {
+        return {
             'records': ExerciseRecordSerializer(records, many=True).data,
             'total_duration_minutes': total_duration,
             'total_duration_hours': round(total_duration / 60, 1),
@@ -798,12 +846,10 @@ class WeeklyExerciseStatsView(APIView):
             'average_daily_duration': round(avg_daily_duration, 1),
             'average_daily_calories': round(avg_daily_calories, 1),
             'most_frequent_exercise': most_frequent,
-            'exercise_frequency': records.count(),
+            'exercise_frequency': len(records),
             'fitness_score': fitness_score,
             'recommendations': recommendations
         }
-        
-        return Response(stats_data, status=status.HTTP_200_OK)
     
     def _calculate_fitness_score(self, total_duration, total_calories, frequency):
         """计算健身评分（0-100分）"""
@@ -899,7 +945,7 @@ class FoodCalorieReferenceView(APIView):
             )
 
 
-class DietRecordView(APIView):
+class DietRecordView(ReplicaReadMixin, APIView):
     """饮食记录API"""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsTokenAuthenticated]
@@ -907,52 +953,20 @@ class DietRecordView(APIView):
     def get(self, request):
         """获取用户饮食记录列表"""
         try:
-            user = request.user
-            
-            # 获取查询参数
-            start_date = request.GET.get('start_date')
-            end_date = request.GET.get('end_date')
-            meal_type = request.GET.get('meal_type')
-            
-            # 构建查询条件
-            queryset = DietRecord.objects.filter(user=user)
-            
-            # 日期范围筛选
-            if start_date:
-                try:
-                    start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                    queryset = queryset.filter(diet_date__gte=start_date)
-                except ValueError:
-                    return Response(
-                        {"error": "开始日期格式错误，请使用 YYYY-MM-DD 格式"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            if end_date:
-                try:
-                    end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                    queryset = queryset.filter(diet_date__lte=end_date)
-                except ValueError:
-                    return Response(
-                        {"error": "结束日期格式错误，请使用 YYYY-MM-DD 格式"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            
-            # 餐次筛选
-            if meal_type:
-                queryset = queryset.filter(meal_type=meal_type)
-            
-            # 按日期和餐次排序
-            queryset = queryset.order_by('-diet_date', 'meal_type', '-created_at')
-            
-            # 限制返回数量（分页可以后续添加）
-            queryset = queryset[:100]
-            
-            serializer = DietRecordSerializer(queryset, many=True)
+            try:
+                queryset = self.get_queryset(request.user, request.query_params)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # 只读列表使用快速序列化
+            records = serialize_diet_records(queryset)
+            records += format_diet_rows(
+                self.get_archived_rows(request.user, request.query_params, limit=100 - len(records))
+            )
             
             return Response({
-                "records": serializer.data,
-                "total_count": queryset.count()
+                "records": records,
+                "total_count": len(records)
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
@@ -961,6 +975,40 @@ class DietRecordView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @staticmethod
+    def get_queryset(user, params):
+        """根据查询参数构建查询集，日期格式错误时抛出 ValueError（同步/异步视图共用）"""
+        queryset = DietRecord.objects.filter(user=user)
+        
+        # 日期范围筛选
+        if params.get('start_date'):
+            try:
+                start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError("开始日期格式错误，请使用 YYYY-MM-DD 格式")
+            queryset = queryset.filter(diet_date__gte=start_date)
+        
+        if params.get('end_date'):
+            try:
+                end_date = datetime.strptime(params['end_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError("结束日期格式错误，请使用 YYYY-MM-DD 格式")
+            queryset = queryset.filter(diet_date__lte=end_date)
+        
+        # 餐次筛选
+        if params.get('meal_type'):
+            queryset = queryset.filter(meal_type=params['meal_type'])
+        
+        # 按日期和餐次排序，限制返回数量（分页可以后续添加）
+        return queryset.order_by('-diet_date', 'meal_type', '-created_at')[:100]
+    
+    @staticmethod
+    def get_archived_rows(user, params, limit=100):
+        """开始日期早于归档边界时从归档表补充的记录行，与热表记录合计不超过100条"""
+        return archived_rows(DietRecord, DIET_FIELDS, user, params,
+                             filters={'meal_type': params.get('meal_type')}, limit=limit)
+    
+    @coordinated_write('diet_record_create')
     def post(self, request):
         """创建新的饮食记录"""
         try:
@@ -984,6 +1032,7 @@ class DietRecordView(APIView):
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
                 
         except Exception as e:
+            raise_if_locked(e)
             return Response(
                 {"error": f"创建饮食记录失败: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1023,6 +1072,7 @@ class DietRecordDetailView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @coordinated_write('diet_record_update')
     def put(self, request, record_id):
         """更新饮食记录"""
         try:
@@ -1048,11 +1098,13 @@ class DietRecordDetailView(APIView):
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
                 
         except Exception as e:
+            raise_if_locked(e)
             return Response(
                 {"error": f"更新饮食记录失败: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @coordinated_write('diet_record_delete')
     def delete(self, request, record_id):
         """删除饮食记录"""
         try:
@@ -1072,13 +1124,14 @@ class DietRecordDetailView(APIView):
             )
             
         except Exception as e:
+            raise_if_locked(e)
             return Response(
                 {"error": f"删除饮食记录失败: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
-class WeeklyDietStatsView(APIView):
+class WeeklyDietStatsView(ReplicaReadMixin, APIView):
     """一周饮食统计API"""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsTokenAuthenticated]
@@ -1086,27 +1139,8 @@ class WeeklyDietStatsView(APIView):
     def get(self, request):
         """获取用户最近一周的饮食统计数据"""
         try:
-            user = request.user
-            
-            # 计算最近一周的日期范围
-            end_date = date.today()
-            start_date = end_date - timedelta(days=6)  # 包括今天在内的7天
-            
-            # 获取一周内的饮食记录
-            records = DietRecord.objects.filter(
-                user=user,
-                diet_date__range=[start_date, end_date]
-            ).order_by('diet_date', 'meal_type', 'created_at')
-            
-            # 计算统计数据
-            stats_data = self._calculate_diet_stats(records, start_date, end_date)
-            
-            # 序列化记录数据
-            records_serializer = DietRecordSerializer(records, many=True)
-            stats_data['records'] = records_serializer.data
-            
             # 直接返回统计数据，不使用序列化器验证
-            return Response(stats_data, status=status.HTTP_200_OK)
+            return Response(self.get_stats(request.user), status=status.HTTP_200_OK)
                 
         except Exception as e:
             return Response(
@@ -1114,6 +1148,31 @@ class WeeklyDietStatsView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    def get_stats(self, user):
+        """读取（或计算并缓存）用户最近一周的饮食统计"""
+        start_date, end_date = get_week_range()
+        return UserStatsCache.get_or_set(
+            user.id,
+            UserStatsCache.weekly_stats_name('diet', end_date),
+            lambda: self.build_stats(list(self.week_queryset(user, start_date, end_date)), start_date, end_date)
+        )
+    
+    @staticmethod
+    def week_queryset(user, start_date, end_date):
+        """一周内的饮食记录"""
+        return DietRecord.objects.filter(
+            user=user,
+            diet_date__range=[start_date, end_date]
+        ).order_by('diet_date', 'meal_type', 'created_at')
+    
+    def build_stats(self, records, start_date, end_date):
+        """根据一周内的饮食记录计算统计数据"""
+        stats_data = self._calculate_diet_stats(records, start_date, end_date)
+        
+        # 序列化记录数据
+        stats_data['records'] = DietRecordSerializer(records, many=True).data
+        return stats_data
+    
     def _calculate_diet_stats(self, records, start_date, end_date):
         """计算饮食统计数据"""
         # 基础统计
@@ -1439,45 +1498,51 @@ class HealthReportGenerateView(APIView):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsTokenAuthenticated]
     
+    @coordinated_write('health_report_generate')
     def post(self, request):
-        """生成新的健康报告"""
-        try:
-            # 验证请求数据
-            serializer = HealthReportGenerateSerializer(data=request.data)
-            if not serializer.is_valid():
-                return Response({
-                    'success': False,
-                    'message': '请求参数错误',
-                    'errors': serializer.errors
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            period_days = serializer.validated_data.get('period_days', 7)
-            user = request.user
+        """生成新的健康报告（该周期已有报告时只增量刷新过期的评分）"""
+        # 验证请求数据
+        serializer = HealthReportGenerateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': '请求参数错误',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        period_days = serializer.validated_data.get('period_days', 7)
+        user = request.user
+        
+        # 计算报告期间
+        end_date = date.today()
+        start_date = end_date - timedelta(days=period_days - 1)
+        
+        # 检查是否已存在相同周期的报告
+        existing_report = HealthReport.objects.filter(
+            user=user,
+            period_start=start_date,
+            period_end=end_date
+        ).first()
+        
+        if existing_report:
+            # 周期内记录有变动时增量刷新；刷新在 coordinated_write 的写事务中执行（用户所在的分片），
+            # 不经过下面的 except，锁冲突由装饰器回滚重试
+            if existing_report.is_stale():
+                refresh_report(existing_report)
             
+            return Response({
+                'success': True,
+                'message': '该周期的健康报告已存在',
+                'report_id': existing_report.id
+            }, status=status.HTTP_200_OK)
+        
+        try:
             # 导入健康分析器
             from .health_analyzer import HealthAnalyzer
             
             # 创建健康分析器实例
             analyzer = HealthAnalyzer(user, period_days)
             
-            # 计算报告期间
-            end_date = date.today()
-            start_date = end_date - timedelta(days=period_days - 1)
-            
-            # 检查是否已存在相同周期的报告
-            existing_report = HealthReport.objects.filter(
-                user=user,
-                period_start=start_date,
-                period_end=end_date
-            ).first()
-            
-            if existing_report:
-                return Response({
-                    'success': True,
-                    'message': '该周期的健康报告已存在',
-                    'report_id': existing_report.id
-                }, status=status.HTTP_200_OK)
-            
             # 计算各项评分
             sleep_score = analyzer.calculate_sleep_score()
             exercise_score = analyzer.calculate_exercise_score()
@@ -1518,13 +1583,14 @@ class HealthReportGenerateView(APIView):
             }, status=status.HTTP_201_CREATED)
             
         except Exception as e:
+            raise_if_locked(e)
             return Response({
                 'success': False,
                 'message': f'生成健康报告时发生错误: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HealthReportLatestView(APIView):
+class HealthReportLatestView(ReplicaReadMixin, APIView):
     """获取最新健康报告视图"""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsTokenAuthenticated]
@@ -1555,7 +1621,7 @@ class HealthReportLatestView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HealthReportListView(APIView):
+class HealthReportListView(ReplicaReadMixin, APIView):
     """健康报告列表视图"""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsTokenAuthenticated]
@@ -1623,7 +1689,7 @@ class HealthReportListView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HealthReportDetailView(APIView):
+class HealthReportDetailView(ReplicaReadMixin, APIView):
     """健康报告详情视图"""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsTokenAuthenticated]
@@ -1653,6 +1719,7 @@ class HealthReportDetailView(APIView):
                 'message': f'获取健康报告详情时发生错误: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @coordinated_write('health_report_delete')
     def delete(self, request, report_id):
         """删除指定的健康报告"""
         try:
@@ -1676,13 +1743,14 @@ class HealthReportDetailView(APIView):
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
+            raise_if_locked(e)
             return Response({
                 'success': False,
                 'message': f'删除健康报告时发生错误: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HealthReportStatisticsView(APIView):
+class HealthReportStatisticsView(ReplicaReadMixin, APIView):
     """健康报告统计视图"""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsTokenAuthenticated]
@@ -1770,7 +1838,7 @@ class HealthReportStatisticsView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class HealthGoalView(APIView):
+class HealthGoalView(ReplicaReadMixin, APIView):
     """
     健康目标视图
     """
@@ -1779,30 +1847,34 @@ class HealthGoalView(APIView):
     
     def get(self, request):
         """获取用户的健康目标列表"""
-        user = request.user
-        
-        # 获取查询参数
-        status_filter = request.query_params.get('status', None)
-        goal_type = request.query_params.get('type', None)
-        
-        # 构建查询条件
-        queryset = HealthGoal.objects.filter(user=user)
-        
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        if goal_type:
-            queryset = queryset.filter(goal_type=goal_type)
+        # 一次性预取最近进度，查询数与目标数量无关
+        goals = list(self.get_queryset(request.user, request.query_params))
         
         # 序列化数据
-        serializer = HealthGoalSerializer(queryset, many=True)
+        serializer = HealthGoalSerializer(goals, many=True)
         
         return Response({
             'success': True,
             'goals': serializer.data,
-            'total': queryset.count()
+            'total': len(goals)
         }, status=status.HTTP_200_OK)
     
+    @staticmethod
+    def get_queryset(user, params):
+        """
+        根据 status、type 查询参数构建目标查询集（同步/异步视图共用）
+        status 直接按持久化的状态过滤（命中 (user, status) 索引），已过期目标为 status=expired
+        """
+        queryset = HealthGoal.objects.filter(user=user)
+        
+        if params.get('status'):
+            queryset = queryset.filter(status=params['status'])
+        
+        if params.get('type'):
+            queryset = queryset.filter(goal_type=params['type'])
+        
+        return queryset.with_recent_progress()
+    
     def post(self, request):
         """创建新的健康目标"""
         serializer = HealthGoalCreateSerializer(data=request.data)
@@ -1920,6 +1992,7 @@ class HealthGoalProgressView(APIView):
         except HealthGoal.DoesNotExist:
             return None
     
+    @coordinated_write('goal_progress_update')
     def post(self, request, goal_id):
         """更新目标进度"""
         user = request.user
@@ -1968,7 +2041,8 @@ class HealthGoalProgressView(APIView):
             date=progress_date,
             defaults={
                 'value': value,
-                'notes': notes
+                'notes': notes,
+                'auto_generated': False
             }
         )
         
@@ -1987,76 +2061,304 @@ class HealthGoalProgressView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class HealthGoalStatsView(APIView):
+class HealthGoalProgressBatchView(APIView):
     """
-    健康目标统计视图
+    批量提交健康目标进度
+    离线客户端一次同步多个目标、多天的进度
     """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsTokenAuthenticated]
     
-    def get(self, request):
-        """获取用户的健康目标统计"""
+    @coordinated_write('goal_progress_batch')
+    def post(self, request):
+        """批量写入进度记录并更新目标当前数值"""
         user = request.user
+        serializer = GoalProgressBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({
+                'success': False,
+                'message': '请求参数错误',
+                'errors': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # 获取所有目标
-        all_goals = HealthGoal.objects.filter(user=user)
-        total_goals = all_goals.count()
+        # 同一目标同一天重复提交时以最后一条为准
+        entries = {}
+        for entry in serializer.validated_data['entries']:
+            entries[(entry['goal_id'], entry['date'])] = entry
         
-        if total_goals == 0:
+        goal_ids = {goal_id for goal_id, _ in entries}
+        goals = HealthGoal.objects.filter(user=user).in_bulk(goal_ids)
+        missing_ids = sorted(goal_ids - set(goals))
+        if missing_ids:
             return Response({
-                'success': True,
-                'stats': {
-                    'total_goals': 0,
-                    'active_goals': 0,
-                    'completed_goals': 0,
-                    'completion_rate': 0,
-                    'average_progress': 0,
-                    'goals_by_type': {},
-                    'recent_achievements': []
-                }
-            }, status=status.HTTP_200_OK)
+                'success': False,
+                'message': '目标不存在',
+                'missing_goal_ids': missing_ids
+            }, status=status.HTTP_404_NOT_FOUND)
         
-        # 按状态统计
-        active_goals = all_goals.filter(status='active').count()
-        completed_goals = all_goals.filter(status='completed').count()
+        # 每个目标的当前数值取本批中日期最新的一条
+        latest_values = {}
+        for (goal_id, progress_date), entry in sorted(entries.items(), key=lambda item: item[0][1]):
+            latest_values[goal_id] = entry['value']
+        
+        with transaction.atomic(using=current_shard()):
+            GoalProgress.objects.bulk_create(
+                [
+                    GoalProgress(goal_id=goal_id, date=progress_date, value=entry['value'], notes=entry['notes'],
+                                 auto_generated=False)
+                    for (goal_id, progress_date), entry in entries.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['goal', 'date'],
+                update_fields=['value', 'notes', 'auto_generated']
+            )
+            for goal_id, value in latest_values.items():
+                goals[goal_id].update_current_value(value)
         
-        # 计算完成率
-        completion_rate = (completed_goals / total_goals) * 100 if total_goals > 0 else 0
+        updated_goals = HealthGoal.objects.filter(pk__in=goal_ids).with_recent_progress()
         
-        # 计算平均进度
-        active_goal_objects = all_goals.filter(status='active')
-        if active_goal_objects.exists():
-            total_progress = sum(goal.progress_percentage for goal in active_goal_objects)
-            average_progress = total_progress / active_goal_objects.count()
-        else:
-            average_progress = 0
+        return Response({
+            'success': True,
+            'message': f'已同步{len(entries)}条进度记录',
+            'saved': len(entries),
+            'goals': HealthGoalSerializer(updated_goals, many=True).data
+        }, status=status.HTTP_200_OK)
+
+
+class HealthGoalStatsView(ReplicaReadMixin, APIView):
+    """
+    健康目标统计视图
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsTokenAuthenticated]
+    
+    def get(self, request):
+        """获取用户的健康目标统计"""
+        user = request.user
+        
+        stats_data = self.get_stats(user)
+        
+        return Response({
+            'success': True,
+            'stats': stats_data
+        }, status=status.HTTP_200_OK)
+    
+    @classmethod
+    def get_stats(cls, user, goals=None):
+        """
+        读取（或计算并缓存）用户的目标统计
+        goals 为返回已加载目标列表（含预取的最近进度）的函数时，缓存未命中时直接在内存中统计，不再查询目标表
+        """
+        if goals is not None:
+            return UserStatsCache.get_or_set(user.id, 'goal_stats', lambda: cls.build_stats_from_goals(goals()))
+        return UserStatsCache.get_or_set(user.id, 'goal_stats', lambda: cls.build_stats(user))
+    
+    @classmethod
+    def build_stats(cls, user):
+        """
+        计算目标统计：一次条件聚合 + 一次按类型分组
+        进行中/已过期均按持久化的 status 统计（过期由 expire_overdue_goals 标记），不按结束日期推算
+        """
+        all_goals = HealthGoal.objects.filter(user=user)
         
-        # 按类型统计
-        goals_by_type = {}
-        for goal_type, _ in HealthGoal.GOAL_TYPES:
-            count = all_goals.filter(goal_type=goal_type).count()
-            if count > 0:
-                goals_by_type[goal_type] = count
+        totals = all_goals.aggregate(
+            total_goals=Count('id'),
+            active_goals=Count('id', filter=Q(status='active')),
+            completed_goals=Count('id', filter=Q(status='completed')),
+            expired_goals=Count('id', filter=Q(status='expired')),
+            average_progress=Avg('progress_percentage', filter=Q(status='active'))
+        )
+        if totals['total_goals'] == 0:
+            return cls._stats_result(totals, {}, [])
+        
+        type_counts = dict(
+            all_goals.order_by().values('goal_type').annotate(count=Count('id')).values_list('goal_type', 'count')
+        )
         
         # 最近完成的目标
         recent_achievements = all_goals.filter(
             status='completed',
             updated_at__gte=date.today() - timedelta(days=30)
-        ).order_by('-updated_at')[:5]
+        ).order_by('-updated_at').with_recent_progress()[:5]
+        
+        return cls._stats_result(totals, type_counts, recent_achievements)
+    
+    @classmethod
+    def build_stats_from_goals(cls, goals):
+        """根据已加载的目标列表计算目标统计，结果与 build_stats 相同"""
+        active = [goal for goal in goals if goal.status == 'active']
+        totals = {
+            'total_goals': len(goals),
+            'active_goals': len(active),
+            'completed_goals': sum(goal.status == 'completed' for goal in goals),
+            'expired_goals': sum(goal.status == 'expired' for goal in goals),
+            'average_progress': sum(goal.progress_percentage for goal in active) / len(active) if active else None,
+        }
+        type_counts = {}
+        for goal in goals:
+            type_counts[goal.goal_type] = type_counts.get(goal.goal_type, 0) + 1
+        
+        cutoff = date.today() - timedelta(days=30)
+        recent_achievements = sorted(
+            (goal for goal in goals
+             if goal.status == 'completed' and timezone.localtime(goal.updated_at).date() >= cutoff),
+            key=lambda goal: goal.updated_at, reverse=True
+        )[:5]
+        
+        return cls._stats_result(totals, type_counts, recent_achievements)
+    
+    @staticmethod
+    def _stats_result(totals, type_counts, recent_achievements):
+        """组装目标统计结果：totals 为各状态数量和平均进度，type_counts 为 {目标类型: 数量}"""
+        total_goals = totals['total_goals']
+        if total_goals == 0:
+            return {
+                'total_goals': 0,
+                'active_goals': 0,
+                'completed_goals': 0,
+                'expired_goals': 0,
+                'completion_rate': 0,
+                'average_progress': 0,
+                'goals_by_type': {},
+                'recent_achievements': []
+            }
         
-        recent_achievements_data = HealthGoalSerializer(recent_achievements, many=True).data
+        # 计算完成率
+        completion_rate = (totals['completed_goals'] / total_goals) * 100
+        
+        # 按类型统计（保持 GOAL_TYPES 的顺序）
+        goals_by_type = {
+            goal_type: type_counts[goal_type]
+            for goal_type, _ in HealthGoal.GOAL_TYPES
+            if type_counts.get(goal_type)
+        }
         
-        stats_data = {
+        return {
             'total_goals': total_goals,
-            'active_goals': active_goals,
-            'completed_goals': completed_goals,
+            'active_goals': totals['active_goals'],
+            'completed_goals': totals['completed_goals'],
+            'expired_goals': totals['expired_goals'],
             'completion_rate': round(completion_rate, 1),
-            'average_progress': round(average_progress, 1),
+            'average_progress': round(totals['average_progress'] or 0, 1),
             'goals_by_type': goals_by_type,
-            'recent_achievements': recent_achievements_data
+            'recent_achievements': HealthGoalSerializer(recent_achievements, many=True).data
+        }
+
+
+class DashboardView(ReplicaReadMixin, APIView):
+    """
+    首页数据聚合视图
+    一次请求返回一周睡眠/运动/饮食统计、目标列表、目标统计和最新健康报告，
+    可通过 fields=sleep,goals 只获取需要的部分
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsTokenAuthenticated]
+    
+    SECTIONS = ['sleep', 'exercise', 'diet', 'goals', 'goal_stats', 'latest_report']
+    
+    def get(self, request):
+        """获取首页数据"""
+        user = request.user
+        
+        fields = self.SECTIONS
+        fields_param = request.query_params.get('fields')
+        if fields_param:
+            fields = [field.strip() for field in fields_param.split(',') if field.strip()]
+            unknown_fields = [field for field in fields if field not in self.SECTIONS]
+            if unknown_fields:
+                return Response({
+                    'success': False,
+                    'message': f'不支持的字段: {", ".join(unknown_fields)}',
+                    'available_fields': self.SECTIONS
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # 各部分复用对应接口的统计逻辑和按用户缓存
+        # 目标列表和目标统计共用一次目标查询（含最近进度），只在需要时加载一次
+        loaded = {}
+        
+        def goals():
+            if 'goals' not in loaded:
+                loaded['goals'] = list(HealthGoal.objects.filter(user=user).with_recent_progress())
+            return loaded['goals']
+        
+        builders = {
+            'sleep': lambda: WeeklySleepStatsView().get_stats(user),
+            'exercise': lambda: WeeklyExerciseStatsView().get_stats(user),
+            'diet': lambda: WeeklyDietStatsView().get_stats(user),
+            'goals': lambda: HealthGoalSerializer(goals(), many=True).data,
+            'goal_stats': lambda: HealthGoalStatsView.get_stats(user, goals),
+            'latest_report': lambda: self.get_latest_report(user),
         }
         
         return Response({
             'success': True,
-            'stats': stats_data
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+            'data': {field: builders[field]() for field in dict.fromkeys(fields)}
+        }, status=status.HTTP_200_OK)
+    
+    @staticmethod
+    def get_latest_report(user):
+        """
+        最新健康报告，没有报告时返回None（同步/异步视图共用）
+        读请求不重算报告：周期内记录有变动时按保存的评分返回并带上 is_stale 标记，
+        由生成报告接口或 refresh_stale_reports 命令重算
+        """
+        latest_report = HealthReport.objects.filter(user=user).first()
+        return HealthReportSerializer(latest_report).data if latest_report else None
+
+
+class ChartSeriesView(ReplicaReadMixin, APIView):
+    """
+    图表数据序列视图
+    返回按日/周/月分桶的 (分桶起始日期, 平均值, 最小值, 最大值, 天数) 序列，点数不超过 width
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsTokenAuthenticated]
+    
+    DEFAULT_DAYS = 30
+    DEFAULT_WIDTH = 200
+    MIN_WIDTH = 10
+    MAX_WIDTH = 1000
+    
+    def get(self, request):
+        """获取图表数据序列"""
+        params = request.query_params
+        
+        metrics = [m.strip() for m in params.get('metrics', '').split(',') if m.strip()] or list(CHART_METRICS)
+        unknown_metrics = [m for m in metrics if m not in CHART_METRICS]
+        if unknown_metrics:
+            return Response({
+                'success': False,
+                'message': f'不支持的指标: {", ".join(unknown_metrics)}',
+                'available_metrics': list(CHART_METRICS)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            end_date = datetime.strptime(params['end'], '%Y-%m-%d').date() if params.get('end') else date.today()
+            start_date = datetime.strptime(params['start'], '%Y-%m-%d').date() if params.get('start') \
+                else end_date - timedelta(days=self.DEFAULT_DAYS - 1)
+            width = int(params.get('width', self.DEFAULT_WIDTH))
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': '日期格式应为YYYY-MM-DD，width应为整数'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if start_date > end_date:
+            return Response({
+                'success': False,
+                'message': '开始日期不能晚于结束日期'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        resolution = params.get('resolution', 'auto')
+        if resolution != 'auto' and resolution not in RESOLUTIONS:
+            return Response({
+                'success': False,
+                'message': f'resolution 只能为 auto、{"、".join(RESOLUTIONS)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        width = max(self.MIN_WIDTH, min(width, self.MAX_WIDTH))
+        
+        return Response({
+            'success': True,
+            **build_chart_series(request.user, list(dict.fromkeys(metrics)), start_date, end_date, resolution, width)
+        }, status=status.HTTP_200_OK)
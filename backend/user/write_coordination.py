@@ -0,0 +1,110 @@
+"""
+SQLite 写入协调
+SQLite 同一时间只允许一个写事务，高峰期并发写入会出现 "database is locked"。
+coordinated_write 装饰器把写视图放进事务中执行，遇到锁冲突时整体回滚并按带抖动的指数退避重试；
+可选地（WRITE_SERIALIZE）在进程内按数据库串行化写入，让本进程的写请求排队而不是互相抢锁。
+重试次数和等待时间汇总到 metrics.registry，由 /metrics/ 导出。
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from .metrics import registry
+from .sharding import current_shard
+
+
+LOCK_ERROR_MESSAGES = ('database is locked', 'database table is locked')
+
+
+class DatabaseBusy(APIException):
+    """重试后仍无法获得写锁，返回503让客户端稍后重试"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = '系统繁忙，请稍后重试'
+    default_code = 'database_busy'
+
+
+def is_lock_error(exc):
+    return isinstance(exc, OperationalError) and any(message in str(exc) for message in LOCK_ERROR_MESSAGES)
+
+
+def raise_if_locked(exc):
+    """在捕获所有异常的视图中调用，让锁冲突交给 coordinated_write 重试"""
+    if is_lock_error(exc):
+        raise exc
+
+
+_writer_locks = {}
+_writer_locks_guard = threading.Lock()
+
+
+@contextmanager
+def write_lock(using=DEFAULT_DB_ALIAS):
+    """
+    进程内写锁（WRITE_SERIALIZE 开启时生效），产出等待锁的秒数
+    只能串行化本进程内的写入，多个工作进程之间仍依靠 busy_timeout 和重试
+    """
+    if not getattr(settings, 'WRITE_SERIALIZE', False):
+        yield 0.0
+        return
+    with _writer_locks_guard:
+        lock = _writer_locks.setdefault(using, threading.Lock())
+    started = time.perf_counter()
+    with lock:
+        yield time.perf_counter() - started
+
+
+def backoff_delay(attempt):
+    """第 attempt 次重试前的等待时间：指数退避，±50% 抖动避免多个请求同时重试"""
+    base = getattr(settings, 'WRITE_RETRY_BASE_DELAY', 0.05)
+    cap = getattr(settings, 'WRITE_RETRY_MAX_DELAY', 1.0)
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def run_write(operation, func, using=None):
+    """
+    在事务中执行 func，锁冲突时回滚并重试
+    using 默认为当前请求用户所在的分片（未开启分片时为主库），每个分片有独立的写锁
+    已处于外层事务中时直接执行（只能由外层整体重试）
+    """
+    using = using or current_shard() or DEFAULT_DB_ALIAS
+    if connections[using].in_atomic_block:
+        return func()
+
+    max_retries = getattr(settings, 'WRITE_RETRY_ATTEMPTS', 5)
+    retries = 0
+    waited = 0.0
+    failed = False
+    try:
+        while True:
+            try:
+                with write_lock(using) as lock_wait:
+                    waited += lock_wait
+                    with transaction.atomic(using=using):
+                        return func()
+            except OperationalError as e:
+                if not is_lock_error(e):
+                    raise
+                if retries >= max_retries:
+                    failed = True
+                    raise DatabaseBusy() from e
+            delay = backoff_delay(retries)
+            time.sleep(delay)
+            waited += delay
+            retries += 1
+    finally:
+        registry.observe_write(operation, retries, waited, failed)
+
+
+def coordinated_write(operation, using=None):
+    """写视图方法装饰器，operation 为指标中的操作名"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return run_write(operation, lambda: func(*args, **kwargs), using)
+        return wrapper
+    return decorator
@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
+from urllib.parse import quote
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -44,17 +46,46 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'user.middleware.PerformanceMetricsMiddleware',  # 请求性能统计（放在最前以统计完整耗时）
+    'user.middleware.ProfilingMiddleware',  # 慢请求采样分析（默认关闭，可用签名请求头单独开启）
+    'user.middleware.UserShardMiddleware',  # 每个请求独立的数据分片上下文
     'django.middleware.security.SecurityMiddleware',
+    'user.middleware.ApiGZipMiddleware',  # API响应压缩（需在读写响应体的中间件之前）
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',  # 重新启用CSRF
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'user.middleware.SessionAuthMiddleware',  # 自定义session认证中间件
+    'user.middleware.ReadYourWritesMiddleware',  # 写入后短时间内读主库（只读副本）
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# DRF配置：使用更快的JSON渲染器（未安装orjson时自动回退到标准库）
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'user.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# 超过该大小（字节）的API响应才进行gzip压缩
+API_GZIP_MIN_SIZE = 1024
+
+# 请求性能统计：/metrics/ 以 Prometheus 格式导出，管理员登录或携带 METRICS_TOKEN 才能访问
+METRICS_ENABLED = True
+METRICS_SERVER_TIMING = DEBUG  # 在响应中附加 Server-Timing 头
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# 慢请求分析：PROFILING_ENABLED 分析所有请求；也可用 manage.py profile_token 生成 X-Profile 请求头只分析单个请求
+PROFILING_ENABLED = False
+PROFILING_MODE = 'cprofile'  # cprofile 或 sampler（栈采样，开销更低）
+PROFILING_SAMPLE_INTERVAL = 0.005  # 栈采样间隔（秒）
+PROFILING_THRESHOLD_MS = 500  # 只保存耗时超过该值的请求
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_FILES = 50  # 最多保留的采集次数
+
 ROOT_URLCONF = '学生健康管理系统.urls'
 
 # CORS配置 - 开发环境设置
@@ -126,6 +157,73 @@ DATABASES = {
     }
 }
 
+# 数据库配置档：设置环境变量 DJANGO_DB_PROFILE=production 启用生产配置
+# - WAL 日志和连接 PRAGMA（见 user/sqlite_tuning.py），读写互不阻塞
+# - 持久连接，避免每个请求重新建立连接并执行 PRAGMA
+# - 写事务以 BEGIN IMMEDIATE 开始，锁竞争在事务开头按 busy_timeout 排队，而不是在提交时报 database is locked
+DB_PROFILE = os.environ.get('DJANGO_DB_PROFILE', 'development')
+
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # WAL 模式下 NORMAL 不会损坏数据库，只可能在断电时丢失最近的提交
+    'busy_timeout': 5000,  # 毫秒
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,  # 负数表示 KiB，约 20MB
+    'temp_store': 'MEMORY',
+}
+
+# 新建 SQLite 连接时执行的 PRAGMA
+SQLITE_PRAGMAS = {}
+
+if DB_PROFILE == 'production':
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    })
+
+# 只读副本：DJANGO_DB_REPLICAS 为逗号分隔的 SQLite 文件路径，可用 manage.py sync_sqlite_replicas 从主库复制
+# 统计、报告和列表视图的读查询分配到副本（见 user/db_routers.py）
+# 副本以只读 URI（mode=ro）打开，防止误写；DATABASE_REPLICA_PATHS 记录同步命令写入的文件路径
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_PATHS = {}
+for index, replica_path in enumerate(filter(None, os.environ.get('DJANGO_DB_REPLICAS', '').split(','))):
+    alias = f'replica{index + 1}'
+    replica_path = os.path.abspath(replica_path.strip())
+    # 副本文件同步时整体替换，不复用连接，保证新请求读到最新的副本；只读连接不使用 BEGIN IMMEDIATE
+    DATABASES[alias] = {
+        **DATABASES['default'], 'NAME': f'file:{quote(replica_path)}?mode=ro', 'OPTIONS': {},
+        'CONN_MAX_AGE': 0, 'TEST': {'MIRROR': 'default'}
+    }
+    DATABASE_REPLICAS.append(alias)
+    DATABASE_REPLICA_PATHS[alias] = replica_path
+
+# 按用户分片：DJANGO_DB_SHARDS 为逗号分隔的 SQLite 文件路径，配置后运行 manage.py init_user_shards
+# 用户的睡眠/运动/饮食记录、报告和目标按 user_id 分散到各分片，每个分片有独立的写锁（见 user/sharding.py）
+USER_SHARDS = []
+for index, shard_path in enumerate(filter(None, os.environ.get('DJANGO_DB_SHARDS', '').split(','))):
+    alias = f'shard{index + 1}'
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': shard_path.strip()}
+    USER_SHARDS.append(alias)
+
+DATABASE_ROUTERS = ['user.db_routers.UserShardRouter', 'user.db_routers.PrimaryReplicaRouter']
+
+# 用户写入后该时间（秒）内的读请求仍走主库，应大于副本同步间隔
+READ_YOUR_WRITES_SECONDS = 10
+
+# 写入协调（user/write_coordination.py）：锁冲突时的重试次数和退避时间（秒）
+WRITE_RETRY_ATTEMPTS = 5
+WRITE_RETRY_BASE_DELAY = 0.05
+WRITE_RETRY_MAX_DELAY = 1.0
+# 进程内串行化写入，本进程的写请求排队获取写锁而不是互相抢锁
+WRITE_SERIALIZE = DB_PROFILE == 'production'
+
+# 记录归档（user/archive.py）：早于该天数的睡眠/运动/饮食记录由 manage.py archive_records 移入按年份的归档表
+ARCHIVE_HORIZON_DAYS = 730
+# 已归档最新日期的缓存时间（秒），归档命令执行后各进程最迟在该时间后读到新的归档范围
+ARCHIVE_BOUNDARY_CACHE_SECONDS = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -0,0 +1,57 @@
+import tokenAuthService from './csrf-auth.js';
+
+// 每个数据点占用的最小像素宽度
+const PIXELS_PER_POINT = 8;
+
+/**
+ * 根据画布实际渲染宽度计算需要的数据点数
+ */
+export function seriesWidth(canvas) {
+    const pixels = canvas?.clientWidth || canvas?.width || 0;
+    return Math.max(Math.floor(pixels / PIXELS_PER_POINT), 10);
+}
+
+function toDateString(date) {
+    const year = date.getFullYear();
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `${year}-${month}-${day}`;
+}
+
+/**
+ * 从服务端获取最近 days 天按画布宽度分桶的图表序列
+ * 返回 { 指标: [{ date, value }, ...] }；按天分桶且 fillMissing 时无记录的日期补 0
+ */
+export async function loadChartSeries(metrics, canvas, { days = 7, fillMissing = true } = {}) {
+    const end = new Date();
+    const start = new Date(end);
+    start.setDate(start.getDate() - (days - 1));
+
+    const result = await tokenAuthService.getChartSeries({
+        metrics,
+        start: toDateString(start),
+        end: toDateString(end),
+        width: seriesWidth(canvas)
+    });
+    if (!result.success) {
+        throw new Error(result.error?.message || '加载图表数据失败');
+    }
+
+    const { resolution, series } = result.data;
+    const seriesByMetric = {};
+    metrics.forEach(metric => {
+        const points = series[metric]?.points || [];
+        if (resolution !== 'day' || !fillMissing) {
+            seriesByMetric[metric] = points.map(([date, avg]) => ({ date, value: avg }));
+            return;
+        }
+
+        const values = Object.fromEntries(points.map(([date, avg]) => [date, avg]));
+        seriesByMetric[metric] = [];
+        for (const date = new Date(start); date <= end; date.setDate(date.getDate() + 1)) {
+            const dateStr = toDateString(date);
+            seriesByMetric[metric].push({ date: dateStr, value: values[dateStr] || 0 });
+        }
+    });
+    return seriesByMetric;
+}
@@ -249,6 +249,45 @@ class TokenAuthService {
         }
     }
 
+    /**
+     * 获取首页聚合数据（可选 fields 指定需要的部分，如 ['sleep', 'goals']）
+     */
+    async getDashboard(fields = []) {
+        try {
+            const query = fields.length ? `?fields=${fields.join(',')}` : '';
+            const response = await this.request(`/dashboard/${query}`, {
+                method: 'GET'
+            });
+
+            const data = await response.json();
+            return response.ok ? { success: true, data: data.data } : { success: false, error: data };
+        } catch (error) {
+            return { success: false, error: { message: '网络错误' } };
+        }
+    }
+
+    /**
+     * 获取服务端分桶降采样后的图表序列
+     * params: { metrics: ['sleep_hours'], start, end, resolution, width }
+     */
+    async getChartSeries({ metrics = [], start, end, resolution = 'auto', width } = {}) {
+        try {
+            const query = new URLSearchParams({ resolution });
+            if (metrics.length) query.append('metrics', metrics.join(','));
+            if (start) query.append('start', start);
+            if (end) query.append('end', end);
+            if (width) query.append('width', width);
+            const response = await this.request(`/charts/series/?${query}`, {
+                method: 'GET'
+            });
+
+            const data = await response.json();
+            return response.ok ? { success: true, data } : { success: false, error: data };
+        } catch (error) {
+            return { success: false, error: { message: '网络错误' } };
+        }
+    }
+
     /**
      * 注册
      */